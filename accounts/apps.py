@@ -5,3 +5,6 @@ class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
     verbose_name = 'Comptes'
+    
+    def ready(self):
+        import accounts.signals  # Importer les signaux
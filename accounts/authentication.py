@@ -0,0 +1,210 @@
+"""
+Authentification JWT sans requête
+
+JWTAuthentication relit l'utilisateur en base à chaque requête, puis
+/api/auth/me/ remonte plusieurs fois vers user.employee. Ici l'utilisateur
+est chargé une fois avec son agence et son employé, et un profil employé
+est précalculé (poste, département, tableaux de bord accessibles, gestion
+des files). Seuls ses champs (hors mot de passe), le nom et le code de son
+agence et ce profil sont gardés:
+
+- dans le cache partagé, sous une clé (utilisateur, version);
+- dans un cache local au processus, de courte durée, pour éviter de
+  désérialiser depuis Redis à chaque requête.
+
+Le hash du mot de passe n'est jamais mis en cache: si la révocation des
+jetons est activée (CHECK_REVOKE_TOKEN), seule son empreinte md5, celle
+que porte le jeton, est conservée. Les autres champs (mot de passe, autres
+champs de l'agence) restent différés: lus en base si une vue y accède.
+
+La version de chaque utilisateur est tenue dans le cache partagé et
+changée par les signaux dès qu'un User ou son Employee est enregistré ou
+supprimé: la requête suivante recharge l'utilisateur, dans tous les
+processus.
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+ALL_DASHBOARDS = ['admin', 'rh', 'comptabilite', 'commercial', 'operations', 'support', 'it', 'employee']
+
+# Champs de l'agence gardés avec l'utilisateur (affichés par /api/auth/me/)
+AGENCY_FIELDS = ('id', 'name', 'code')
+
+# Cache local: {clé: (expiration, entrée)}
+LOCAL_TTL = 30
+LOCAL_MAX_ENTRIES = 1000
+_local = {}
+
+
+def _ttl():
+    return getattr(settings, 'AUTH_USER_CACHE_TTL', 300)
+
+
+def _version_key(user_id):
+    return f'accounts:auth-user:{user_id}:version'
+
+
+def _user_key(user_id, version):
+    return f'accounts:auth-user:{user_id}:{version}'
+
+
+def _version(user_id):
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, None):
+            version = cache.get(key) or version
+    return version
+
+
+def invalidate_user(user_id):
+    """L'utilisateur ou son employé a changé: recharger dans tous les processus"""
+    cache.delete(_version_key(user_id))
+
+
+def _employee(user):
+    # Sans requête si l'employé a été chargé (ou trouvé absent) par select_related
+    try:
+        return user.employee
+    except ObjectDoesNotExist:
+        return None
+
+
+def build_profile(user):
+    """Profil employé de l'utilisateur, tel qu'exposé par UserSerializer"""
+    employee = _employee(user)
+    if user.role == 'super_admin':
+        dashboards = list(ALL_DASHBOARDS)
+    elif employee:
+        dashboards = employee.get_accessible_dashboards()
+    elif user.role == 'client':
+        dashboards = ['client']
+    else:
+        dashboards = ['employee']
+
+    return {
+        'employee_number': employee.employee_number if employee else None,
+        'position': employee.position if employee else None,
+        'position_display': employee.get_position_display_full() if employee else None,
+        'department': employee.department if employee else None,
+        'department_display': employee.get_department_display() if employee else None,
+        'accessible_dashboards': dashboards,
+        'can_manage_queue': user.role == 'super_admin' or bool(employee and employee.can_manage_queue),
+    }
+
+
+def user_profile(user):
+    """Profil précalculé de l'utilisateur (calculé à la demande sinon)"""
+    profile = getattr(user, '_profile', None)
+    if profile is None:
+        profile = user._profile = build_profile(user)
+    return profile
+
+
+def load_user(user_id):
+    """Utilisateur avec son agence et son employé, profil calculé (une requête)"""
+    user = (
+        get_user_model().objects
+        .select_related('agency', 'employee')
+        .filter(**{api_settings.USER_ID_FIELD: user_id})
+        .first()
+    )
+    if user is not None:
+        user_profile(user)
+    return user
+
+
+def _fields(instance, names=None):
+    """{attname: valeur} des champs de l'instance, dans l'ordre du modèle"""
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if names is None or field.attname in names
+    }
+
+
+def user_entry(user):
+    """Entrée de cache d'un utilisateur chargé par load_user (sans hash de mot de passe)"""
+    fields = _fields(user)
+    password = fields.pop('password')
+    agency = user.agency if user.agency_id else None
+    return {
+        'user': fields,
+        'agency': _fields(agency, AGENCY_FIELDS) if agency else None,
+        'profile': user_profile(user),
+        'password_digest': get_md5_hash_password(password) if api_settings.CHECK_REVOKE_TOKEN else None,
+    }
+
+
+def restore_user(entry):
+    """Utilisateur reconstruit depuis son entrée; les champs absents sont différés"""
+    from agencies.models import Agency
+
+    fields = entry['user']
+    user = get_user_model().from_db(DEFAULT_DB_ALIAS, list(fields), list(fields.values()))
+    if entry['agency']:
+        agency = entry['agency']
+        user.agency = Agency.from_db(DEFAULT_DB_ALIAS, list(agency), list(agency.values()))
+    user._profile = entry['profile']
+    user._password_digest = entry['password_digest']
+    return user
+
+
+def cached_user(user_id):
+    """Utilisateur authentifié depuis le cache (local puis partagé), None s'il n'existe pas"""
+    key = _user_key(user_id, _version(user_id))
+    now = time.monotonic()
+
+    local = _local.get(key)
+    if local and local[0] > now:
+        return restore_user(local[1])
+
+    entry = cache.get(key)
+    if entry is None:
+        user = load_user(user_id)
+        if user is None:
+            return None
+        entry = user_entry(user)
+        cache.set(key, entry, _ttl())
+
+    if len(_local) >= LOCAL_MAX_ENTRIES:
+        _local.clear()
+    _local[key] = (now + LOCAL_TTL, entry)
+    # Une instance par requête: elle peut être modifiée par la vue
+    return restore_user(entry)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication dont l'utilisateur est résolu depuis le cache"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        user = cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            digest = getattr(user, '_password_digest', None) or get_md5_hash_password(user.password)
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != digest:
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
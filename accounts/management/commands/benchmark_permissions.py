@@ -0,0 +1,56 @@
+"""
+Commande pour comparer le coût des vérifications de permissions de module:
+requête exists() à chaque vérification (ancien chemin) contre matrice en mémoire.
+
+Les permissions de test sont créées dans une transaction annulée à la fin.
+"""
+import itertools
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = 'Mesure les vérifications de permissions par seconde, avec et sans matrice en cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=5000, help='Vérifications par mesure')
+
+    def handle(self, *args, **options):
+        from accounts.models import Permission, User
+        from accounts.permissions import has_module_permission, invalidate_permission_matrix
+
+        roles = [code for code, _ in User.ROLE_CHOICES]
+        modules = [code for code, _ in Permission.MODULES]
+        actions = [code for code, _ in Permission.ACTIONS]
+        checks = list(itertools.islice(itertools.cycle(itertools.product(roles, modules, actions)), options['checks']))
+
+        with transaction.atomic():
+            # Une permission sur deux accordée
+            Permission.objects.bulk_create(
+                [Permission(role=r, module=m, action=a) for i, (r, m, a) in enumerate(itertools.product(roles, modules, actions)) if i % 2],
+                ignore_conflicts=True,
+            )
+            invalidate_permission_matrix()
+
+            started = time.perf_counter()
+            expected = [Permission.objects.filter(role=r, module=m, action=a).exists() for r, m, a in checks]
+            query_seconds = time.perf_counter() - started
+
+            has_module_permission(*checks[0])  # chargement de la matrice
+            started = time.perf_counter()
+            cached = [has_module_permission(r, m, a) for r, m, a in checks]
+            cached_seconds = time.perf_counter() - started
+
+            transaction.set_rollback(True)
+        invalidate_permission_matrix()
+
+        count = len(checks)
+        self.stdout.write(f'🔍 Requête par vérification: {count / query_seconds:,.0f} vérifications/s')
+        self.stdout.write(f'⚡ Matrice en mémoire:      {count / cached_seconds:,.0f} vérifications/s')
+        self.stdout.write(f'   Accélération: x{query_seconds / cached_seconds:,.0f}')
+        if cached != expected:
+            self.stdout.write(self.style.ERROR('❌ Résultats différents entre les deux chemins'))
+            raise SystemExit(1)
+        self.stdout.write(self.style.SUCCESS('✅ Résultats identiques'))
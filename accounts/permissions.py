@@ -1,6 +1,37 @@
+import uuid
+
+from django.core.cache import cache
 from rest_framework import permissions
 from .models import Permission as PermissionModel
 
+# Matrice (rôle, module, action) chargée une fois par processus, rechargée
+# quand sa version dans le cache partagé change (signal sur Permission)
+MATRIX_VERSION_KEY = 'accounts:permission-matrix:version'
+_matrix = (None, frozenset())
+
+
+def permission_matrix():
+    """Ensemble immuable des permissions (rôle, module, action)"""
+    global _matrix
+    version = cache.get(MATRIX_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(MATRIX_VERSION_KEY, version, None):
+            version = cache.get(MATRIX_VERSION_KEY) or version
+    if _matrix[0] != version:
+        _matrix = (version, frozenset(PermissionModel.objects.values_list('role', 'module', 'action')))
+    return _matrix[1]
+
+
+def invalidate_permission_matrix():
+    """Les permissions ont changé: chaque processus rechargera la matrice"""
+    cache.set(MATRIX_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def has_module_permission(role, module, action):
+    return (role, module, action) in permission_matrix()
+
+
 class HasModulePermission(permissions.BasePermission):
     """Vérifier si l'utilisateur a la permission pour un module"""
     
@@ -19,12 +50,8 @@ class HasModulePermission(permissions.BasePermission):
         if not module or not action:
             return True
         
-        # Vérifier la permission
-        return PermissionModel.objects.filter(
-            role=request.user.role,
-            module=module,
-            action=action
-        ).exists()
+        # Vérifier la permission (matrice en mémoire, sans requête)
+        return has_module_permission(request.user.role, module, action)
     
     def get_module(self, view):
         """Extraire le module de la vue"""
@@ -4,6 +4,8 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+from .authentication import user_profile
+
 User = get_user_model()
 
 
@@ -46,46 +48,27 @@ class UserSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
     
+    # Profil employé calculé une fois par utilisateur (voir accounts/authentication.py)
     def get_employee_number(self, obj):
-        if hasattr(obj, 'employee') and obj.employee:
-            return obj.employee.employee_number
-        return None
+        return user_profile(obj)['employee_number']
     
     def get_position(self, obj):
-        if hasattr(obj, 'employee') and obj.employee:
-            return obj.employee.position
-        return None
+        return user_profile(obj)['position']
     
     def get_position_display(self, obj):
-        if hasattr(obj, 'employee') and obj.employee:
-            return obj.employee.get_position_display_full()
-        return None
+        return user_profile(obj)['position_display']
     
     def get_department(self, obj):
-        if hasattr(obj, 'employee') and obj.employee:
-            return obj.employee.department
-        return None
+        return user_profile(obj)['department']
     
     def get_department_display(self, obj):
-        if hasattr(obj, 'employee') and obj.employee:
-            return obj.employee.get_department_display()
-        return None
+        return user_profile(obj)['department_display']
     
     def get_accessible_dashboards(self, obj):
-        if obj.role == 'super_admin':
-            return ['admin', 'rh', 'comptabilite', 'commercial', 'operations', 'support', 'it', 'employee']
-        if hasattr(obj, 'employee') and obj.employee:
-            return obj.employee.get_accessible_dashboards()
-        if obj.role == 'client':
-            return ['client']
-        return ['employee']
+        return user_profile(obj)['accessible_dashboards']
     
     def get_can_manage_queue(self, obj):
-        if obj.role == 'super_admin':
-            return True
-        if hasattr(obj, 'employee') and obj.employee:
-            return obj.employee.can_manage_queue
-        return False
+        return user_profile(obj)['can_manage_queue']
 
 
 class RegisterSerializer(serializers.ModelSerializer):
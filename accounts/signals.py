@@ -0,0 +1,32 @@
+"""
+Signaux des comptes: invalider les données d'authentification et
+d'autorisation en cache
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_user
+from .models import Permission, User
+from .permissions import invalidate_permission_matrix
+
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def permission_changed(sender, instance, **kwargs):
+    """Permission ajoutée, modifiée ou retirée: recharger la matrice dans tous les processus"""
+    transaction.on_commit(invalidate_permission_matrix)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """Utilisateur modifié: son entrée de cache d'authentification est périmée"""
+    transaction.on_commit(lambda: invalidate_user(instance.pk))
+
+
+@receiver(post_save, sender='hr.Employee')
+@receiver(post_delete, sender='hr.Employee')
+def employee_changed(sender, instance, **kwargs):
+    """Le profil employé (poste, département) fait partie de l'utilisateur en cache"""
+    transaction.on_commit(lambda: invalidate_user(instance.user_id))
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ServiceType, Counter, TimeSlot, Appointment, QueueTicket, DailyQueueStats
+from .models import ServiceType, Counter, TimeSlot, Appointment, QueueTicket, QueueTicketArchive, DailyQueueStats, TicketSequence, TicketBlock, SlotOccupancy
 
 
 @admin.register(ServiceType)
@@ -46,9 +46,49 @@ class QueueTicketAdmin(admin.ModelAdmin):
     date_hierarchy = 'date'
 
 
+@admin.register(QueueTicketArchive)
+class QueueTicketArchiveAdmin(admin.ModelAdmin):
+    list_display = ['ticket_number', 'agency', 'service', 'status', 'priority', 'counter_number', 'date']
+    list_filter = ['agency', 'status', 'priority', 'date']
+    search_fields = ['ticket_number']
+    ordering = ['-date', 'ticket_number']
+    date_hierarchy = 'date'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(DailyQueueStats)
 class DailyQueueStatsAdmin(admin.ModelAdmin):
     list_display = ['agency', 'date', 'total_tickets', 'completed_tickets', 'avg_wait_time']
     list_filter = ['agency', 'date']
     ordering = ['-date']
     date_hierarchy = 'date'
+
+
+@admin.register(TicketSequence)
+class TicketSequenceAdmin(admin.ModelAdmin):
+    list_display = ['agency', 'date', 'prefix', 'last_number', 'updated_at']
+    list_filter = ['agency', 'date']
+    ordering = ['-date', 'agency', 'prefix']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(TicketBlock)
+class TicketBlockAdmin(admin.ModelAdmin):
+    list_display = ['agency', 'date', 'kiosk', 'prefix', 'next_number', 'last_number', 'updated_at']
+    list_filter = ['agency', 'date']
+    search_fields = ['kiosk']
+    ordering = ['-date', 'agency', 'kiosk', 'prefix']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(SlotOccupancy)
+class SlotOccupancyAdmin(admin.ModelAdmin):
+    list_display = ['slot', 'date', 'booked', 'updated_at']
+    list_filter = ['slot__agency', 'date']
+    ordering = ['-date', 'slot']
+    readonly_fields = ['updated_at']
@@ -0,0 +1,120 @@
+"""
+Disponibilité des créneaux de rendez-vous
+
+La page de réservation publique interroge la disponibilité de chaque jour
+consulté. Pour une plage de jours, le calcul se fait en deux requêtes:
+les créneaux actifs de l'agence, et les rendez-vous en attente ou
+confirmés de la plage, groupés par (date, heure). Les rendez-vous sont
+ensuite répartis dans les créneaux en mémoire.
+
+Le résultat de chaque (agence, jour) est gardé en cache. Il est invalidé
+par les signaux dès qu'un rendez-vous de ce jour est créé, modifié ou
+annulé; une modification des créneaux de l'agence change sa version et
+invalide tous ses jours d'un coup.
+"""
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Appointment, TimeSlot
+
+BOOKED_STATUSES = ('pending', 'confirmed')
+
+# Plage maximale d'une requête (une semaine affichée, avec de la marge)
+MAX_RANGE_DAYS = 31
+
+
+def _ttl():
+    return getattr(settings, 'APPOINTMENT_AVAILABILITY_TTL', 3600)
+
+
+def _version_key(agency_id):
+    return f'appointments:availability:{agency_id}:version'
+
+
+def _day_key(agency_id, version, day):
+    return f'appointments:availability:{agency_id}:{version}:{day.isoformat()}'
+
+
+def _version(agency_id):
+    key = _version_key(agency_id)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, None):
+            version = cache.get(key) or version
+    return version
+
+
+def invalidate_day(agency_id, day):
+    """Un rendez-vous de ce jour a changé"""
+    cache.delete(_day_key(agency_id, _version(agency_id), day))
+
+
+def invalidate_agency(agency_id):
+    """Les créneaux de l'agence ont changé: tous ses jours sont périmés"""
+    cache.delete(_version_key(agency_id))
+
+
+def _compute(agency_id, days):
+    """Créneaux de chaque jour avec leurs places restantes (deux requêtes)"""
+    from .serializers import TimeSlotSerializer
+
+    slots = TimeSlot.objects.filter(agency_id=agency_id, is_active=True).select_related('agency')
+    slots_by_weekday = defaultdict(list)
+    for slot, data in zip(slots, TimeSlotSerializer(slots, many=True).data):
+        slots_by_weekday[slot.day_of_week].append((slot, dict(data)))
+
+    booked = defaultdict(list)
+    rows = (
+        Appointment.objects.filter(
+            agency_id=agency_id,
+            date__gte=min(days),
+            date__lte=max(days),
+            status__in=BOOKED_STATUSES,
+        )
+        .values('date', 'time')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    for row in rows:
+        booked[row['date']].append((row['time'], row['count']))
+
+    result = {}
+    for day in days:
+        entries = []
+        for slot, data in slots_by_weekday.get(day.weekday(), []):
+            taken = sum(count for at, count in booked[day] if slot.start_time <= at < slot.end_time)
+            entries.append({**data, 'available_spots': slot.max_appointments - taken})
+        result[day] = entries
+    return result
+
+
+def availability(agency_id, start, end=None):
+    """
+    Créneaux disponibles de start à end inclus: {jour: [créneaux]}.
+
+    Chaque créneau porte ses places restantes (available_spots); les
+    créneaux complets sont omis.
+    """
+    end = end or start
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    version = _version(agency_id)
+    keys = {day: _day_key(agency_id, version, day) for day in days}
+
+    cached = cache.get_many(list(keys.values()))
+    result = {day: cached[key] for day, key in keys.items() if key in cached}
+    missing = [day for day in days if day not in result]
+    if missing:
+        computed = _compute(agency_id, missing)
+        cache.set_many({keys[day]: entries for day, entries in computed.items()}, _ttl())
+        result.update(computed)
+
+    return {
+        day: [entry for entry in result[day] if entry['available_spots'] > 0]
+        for day in days
+    }
@@ -0,0 +1,137 @@
+"""
+Réservation des rendez-vous dans la capacité des créneaux
+
+Chaque (créneau, jour) possède un compteur SlotOccupancy. Une place est
+prise par un UPDATE conditionnel (booked = booked + 1 WHERE booked <
+capacité): la base sérialise les réservations concurrentes et un créneau
+ne peut pas être surréservé. La place est libérée quand le rendez-vous
+quitte les statuts réservés (annulation, absence, fin), change de
+créneau ou est supprimé, dans la même transaction que l'enregistrement
+ou la suppression du rendez-vous.
+
+Un rendez-vous pris à une heure sans créneau actif n'est pas compté
+(comportement antérieur, utilisé par les agents).
+
+Les codes de confirmation sont tirés au hasard (secrets) dans un alphabet
+sans caractères ambigus; une collision avec un code existant est
+rattrapée en retirant un nouveau code, sans erreur pour le client.
+"""
+import secrets
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Appointment, SlotOccupancy, TimeSlot
+
+BOOKED_STATUSES = ('pending', 'confirmed')
+
+CODE_ALPHABET = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+CODE_LENGTH = 8
+CODE_ATTEMPTS = 5
+
+
+class SlotUnavailable(Exception):
+    """Le créneau demandé est complet"""
+
+
+def generate_confirmation_code():
+    return ''.join(secrets.choice(CODE_ALPHABET) for _ in range(CODE_LENGTH))
+
+
+def find_slot(agency_id, day, at):
+    """Créneau actif de l'agence contenant cette heure ce jour-là"""
+    return TimeSlot.objects.filter(
+        agency_id=agency_id,
+        day_of_week=day.weekday(),
+        start_time__lte=at,
+        end_time__gt=at,
+        is_active=True,
+    ).order_by('start_time').first()
+
+
+def _booked_count(slot, day):
+    """Rendez-vous déjà réservés dans le créneau (avant la création du compteur)"""
+    return Appointment.objects.filter(
+        agency_id=slot.agency_id,
+        date=day,
+        time__gte=slot.start_time,
+        time__lt=slot.end_time,
+        status__in=BOOKED_STATUSES,
+    ).count()
+
+
+def reserve(slot, day):
+    """Prendre une place du créneau; lève SlotUnavailable s'il est complet"""
+    occupancy = SlotOccupancy.objects.filter(slot=slot, date=day)
+    for _ in range(2):
+        if occupancy.filter(booked__lt=slot.max_appointments).update(
+            booked=F('booked') + 1, updated_at=timezone.now()
+        ):
+            return
+        if occupancy.exists():
+            raise SlotUnavailable(f"Le créneau {slot} est complet le {day:%d/%m/%Y}")
+        # Première réservation suivie pour ce créneau et ce jour
+        booked = _booked_count(slot, day)
+        try:
+            with transaction.atomic():
+                SlotOccupancy.objects.create(slot=slot, date=day, booked=booked)
+        except IntegrityError:
+            # Créé entre-temps par une autre réservation
+            pass
+
+
+def release(slot, day):
+    SlotOccupancy.objects.filter(slot=slot, date=day, booked__gt=0).update(
+        booked=F('booked') - 1, updated_at=timezone.now()
+    )
+
+
+def release_deleted(appointment):
+    """Rendre la place d'un rendez-vous supprimé (appelé dans la transaction de suppression)"""
+    previous = getattr(appointment, '_loaded_booking', None)
+    booking = _booking(*previous) if previous else None
+    if booking:
+        release(*booking)
+
+
+def _booking(agency_id, day, at, status):
+    if status not in BOOKED_STATUSES or not (agency_id and day and at):
+        return None
+    slot = find_slot(agency_id, day, at)
+    return (slot, day) if slot else None
+
+
+def save_appointment(appointment, save, *args, **kwargs):
+    """
+    Enregistrer un rendez-vous (save: Model.save) en tenant à jour
+    l'occupation des créneaux quitté et rejoint.
+    """
+    previous = getattr(appointment, '_loaded_booking', None)
+    # Créneaux résolus hors transaction: la transaction commence par l'écriture du compteur
+    old = _booking(*previous) if previous else None
+    new = _booking(appointment.agency_id, appointment.date, appointment.time, appointment.status)
+    if old and new and (old[0].pk, old[1]) == (new[0].pk, new[1]):
+        old = new = None
+
+    with transaction.atomic():
+        if new:
+            reserve(*new)
+        if old:
+            release(*old)
+
+        if appointment.confirmation_code:
+            save(*args, **kwargs)
+        else:
+            for attempt in range(CODE_ATTEMPTS):
+                appointment.confirmation_code = generate_confirmation_code()
+                try:
+                    with transaction.atomic():
+                        save(*args, **kwargs)
+                    break
+                except IntegrityError:
+                    taken = Appointment.objects.filter(confirmation_code=appointment.confirmation_code).exists()
+                    if not taken or attempt == CODE_ATTEMPTS - 1:
+                        raise
+
+    appointment._loaded_booking = (appointment.agency_id, appointment.date, appointment.time, appointment.status)
@@ -0,0 +1,114 @@
+"""
+Conversion groupée des rendez-vous confirmés en tickets de file
+
+Chaque matin, les rendez-vous confirmés d'une agence deviennent des
+tickets prioritaires. Au lieu d'un appel par rendez-vous, une fenêtre
+horaire entière est convertie en une transaction et quelques requêtes:
+
+- lecture (verrouillée) des rendez-vous confirmés sans ticket;
+- une plage de numéros par préfixe de service (un seul UPDATE du
+  compteur de l'agence);
+- création des tickets en une insertion groupée;
+- rattachement des tickets aux rendez-vous en une mise à jour groupée;
+- libération des places de créneau, une mise à jour par créneau.
+
+L'insertion groupée ne déclenche pas les signaux: l'état en direct des
+files est reconstruit et les écrans sont notifiés après validation (ces
+arrivées programmées ne nourrissent pas l'estimateur d'attente).
+"""
+from collections import Counter as Tally, defaultdict
+from datetime import date
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import availability, feed, live_state
+from .models import Appointment, QueueTicket, SlotOccupancy, TimeSlot
+from .ticketing import allocate_ticket_numbers, format_ticket_number, ticket_prefix
+
+APPOINTMENT_PRIORITY = 'priority'
+
+
+def pending_conversions(agency_id, day, start=None, end=None):
+    """Rendez-vous confirmés du jour, sans ticket, dans la fenêtre [start, end]"""
+    queryset = Appointment.objects.filter(
+        agency_id=agency_id, date=day, status='confirmed', queue_ticket__isnull=True,
+    )
+    if start:
+        queryset = queryset.filter(time__gte=start)
+    if end:
+        queryset = queryset.filter(time__lte=end)
+    return queryset.order_by('time', 'created_at')
+
+
+def _release_slots(agency_id, day, appointments):
+    """Libérer les places des rendez-vous convertis (une mise à jour par créneau)"""
+    slots = list(TimeSlot.objects.filter(agency_id=agency_id, day_of_week=day.weekday(), is_active=True).order_by('start_time'))
+    released = Tally()
+    for appointment in appointments:
+        slot = next((s for s in slots if s.start_time <= appointment.time < s.end_time), None)
+        if slot:
+            released[slot.pk] += 1
+    for slot_id, count in released.items():
+        SlotOccupancy.objects.filter(slot_id=slot_id, date=day, booked__gte=count).update(
+            booked=F('booked') - count, updated_at=timezone.now(),
+        )
+
+
+def convert_appointments(agency_id, day=None, start=None, end=None):
+    """
+    Convertir en tickets les rendez-vous confirmés d'une agence pour un
+    jour (et une fenêtre horaire). Retourne les tickets créés, dans l'ordre
+    des rendez-vous.
+    """
+    day = day or date.today()
+    with transaction.atomic():
+        appointments = list(
+            pending_conversions(agency_id, day, start, end)
+            .select_for_update()
+            # Services lus à part: une jointure les verrouillerait aussi
+            .prefetch_related('service')
+        )
+        if not appointments:
+            return []
+
+        by_prefix = defaultdict(list)
+        for appointment in appointments:
+            by_prefix[ticket_prefix(appointment.service)].append(appointment)
+
+        tickets = []
+        for prefix, group in by_prefix.items():
+            first = allocate_ticket_numbers(agency_id, day, prefix, len(group))
+            for offset, appointment in enumerate(group):
+                ticket = QueueTicket(
+                    agency_id=agency_id,
+                    service=appointment.service,
+                    ticket_number=format_ticket_number(prefix, first + offset),
+                    client_name=appointment.client_name,
+                    client_phone=appointment.client_phone,
+                    user_id=appointment.user_id,
+                    priority=APPOINTMENT_PRIORITY,
+                    date=day,
+                )
+                appointment.queue_ticket = ticket
+                tickets.append(ticket)
+        QueueTicket.objects.bulk_create(tickets)
+
+        now = timezone.now()
+        for appointment in appointments:
+            appointment.queue_ticket_id = appointment.queue_ticket.pk
+            appointment.status = 'in_progress'
+            appointment.updated_at = now
+        Appointment.objects.bulk_update(appointments, ['queue_ticket', 'status', 'updated_at'])
+        _release_slots(agency_id, day, appointments)
+
+        def notify():
+            live_state.invalidate(agency_id, day)
+            availability.invalidate_day(agency_id, day)
+            for ticket in tickets:
+                feed.publish_ticket(ticket, 'created')
+
+        transaction.on_commit(notify, robust=True)
+
+    return [appointment.queue_ticket for appointment in appointments]
@@ -0,0 +1,135 @@
+"""
+Répartition des tickets entre les guichets
+
+Un guichet n'appelle que les tickets des services qu'il traite. La table
+guichet -> services de chaque agence est précalculée et gardée en cache
+(invalidée par les signaux des guichets): un appel ne relit pas la table
+d'association.
+
+Le prochain ticket est choisi en deux temps: les premiers tickets dans
+l'ordre d'appel sont lus sans verrou, puis verrouillés par clé primaire
+(SELECT ... FOR UPDATE SKIP LOCKED): deux guichets qui appellent au même
+instant obtiennent deux tickets différents, sans s'attendre l'un l'autre.
+Verrouiller directement la requête triée ne suffit pas sous MySQL/InnoDB:
+une lecture verrouillante pose un verrou sur chaque ligne parcourue, et le
+tri par rang calculé les parcourt toutes; le guichet suivant sauterait
+alors toute la file. Si tous les candidats sont pris entre-temps, la
+lecture est refaite sur une fenêtre plus large.
+
+L'ordre d'appel est celui de QueueTicket.in_call_order, vieillissement des
+priorités compris.
+"""
+import uuid
+from datetime import date
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Counter, QueueTicket
+
+SERVICE_MAP_TIMEOUT = 24 * 3600
+
+# Tickets lus (sans verrou) avant d'en verrouiller un, fenêtre élargie à chaque essai
+CALL_CANDIDATES = 8
+CALL_ATTEMPTS = 4
+
+
+def _map_key(agency_id):
+    return f'appointments:counter-services:{agency_id}'
+
+
+def counter_service_map(agency_id):
+    """Guichets actifs de l'agence -> identifiants des services traités"""
+    key = _map_key(agency_id)
+    services = cache.get(key)
+    if services is None:
+        services = {
+            str(counter_id): []
+            for counter_id in Counter.objects.filter(agency_id=agency_id, is_active=True).values_list('id', flat=True)
+        }
+        links = Counter.services.through.objects.filter(
+            counter__agency_id=agency_id, counter__is_active=True,
+        ).values_list('counter_id', 'servicetype_id')
+        for counter_id, service_id in links:
+            services[str(counter_id)].append(str(service_id))
+        cache.set(key, services, SERVICE_MAP_TIMEOUT)
+    return services
+
+
+def invalidate_service_map(agency_id):
+    cache.delete(_map_key(agency_id))
+
+
+def resolve_counter(agency_id, counter_id):
+    """
+    Guichet désigné par la requête, ou None pour un identifiant qui n'est
+    pas celui d'un guichet enregistré (le frontend guichet génère des
+    identifiants 'counter-<horodatage>').
+    """
+    try:
+        counter_id = uuid.UUID(str(counter_id))
+    except ValueError:
+        return None
+    if str(counter_id) not in counter_service_map(agency_id):
+        return None
+    return Counter.objects.filter(pk=counter_id).first()
+
+
+def call_next(agency_id, counter=None, served_by=None, notes=None, now=None):
+    """
+    Appeler le prochain ticket en attente de l'agence pour ce guichet.
+
+    Avec un guichet enregistré, seuls les tickets de ses services sont
+    appelés, et le ticket lui est rattaché (counter, current_ticket). Sans
+    guichet, tous les services de l'agence sont servis.
+
+    Retourne le ticket appelé, ou None si aucun ticket n'est disponible.
+    """
+    now = now or timezone.now()
+    queryset = QueueTicket.objects.filter(agency_id=agency_id, date=date.today(), status='waiting')
+    if counter is not None:
+        queryset = queryset.filter(service_id__in=counter_service_map(agency_id).get(str(counter.pk), []))
+
+    for attempt in range(1, CALL_ATTEMPTS + 1):
+        ids = list(
+            QueueTicket.in_call_order(queryset, now=now).values_list('pk', flat=True)[:CALL_CANDIDATES * attempt]
+        )
+        if not ids:
+            return None
+        ticket = _call(ids, now, counter, served_by, notes)
+        if ticket is not None:
+            return ticket
+    return None
+
+
+def _call(ids, now, counter, served_by, notes):
+    """Verrouiller et appeler le premier de ces tickets encore en attente, None s'ils sont tous pris"""
+    with transaction.atomic():
+        # Verrou posé par clé primaire; les tickets verrouillés par un autre guichet sont sautés
+        ticket = (
+            QueueTicket.in_call_order(QueueTicket.objects.filter(pk__in=ids, status='waiting'), now=now)
+            .select_for_update(skip_locked=True)
+            .first()
+        )
+        if ticket is None:
+            return None
+
+        ticket.status = 'called'
+        ticket.called_at = now
+        ticket.counter = counter
+        update_fields = ['status', 'called_at', 'counter']
+        if served_by is not None:
+            ticket.served_by = served_by
+            update_fields.append('served_by')
+        if notes is not None:
+            ticket.notes = notes
+            update_fields.append('notes')
+        ticket.save(update_fields=update_fields)
+
+        if counter is not None:
+            counter.current_ticket = ticket
+            counter.status = 'busy'
+            counter.save(update_fields=['current_ticket', 'status', 'updated_at'])
+
+    return ticket
@@ -0,0 +1,306 @@
+"""
+Flux temps réel des files d'attente (Server-Sent Events)
+
+Les moniteurs, bornes et guichets ouvrent un flux par agence
+(/api/appointments/queue/feed/?agency=<id>) au lieu d'interroger display,
+stats et check en boucle. À la connexion, ils reçoivent un instantané de
+l'écran, puis des deltas compacts à chaque changement de ticket (création,
+appel, rappel, fin, absence, transfert) ou de guichet.
+
+Chaque événement porte un numéro croissant par agence. À la reconnexion,
+EventSource renvoie Last-Event-ID: les événements manqués sont rejoués
+depuis l'historique de la couche s'ils y sont encore, sinon un nouvel
+instantané est envoyé.
+
+La couche de diffusion est choisie par QUEUE_FEED_LAYER:
+- InMemoryFeedLayer (défaut): dans le processus, pour le développement,
+  les tests et un serveur ASGI unique;
+- RedisFeedLayer: pub/sub Redis, pour plusieurs processus (et les
+  workers Celery qui modifient des tickets).
+
+Le flux nécessite un serveur ASGI (uvicorn). En production, il est servi
+par un processus séparé (« feed » du Procfile, service mwolo-feed de
+render.yaml) avec RedisFeedLayer; l'API reste servie en WSGI avec ses
+threads, un worker ASGI n'exécutant les vues synchrones que sur un thread.
+
+Django 4.2 ne détecte pas la déconnexion d'un client pendant une réponse
+en streaming: chaque flux est donc clos après QUEUE_FEED_MAX_SECONDS, et
+le navigateur se reconnecte aussitôt sans perte d'événement.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+from . import live_state
+
+BACKLOG_SIZE = 200
+KEEPALIVE_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+
+
+def _missed(backlog, current, last_id):
+    """Événements postérieurs à last_id, ou None s'ils ne sont plus tous disponibles"""
+    if last_id > current:
+        return None
+    missed = [message for message in backlog if message['id'] > last_id]
+    if len(missed) != current - last_id:
+        return None
+    return missed
+
+
+class InMemoryFeedLayer:
+    """Diffusion dans le processus courant"""
+
+    def __init__(self, backlog=BACKLOG_SIZE):
+        self._lock = threading.Lock()
+        self._sequences = defaultdict(int)
+        self._backlogs = defaultdict(lambda: deque(maxlen=backlog))
+        self._subscribers = defaultdict(set)
+
+    def publish(self, agency_id, event):
+        """Diffuser un événement (appelable depuis n'importe quel thread)"""
+        agency_id = str(agency_id)
+        with self._lock:
+            self._sequences[agency_id] += 1
+            message = {'id': self._sequences[agency_id], **event}
+            self._backlogs[agency_id].append(message)
+            subscribers = list(self._subscribers[agency_id])
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, message)
+            except RuntimeError:
+                # Boucle fermée: abonné parti sans se désinscrire
+                pass
+        return message['id']
+
+    def last_id(self, agency_id):
+        return self._sequences.get(str(agency_id), 0)
+
+    def since(self, agency_id, last_id):
+        agency_id = str(agency_id)
+        with self._lock:
+            return _missed(list(self._backlogs[agency_id]), self._sequences[agency_id], last_id)
+
+    def subscribe(self, agency_id):
+        return InMemorySubscription(self, str(agency_id))
+
+
+class InMemorySubscription:
+
+    def __init__(self, layer, agency_id):
+        self.layer = layer
+        self.agency_id = agency_id
+        self.queue = asyncio.Queue()
+        self._entry = None
+
+    async def open(self):
+        self._entry = (asyncio.get_running_loop(), self.queue)
+        with self.layer._lock:
+            self.layer._subscribers[self.agency_id].add(self._entry)
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        with self.layer._lock:
+            self.layer._subscribers[self.agency_id].discard(self._entry)
+
+
+class RedisFeedLayer:
+    """Diffusion entre processus par pub/sub Redis (historique dans une liste)"""
+
+    def __init__(self, url=None, backlog=BACKLOG_SIZE):
+        import redis
+
+        self.url = url or getattr(settings, 'QUEUE_FEED_REDIS_URL', 'redis://localhost:6379/0')
+        self.backlog = backlog
+        self.client = redis.Redis.from_url(self.url)
+
+    @staticmethod
+    def _key(agency_id, suffix):
+        return f'appointments:queue-feed:{agency_id}:{suffix}'
+
+    def publish(self, agency_id, event):
+        sequence_key = self._key(agency_id, 'seq')
+        backlog_key = self._key(agency_id, 'backlog')
+        message_id = self.client.incr(sequence_key)
+        payload = json.dumps({'id': message_id, **event}, cls=DjangoJSONEncoder)
+
+        pipe = self.client.pipeline()
+        pipe.rpush(backlog_key, payload)
+        pipe.ltrim(backlog_key, -self.backlog, -1)
+        pipe.expire(backlog_key, 24 * 3600)
+        pipe.expire(sequence_key, 24 * 3600)
+        pipe.publish(self._key(agency_id, 'events'), payload)
+        pipe.execute()
+        return message_id
+
+    def last_id(self, agency_id):
+        return int(self.client.get(self._key(agency_id, 'seq')) or 0)
+
+    def since(self, agency_id, last_id):
+        pipe = self.client.pipeline()
+        pipe.get(self._key(agency_id, 'seq'))
+        pipe.lrange(self._key(agency_id, 'backlog'), 0, -1)
+        current, backlog = pipe.execute()
+        return _missed([json.loads(item) for item in backlog], int(current or 0), last_id)
+
+    def subscribe(self, agency_id):
+        return RedisSubscription(self.url, self._key(agency_id, 'events'))
+
+
+class RedisSubscription:
+
+    def __init__(self, url, channel):
+        import redis.asyncio
+
+        self.client = redis.asyncio.Redis.from_url(url)
+        self.pubsub = self.client.pubsub()
+        self.channel = channel
+
+    async def open(self):
+        await self.pubsub.subscribe(self.channel)
+
+    async def get(self, timeout):
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        return json.loads(message['data']) if message else None
+
+    async def close(self):
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+@lru_cache(maxsize=None)
+def get_feed_layer():
+    """Couche de diffusion configurée (une instance par processus)"""
+    path = getattr(settings, 'QUEUE_FEED_LAYER', 'appointments.feed.InMemoryFeedLayer')
+    return import_string(path)()
+
+
+def ticket_action(ticket, created):
+    """Nature du changement d'un ticket, d'après le statut chargé depuis la base"""
+    previous = getattr(ticket, '_loaded_status', None)
+    if created:
+        return 'created'
+    if ticket.status == 'called':
+        return 'recalled' if previous == 'called' else 'called'
+    if ticket.status == 'waiting' and previous in ('called', 'serving'):
+        return 'transferred'
+    return ticket.status
+
+
+def publish_ticket(ticket, action):
+    """Diffuser le delta d'un ticket avec les compteurs à jour de la file"""
+    state = live_state.get_state(ticket.agency_id, ticket.date)
+    get_feed_layer().publish(ticket.agency_id, {
+        'type': 'ticket',
+        'action': action,
+        'ticket': {
+            'id': str(ticket.pk),
+            'ticket_number': ticket.ticket_number,
+            'status': ticket.status,
+            'priority': ticket.priority,
+            'service_name': ticket.service.name if ticket.service_id else None,
+            'counter_number': ticket.counter.number if ticket.counter_id else None,
+            'called_at': ticket.called_at,
+            'notes': ticket.notes,
+        },
+        'stats': live_state.queue_stats(state) if state else None,
+    })
+
+
+def publish_counters(agency_id, counters):
+    get_feed_layer().publish(agency_id, {
+        'type': 'counters',
+        'counters': [
+            {
+                'id': counter['id'],
+                'number': counter['number'],
+                'name': counter['name'],
+                'status': counter['status'],
+                'current_ticket_number': counter.get('current_ticket_number'),
+            }
+            for counter in counters
+        ],
+    })
+
+
+def format_event(message):
+    """Encoder un message au format SSE"""
+    data = {key: value for key, value in message.items() if key not in ('id', 'type')}
+    return (
+        f"id: {message['id']}\n"
+        f"event: {message['type']}\n"
+        f"data: {json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))}\n\n"
+    )
+
+
+def _parse_event_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+async def event_stream(agency_id, last_event_id=None, keepalive=KEEPALIVE_SECONDS, max_seconds=None):
+    """
+    Générateur SSE d'une agence: reprise ou instantané, puis deltas.
+    """
+    layer = get_feed_layer()
+    max_seconds = max_seconds or getattr(settings, 'QUEUE_FEED_MAX_SECONDS', 300)
+    deadline = time.monotonic() + max_seconds
+
+    # S'abonner avant de lire l'état: aucun événement ne peut être manqué
+    subscription = layer.subscribe(agency_id)
+    await subscription.open()
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+
+        last_id = _parse_event_id(last_event_id)
+        missed = None
+        if last_id is not None:
+            missed = await sync_to_async(layer.since)(agency_id, last_id)
+
+        if missed is not None:
+            current = last_id
+            for message in missed:
+                current = message['id']
+                yield format_event(message)
+        else:
+            current = await sync_to_async(layer.last_id)(agency_id)
+            state = await sync_to_async(live_state.get_state)(agency_id)
+            if state is None:
+                return
+            yield format_event({
+                'id': current,
+                'type': 'snapshot',
+                **live_state.display_payload(state),
+                'stats': live_state.queue_stats(state),
+            })
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            message = await subscription.get(min(keepalive, remaining))
+            if message is None:
+                yield ": ping\n\n"
+                continue
+            # Déjà inclus dans l'instantané ou la reprise
+            if message['id'] <= current:
+                continue
+            current = message['id']
+            yield format_event(message)
+    finally:
+        await subscription.close()
@@ -0,0 +1,490 @@
+"""
+État en direct des files d'attente (écrans moniteurs, bornes, suivi client)
+
+Pour chaque (agence, jour), un index compact est conservé dans le cache:
+file d'attente triée, tickets appelés, compteurs par statut, cumul des
+temps d'attente, guichets ouverts et, pour les seuls tickets actifs, ce qu'il
+faut pour les positionner et estimer leur attente. Chaque ticket du jour a
+de plus sa propre clé (entrée déjà sérialisée) et chaque numéro la sienne.
+L'ensemble est tenu à jour de façon incrémentale par les signaux (création,
+appel, fin, absence, transfert...) après validation de la transaction, et
+reconstruit depuis la base quand l'index est absent ou expiré.
+
+Une écriture ne relit et ne réécrit ainsi que l'index et l'entrée du
+ticket: son coût ne dépend plus des tickets clôturés de la journée. Les
+lectures (display, stats, check) ne touchent pas la base. Chaque processus
+garde l'index décodé tant que sa version (une petite clé du cache) n'a pas
+changé, et les entrées décodées tant que leur révision dans l'index est la
+même: un moniteur ne relit que les tickets modifiés depuis son dernier
+affichage.
+
+Chaque mise à jour se fait sous un verrou court du cache. Si le verrou ne
+peut être obtenu, l'index est supprimé plutôt que de risquer une écriture
+perdue: le lecteur suivant le reconstruit. Une génération par clé empêche
+une reconstruction commencée avant une écriture d'enregistrer un index
+périmé.
+"""
+import time
+import uuid
+from bisect import bisect_left, insort
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import wait_estimator
+from .models import Counter, QueueTicket
+
+ACTIVE_STATUSES = ('waiting', 'called', 'serving')
+STATUSES = [code for code, _ in QueueTicket.STATUS_CHOICES]
+
+LOCK_TIMEOUT = 5
+LOCK_WAIT = 0.5
+
+# Les entrées des tickets et des numéros vivent le temps de la journée
+ENTRY_TTL = 24 * 3600
+
+# États décodés par processus: clé -> état (comparé par version)
+_decoded = {}
+DECODED_MAX = 256
+# Entrées décodées par processus: clé -> entrée (comparée par révision)
+_decoded_entries = {}
+DECODED_ENTRIES_MAX = 4096
+
+
+def _key(agency_id, day):
+    return f'appointments:queue-state:{agency_id}:{day.isoformat()}'
+
+
+def _ticket_key(key, ticket_id):
+    return f'{key}:t:{ticket_id}'
+
+
+def _number_key(key, number):
+    return f'{key}:n:{number}'
+
+
+def _ttl():
+    return getattr(settings, 'QUEUE_LIVE_STATE_TTL', 300)
+
+
+def queue_sort_key(ticket):
+    """
+    Ordre de la file d'attente, celui de QueueTicket.in_call_order.
+
+    Le vieillissement des priorités (QUEUE_PRIORITY_AGING_MINUTES,
+    désactivé par défaut) n'y est pas reporté: s'il est activé, l'affichage
+    peut différer de l'appel pour les tickets qui attendent longtemps.
+    """
+    rank = QueueTicket.PRIORITY_RANK.get(ticket.priority, len(QueueTicket.PRIORITY_RANK))
+    return [rank, ticket.created_at.isoformat()]
+
+
+def ticket_entry(ticket):
+    """Représentation d'un ticket dans l'état (calculée une fois, à l'écriture)"""
+    from .serializers import QueueTicketSerializer
+
+    wait = None
+    if ticket.status == 'completed' and ticket.called_at and ticket.created_at:
+        wait = (ticket.called_at - ticket.created_at).total_seconds()
+    return {
+        'id': str(ticket.pk),
+        'rev': uuid.uuid4().hex,
+        'number': ticket.ticket_number,
+        'status': ticket.status,
+        'key': queue_sort_key(ticket),
+        'called_at': ticket.called_at.isoformat() if ticket.called_at else '',
+        'wait': wait,
+        'service': str(ticket.service_id) if ticket.service_id else None,
+        'duration': ticket.service.estimated_duration if ticket.service_id else 15,
+        'data': dict(QueueTicketSerializer(ticket).data) if ticket.status in ACTIVE_STATUSES else None,
+    }
+
+
+def serialize_counters(agency_id):
+    """Guichets ouverts de l'agence, tels qu'affichés sur le moniteur"""
+    from .serializers import CounterSerializer
+
+    counters = Counter.objects.filter(
+        agency_id=agency_id,
+        is_active=True,
+        status__in=['available', 'busy'],
+    ).select_related('agency', 'current_ticket', 'current_agent').prefetch_related('services')
+    return [dict(data) for data in CounterSerializer(counters, many=True).data]
+
+
+def _empty_state(key, agency):
+    return {
+        'key': key,
+        'version': uuid.uuid4().hex,
+        'agency_name': agency.name,
+        'active': {},       # id -> statut, clé, service, durée et révision (tickets actifs)
+        'waiting': [],      # [clé..., id] triés
+        'called': [],       # [appelé le, id] triés (tickets appelés ou en service)
+        'counts': dict.fromkeys(STATUSES, 0),
+        'wait_sum': 0.0,
+        'wait_count': 0,
+        'counters': [],
+        'estimates': {},    # résumé des estimateurs d'attente de l'agence et de ses services
+    }
+
+
+def _discard(state, entry):
+    """Retirer de l'index l'ancienne version d'un ticket"""
+    ticket_id = entry['id']
+    state['counts'][entry['status']] -= 1
+    state['active'].pop(ticket_id, None)
+    if entry['status'] == 'waiting':
+        item = entry['key'] + [ticket_id]
+        index = bisect_left(state['waiting'], item)
+        if index < len(state['waiting']) and state['waiting'][index] == item:
+            del state['waiting'][index]
+    if entry['status'] in ('called', 'serving'):
+        item = [entry['called_at'], ticket_id]
+        if item in state['called']:
+            state['called'].remove(item)
+    if entry['wait'] is not None:
+        state['wait_sum'] -= entry['wait']
+        state['wait_count'] -= 1
+
+
+def _add(state, entry):
+    ticket_id = entry['id']
+    state['counts'][entry['status']] += 1
+    if entry['status'] in ACTIVE_STATUSES:
+        state['active'][ticket_id] = {
+            field: entry[field] for field in ('status', 'key', 'service', 'duration', 'rev')
+        }
+    if entry['status'] == 'waiting':
+        insort(state['waiting'], entry['key'] + [ticket_id])
+    if entry['status'] in ('called', 'serving'):
+        insort(state['called'], [entry['called_at'], ticket_id])
+    if entry['wait'] is not None:
+        state['wait_sum'] += entry['wait']
+        state['wait_count'] += 1
+
+
+def _store_entries(key, entries):
+    """Enregistrer les entrées des tickets et leurs numéros"""
+    values = {}
+    for entry in entries:
+        values[_ticket_key(key, entry['id'])] = entry
+        values[_number_key(key, entry['number'])] = entry['id']
+    cache.set_many(values, ENTRY_TTL)
+
+
+def build_state(agency_id, day=None):
+    """Reconstruire l'état depuis la base (None si l'agence est introuvable ou inactive)"""
+    from agencies.models import Agency
+
+    day = day or date.today()
+    agency = Agency.objects.filter(id=agency_id, is_active=True).first()
+    if not agency:
+        return None
+
+    state = _empty_state(_key(agency_id, day), agency)
+    # Entrées de tous les tickets: retirées de l'état quand il est mis en cache
+    state['tickets'] = {}
+    tickets = QueueTicket.objects.filter(agency_id=agency_id, date=day).select_related(
+        'agency', 'service', 'counter', 'served_by'
+    )
+    for ticket in tickets:
+        entry = ticket_entry(ticket)
+        state['tickets'][entry['id']] = entry
+        _add(state, entry)
+    state['counters'] = serialize_counters(agency_id)
+    state['estimates'] = wait_estimator.agency_snapshot(
+        agency_id, {entry['service'] for entry in state['tickets'].values() if entry['service']}
+    )
+    return state
+
+
+def _remember(key, state):
+    if len(_decoded) >= DECODED_MAX:
+        _decoded.clear()
+    _decoded[key] = state
+
+
+def get_state(agency_id, day=None):
+    """
+    État de la file d'une agence, reconstruit depuis la base si absent.
+
+    L'état retourné peut être partagé entre requêtes: ne pas le modifier.
+    """
+    day = day or date.today()
+    key = _key(agency_id, day)
+
+    version = cache.get(f'{key}:version')
+    known = _decoded.get(key)
+    if version is not None and known is not None and known['version'] == version:
+        return known
+
+    state = cache.get(key)
+    if state is None:
+        generation = cache.get(f'{key}:gen', 0)
+        state = build_state(agency_id, day)
+        if state is None:
+            return None
+        # Une écriture pendant la reconstruction: ne pas mettre en cache cet état
+        if cache.get(f'{key}:gen', 0) == generation:
+            _store_entries(key, state['tickets'].values())
+            index = {part: value for part, value in state.items() if part != 'tickets'}
+            if cache.get(f'{key}:gen', 0) == generation and cache.add(key, index, _ttl()):
+                cache.set(f'{key}:version', index['version'], _ttl())
+                state = index
+    _remember(key, state)
+    return state
+
+
+def _remember_entry(key, entry):
+    if len(_decoded_entries) >= DECODED_ENTRIES_MAX:
+        _decoded_entries.clear()
+    _decoded_entries[key] = entry
+
+
+def ticket_entries(state, ticket_ids):
+    """Entrées des tickets demandés (id -> entrée), lues en cache au besoin"""
+    ticket_ids = [str(ticket_id) for ticket_id in ticket_ids]
+    if 'tickets' in state:
+        # État reconstruit mais pas mis en cache: il porte toutes les entrées
+        return {ticket_id: state['tickets'][ticket_id] for ticket_id in ticket_ids if ticket_id in state['tickets']}
+
+    entries, missing = {}, []
+    for ticket_id in ticket_ids:
+        known = _decoded_entries.get(_ticket_key(state['key'], ticket_id))
+        rev = state['active'].get(ticket_id, {}).get('rev')
+        if known is not None and rev is not None and known['rev'] == rev:
+            entries[ticket_id] = known
+        else:
+            missing.append(ticket_id)
+    if not missing:
+        return entries
+
+    keys = {_ticket_key(state['key'], ticket_id): ticket_id for ticket_id in missing}
+    for key, entry in cache.get_many(list(keys)).items():
+        entries[keys[key]] = entry
+        _remember_entry(key, entry)
+    lost = [ticket_id for ticket_id in missing if ticket_id not in entries]
+    if lost:
+        # Entrées évincées du cache: relues en base, sans écraser une écriture plus récente
+        tickets = QueueTicket.objects.filter(pk__in=lost).select_related('agency', 'service', 'counter', 'served_by')
+        for ticket in tickets:
+            entry = ticket_entry(ticket)
+            entries[entry['id']] = entry
+            cache.add(_ticket_key(state['key'], entry['id']), entry, ENTRY_TTL)
+    return entries
+
+
+def find_ticket(state, number):
+    """Entrée du ticket portant ce numéro, None s'il est inconnu"""
+    if 'tickets' in state:
+        return next((entry for entry in state['tickets'].values() if entry['number'] == number), None)
+    ticket_id = cache.get(_number_key(state['key'], number))
+    if not ticket_id:
+        return None
+    return ticket_entries(state, [ticket_id]).get(ticket_id)
+
+
+def _bump_generation(key):
+    try:
+        cache.incr(f'{key}:gen')
+    except ValueError:
+        cache.set(f'{key}:gen', 1, 24 * 3600)
+
+
+def _mutate(agency_id, day, apply):
+    """
+    Appliquer `apply(key, state)` sous verrou.
+
+    `state` est l'index en cache, None s'il est absent (il sera reconstruit à
+    la prochaine lecture). `apply` retourne False si l'index ne peut être
+    corrigé: il est alors supprimé.
+    """
+    key = _key(agency_id, day)
+    _bump_generation(key)
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while not cache.add(f'{key}:lock', 1, LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            cache.delete_many([key, f'{key}:version'])
+            return
+        time.sleep(0.01)
+    try:
+        state = cache.get(key)
+        if apply(key, state) is False:
+            cache.delete_many([key, f'{key}:version'])
+            return
+        if state is None:
+            return
+        state['version'] = uuid.uuid4().hex
+        cache.set(key, state, _ttl())
+        cache.set(f'{key}:version', state['version'], _ttl())
+    finally:
+        cache.delete(f'{key}:lock')
+
+
+def record_ticket(ticket, estimates=None, created=False):
+    """Reporter dans l'état la nouvelle version d'un ticket (et l'estimateur à jour)"""
+    entry = ticket_entry(ticket)
+
+    def apply(key, state):
+        previous = cache.get(_ticket_key(key, entry['id']))
+        _store_entries(key, [entry])
+        if previous and previous['number'] != entry['number']:
+            cache.delete(_number_key(key, previous['number']))
+        if state is None:
+            return
+        if previous:
+            _discard(state, previous)
+        elif not created:
+            # Ancienne version évincée du cache: l'index ne peut plus être corrigé
+            return False
+        _add(state, entry)
+        if estimates is not None:
+            # Le résumé ne porte que sur le service du ticket: garder les autres
+            services = {**state['estimates'].get('services', {}), **estimates['services']}
+            state['estimates'] = {**estimates, 'services': services}
+
+    _mutate(ticket.agency_id, ticket.date, apply)
+
+
+def forget_ticket(agency_id, day, ticket_id):
+    def apply(key, state):
+        previous = cache.get(_ticket_key(key, ticket_id))
+        if previous:
+            cache.delete_many([_ticket_key(key, ticket_id), _number_key(key, previous['number'])])
+        if state is None:
+            return
+        if not previous:
+            return False
+        _discard(state, previous)
+
+    _mutate(agency_id, day, apply)
+
+
+def refresh_counters(agency_id, day=None):
+    """Recharger les guichets affichés (changement de statut, de ticket en cours...)"""
+    counters = serialize_counters(agency_id)
+
+    def apply(key, state):
+        if state is not None:
+            state['counters'] = counters
+
+    _mutate(agency_id, day or date.today(), apply)
+    return counters
+
+
+def invalidate(agency_id, day=None):
+    key = _key(agency_id, day or date.today())
+    _bump_generation(key)
+    cache.delete_many([key, f'{key}:version'])
+
+
+def waiting_tickets(state, limit=None):
+    """Tickets en attente, dans l'ordre d'appel, avec leur attente estimée à jour"""
+    counters, idle = open_counters(state), idle_counters(state)
+    ticket_ids = [item[-1] for item in state['waiting'][:limit]]
+    entries = ticket_entries(state, ticket_ids)
+    tickets = []
+    for position, ticket_id in enumerate(ticket_ids, start=1):
+        data = dict(entries[ticket_id]['data'])
+        data['estimated_wait_time'] = wait_estimator.eta_minutes(
+            position, counters, _service_seconds(state, service_id=state['active'][ticket_id]['service']), idle
+        )
+        tickets.append(data)
+    return tickets
+
+
+def called_tickets(state, limit=5):
+    """Derniers tickets appelés ou en service"""
+    ticket_ids = [ticket_id for _, ticket_id in reversed(state['called'][-limit:])]
+    entries = ticket_entries(state, ticket_ids)
+    return [entries[ticket_id]['data'] for ticket_id in ticket_ids]
+
+
+def waiting_position(state, ticket_id):
+    """Position (1 = prochain) d'un ticket en attente, 0 sinon"""
+    ticket_id = str(ticket_id)
+    entry = state['active'].get(ticket_id)
+    if not entry or entry['status'] != 'waiting':
+        return 0
+    return bisect_left(state['waiting'], entry['key'] + [ticket_id]) + 1
+
+
+def position_for_new(state, priority):
+    """Position qu'aurait un ticket créé maintenant avec cette priorité"""
+    rank = QueueTicket.PRIORITY_RANK.get(priority, len(QueueTicket.PRIORITY_RANK))
+    # Tous les tickets en attente de rang inférieur ou égal passent avant lui
+    return bisect_left(state['waiting'], [rank + 1]) + 1
+
+
+def open_counters(state):
+    return max(len(state['counters']), 1)
+
+
+def idle_counters(state):
+    busy = state['counts']['called'] + state['counts']['serving']
+    return max(len(state['counters']) - busy, 0)
+
+
+def _service_seconds(state, default_minutes=wait_estimator.DEFAULT_SERVICE_MINUTES, service_id=None):
+    """Durée de service moyenne (EWMA) du service, sinon de l'agence, sinon la durée par défaut"""
+    estimates = state.get('estimates', {})
+    return (
+        estimates.get('services', {}).get(str(service_id))
+        or estimates.get('service_seconds')
+        or default_minutes * 60
+    )
+
+
+def estimated_wait(state, ticket_id):
+    """Attente estimée (minutes) d'un ticket en attente, 0 sinon"""
+    position = waiting_position(state, ticket_id)
+    if not position:
+        return 0
+    # Sans historique, la durée annoncée du service du ticket
+    entry = state['active'][str(ticket_id)]
+    return wait_estimator.eta_minutes(
+        position, open_counters(state), _service_seconds(state, entry['duration'], entry.get('service')),
+        idle_counters(state),
+    )
+
+
+def estimated_wait_for_new(state, priority, default_minutes=wait_estimator.DEFAULT_SERVICE_MINUTES, service_id=None):
+    """(position, attente estimée en minutes) d'un ticket créé maintenant"""
+    position = position_for_new(state, priority)
+    return position, wait_estimator.eta_minutes(
+        position, open_counters(state), _service_seconds(state, default_minutes, service_id), idle_counters(state)
+    )
+
+
+def average_wait_minutes(state):
+    if not state['wait_count']:
+        return 0
+    return state['wait_sum'] / state['wait_count'] / 60
+
+
+def display_payload(state):
+    """Contenu de l'écran moniteur (hors horodatage)"""
+    return {
+        'agency_name': state['agency_name'],
+        'counters': state['counters'],
+        'waiting_tickets': waiting_tickets(state, limit=20),
+        'called_tickets': called_tickets(state, limit=5),
+        'total_waiting': state['counts']['waiting'],
+        # Attente prévue pour un client qui prendrait un ticket maintenant
+        'avg_wait_time': estimated_wait_for_new(state, 'normal')[1],
+    }
+
+
+def queue_stats(state):
+    counts = state['counts']
+    return {
+        'waiting_count': counts['waiting'],
+        'serving_count': counts['called'] + counts['serving'],
+        'completed_today': counts['completed'],
+        'average_wait_time': round(average_wait_minutes(state), 1),
+        'total_today': sum(counts.values()),
+        'service_time': round(_service_seconds(state) / 60, 1),
+        'arrivals_per_hour': state.get('estimates', {}).get('arrivals_per_hour'),
+    }
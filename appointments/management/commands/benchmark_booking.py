@@ -0,0 +1,106 @@
+"""
+Commande pour mesurer les réservations concurrentes de rendez-vous.
+
+Plusieurs threads (une connexion chacun) réservent en même temps dans des
+créneaux de capacité limitée, au-delà de leur capacité. On mesure le débit
+et on vérifie qu'aucun créneau n'est surréservé et que le compteur
+d'occupation correspond aux rendez-vous enregistrés.
+
+Les données créées (service, créneaux, rendez-vous) sont supprimées à la
+fin. Nécessite une base acceptant plusieurs connexions (pas SQLite en
+mémoire). Usage:
+    python manage.py benchmark_booking --threads 16 --attempts 50 --capacity 100
+"""
+import threading
+import time
+from datetime import date, time as dtime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = "Mesure le débit de réservation concurrent et vérifie l'absence de surréservation"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Réservations en parallèle')
+        parser.add_argument('--attempts', type=int, default=25, help='Tentatives par thread')
+        parser.add_argument('--slots', type=int, default=2, help='Créneaux disputés')
+        parser.add_argument('--capacity', type=int, default=50, help='Capacité de chaque créneau')
+        parser.add_argument('--agency', help='Agence utilisée (la première agence active par défaut)')
+
+    def handle(self, *args, **options):
+        from agencies.models import Agency
+        from appointments.booking import SlotUnavailable
+        from appointments.models import Appointment, ServiceType, SlotOccupancy, TimeSlot
+
+        agencies = Agency.objects.filter(is_active=True)
+        agency = agencies.filter(pk=options['agency']).first() if options['agency'] else agencies.first()
+        if agency is None:
+            raise CommandError('Aucune agence active')
+
+        day = date.today() + timedelta(days=365)
+        service = ServiceType.objects.create(name='Benchmark', code=f'BENCH-{time.time_ns() % 10**8}')
+        slots = [
+            TimeSlot.objects.create(
+                agency=agency, day_of_week=day.weekday(), max_appointments=options['capacity'],
+                start_time=dtime(0, index * 2), end_time=dtime(0, index * 2 + 2),
+            )
+            for index in range(options['slots'])
+        ]
+        results = {'booked': 0, 'full': 0, 'errors': []}
+        lock = threading.Lock()
+        barrier = threading.Barrier(options['threads'])
+
+        def work(worker):
+            try:
+                barrier.wait()
+                for attempt in range(options['attempts']):
+                    slot = slots[(worker + attempt) % len(slots)]
+                    try:
+                        Appointment.objects.create(
+                            agency=agency, service=service, client_name=f'Benchmark {worker}',
+                            client_phone='+243000000000', date=day, time=slot.start_time,
+                        )
+                        outcome = 'booked'
+                    except SlotUnavailable:
+                        outcome = 'full'
+                    with lock:
+                        results[outcome] += 1
+            except Exception as e:
+                with lock:
+                    results['errors'].append(repr(e))
+            finally:
+                connections.close_all()
+
+        try:
+            started = time.perf_counter()
+            threads = [threading.Thread(target=work, args=(worker,)) for worker in range(options['threads'])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            seconds = time.perf_counter() - started
+
+            overbooked = []
+            for slot in slots:
+                count = Appointment.objects.filter(agency=agency, date=day, time=slot.start_time).count()
+                counter = SlotOccupancy.objects.filter(slot=slot, date=day).values_list('booked', flat=True).first()
+                if count > slot.max_appointments or counter != count:
+                    overbooked.append((str(slot.start_time), count, counter))
+        finally:
+            Appointment.objects.filter(agency=agency, date=day, service=service).delete()
+            SlotOccupancy.objects.filter(slot__in=slots).delete()
+            TimeSlot.objects.filter(pk__in=[slot.pk for slot in slots]).delete()
+            service.delete()
+
+        attempts = results['booked'] + results['full']
+        self.stdout.write(
+            f"📅 {attempts} tentative(s) en {seconds:.2f}s ({attempts / seconds:.1f}/s): "
+            f"{results['booked']} réservé(s), {results['full']} refusé(s) (créneau complet)"
+        )
+        for error in results['errors'][:5]:
+            self.stdout.write(self.style.ERROR(f'   {error}'))
+        if overbooked or results['errors']:
+            raise CommandError(f'Incohérences: {overbooked}, {len(results["errors"])} erreur(s)')
+        self.stdout.write(self.style.SUCCESS('✅ Aucune surréservation'))
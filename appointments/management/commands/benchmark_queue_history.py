@@ -0,0 +1,98 @@
+"""
+Commande pour mesurer la latence de display et call_next selon le volume d'historique.
+
+Des tickets terminés des jours précédents sont insérés par paliers
+(--sizes), puis on mesure la reconstruction de l'écran (lecture froide de
+display) et l'appel du prochain ticket sur une file du jour de taille
+fixe. Avec les index (agence, date, statut) les deux doivent rester
+constants quel que soit l'historique.
+
+Tout est fait dans une transaction annulée à la fin: la base n'est pas
+modifiée. Usage:
+    python manage.py benchmark_queue_history --sizes 10000,100000,1000000
+"""
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+BATCH_SIZE = 10000
+TICKETS_PER_DAY = 500
+
+
+def _history(agency, service, start, count):
+    """Tickets terminés répartis sur les jours précédents (non enregistrés)"""
+    from appointments.models import QueueTicket
+
+    now = timezone.now()
+    return [
+        QueueTicket(
+            agency=agency,
+            service=service,
+            ticket_number=f'H{index % TICKETS_PER_DAY:03d}',
+            status='completed',
+            date=date.today() - timedelta(days=1 + index // TICKETS_PER_DAY),
+            called_at=now,
+            completed_at=now,
+        )
+        for index in range(start, start + count)
+    ]
+
+
+def _average_ms(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+class Command(BaseCommand):
+    help = "Mesure display et call_next en fonction du nombre de tickets historiques"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000', help='Paliers de tickets historiques (séparés par des virgules)')
+        parser.add_argument('--waiting', type=int, default=50, help="Tickets en attente aujourd'hui")
+        parser.add_argument('--repeat', type=int, default=20, help='Mesures par palier')
+        parser.add_argument('--agency', help='Agence utilisée (la première agence active par défaut)')
+
+    def handle(self, *args, **options):
+        from agencies.models import Agency
+        from appointments import dispatch, live_state
+        from appointments.models import Counter, QueueTicket, ServiceType
+
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        agencies = Agency.objects.filter(is_active=True)
+        agency = agencies.filter(pk=options['agency']).first() if options['agency'] else agencies.first()
+        if agency is None:
+            raise CommandError('Aucune agence active')
+
+        self.stdout.write(f"{'historique':>12} {'display (ms)':>14} {'call_next (ms)':>16}")
+        with transaction.atomic():
+            service = ServiceType.objects.create(name='Benchmark', code=f'BENCH-{time.time_ns() % 10**8}')
+            counter = Counter.objects.create(agency=agency, number=999, status='available')
+            counter.services.set([service])
+
+            inserted = 0
+            for size in sizes:
+                while inserted < size:
+                    count = min(BATCH_SIZE, size - inserted)
+                    QueueTicket.objects.bulk_create(_history(agency, service, inserted, count))
+                    inserted += count
+
+                # File du jour identique à chaque palier (annulée ensuite)
+                sid = transaction.savepoint()
+                QueueTicket.objects.bulk_create([
+                    QueueTicket(agency=agency, service=service, ticket_number=f'B{index:03d}')
+                    for index in range(options['waiting'] + options['repeat'])
+                ])
+                display_ms = _average_ms(lambda: live_state.build_state(agency.pk), options['repeat'])
+                call_ms = _average_ms(lambda: dispatch.call_next(agency.pk, counter=counter), options['repeat'])
+                transaction.savepoint_rollback(sid)
+
+                self.stdout.write(f'{size:>12} {display_ms:>14.2f} {call_ms:>16.2f}')
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('✅ Mesures terminées (aucune donnée conservée)'))
@@ -0,0 +1,38 @@
+"""
+Commande pour consolider (ou reconsolider) les statistiques quotidiennes des files d'attente.
+"""
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = "Calcule DailyQueueStats à partir des tickets, jour par jour (la veille par défaut)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='Premier jour (AAAA-MM-JJ), la veille par défaut')
+        parser.add_argument('--to', dest='end', help='Dernier jour inclus (AAAA-MM-JJ), --from par défaut')
+
+    def handle(self, *args, **options):
+        from appointments.rollup import rollup_range
+
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else timezone.localdate() - timedelta(days=1)
+            end = date.fromisoformat(options['end']) if options['end'] else start
+        except ValueError as e:
+            raise CommandError(f'Date invalide: {e}')
+        if end < start:
+            raise CommandError('--to doit être postérieur ou égal à --from')
+
+        started = time.monotonic()
+        results = rollup_range(start, end)
+        for day, count in results.items():
+            if count:
+                self.stdout.write(f'📊 {day.isoformat()}: {count} agence(s)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {len(results)} jour(s) consolidé(s), {sum(results.values())} ligne(s) '
+            f'en {time.monotonic() - started:.2f}s'
+        ))
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0004_agency_latitude_agency_longitude'),
+        ('appointments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('prefix', models.CharField(max_length=5, verbose_name='Préfixe')),
+                ('last_number', models.PositiveIntegerField(default=0, verbose_name='Dernier numéro attribué')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('agency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ticket_sequences', to='agencies.agency', verbose_name='Agence')),
+            ],
+            options={
+                'verbose_name': 'Séquence de tickets',
+                'verbose_name_plural': 'Séquences de tickets',
+                'ordering': ['-date', 'agency', 'prefix'],
+                'unique_together': {('agency', 'date', 'prefix')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TicketBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('prefix', models.CharField(max_length=5, verbose_name='Préfixe')),
+                ('kiosk', models.CharField(max_length=64, verbose_name='Borne')),
+                ('next_number', models.PositiveIntegerField(default=1, verbose_name='Prochain numéro')),
+                ('last_number', models.PositiveIntegerField(default=0, verbose_name='Dernier numéro de la plage')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('agency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ticket_blocks', to='agencies.agency', verbose_name='Agence')),
+            ],
+            options={
+                'verbose_name': 'Plage de tickets (borne)',
+                'verbose_name_plural': 'Plages de tickets (bornes)',
+                'ordering': ['-date', 'agency', 'kiosk', 'prefix'],
+                'unique_together': {('agency', 'date', 'prefix', 'kiosk')},
+            },
+        ),
+    ]
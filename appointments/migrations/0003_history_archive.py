@@ -0,0 +1,57 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0004_agency_latitude_agency_longitude'),
+        ('appointments', '0002_ticket_sequences'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueueTicketArchive',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('ticket_number', models.CharField(max_length=10, verbose_name='Numéro de ticket')),
+                ('counter_number', models.PositiveIntegerField(blank=True, null=True, verbose_name='Guichet')),
+                ('status', models.CharField(choices=[('waiting', 'En attente'), ('called', 'Appelé'), ('serving', 'En service'), ('completed', 'Terminé'), ('cancelled', 'Annulé'), ('no_show', 'Absent')], max_length=20, verbose_name='Statut')),
+                ('priority', models.CharField(choices=[('normal', 'Normal'), ('priority', 'Prioritaire'), ('vip', 'VIP')], max_length=20, verbose_name='Priorité')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('created_at', models.DateTimeField(verbose_name='Créé le')),
+                ('called_at', models.DateTimeField(blank=True, null=True, verbose_name='Appelé le')),
+                ('served_at', models.DateTimeField(blank=True, null=True, verbose_name='Servi le')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminé le')),
+            ],
+            options={
+                'verbose_name': 'Ticket archivé',
+                'verbose_name_plural': 'Tickets archivés',
+                'ordering': ['-date', 'ticket_number'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='queueticket',
+            index=models.Index(fields=['agency', 'date', 'status', 'created_at'], name='queue_ticket_agency_day'),
+        ),
+        migrations.AddIndex(
+            model_name='queueticket',
+            index=models.Index(fields=['date'], name='queue_ticket_date'),
+        ),
+        migrations.AddField(
+            model_name='queueticketarchive',
+            name='agency',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='agencies.agency', verbose_name='Agence'),
+        ),
+        migrations.AddField(
+            model_name='queueticketarchive',
+            name='service',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='appointments.servicetype', verbose_name='Service'),
+        ),
+        migrations.AddIndex(
+            model_name='queueticketarchive',
+            index=models.Index(fields=['agency', 'date'], name='queue_archive_agency_day'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_history_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('booked', models.PositiveIntegerField(default=0, verbose_name='Places réservées')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('slot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupancies', to='appointments.timeslot', verbose_name='Créneau')),
+            ],
+            options={
+                'verbose_name': 'Occupation de créneau',
+                'verbose_name_plural': 'Occupations de créneaux',
+                'unique_together': {('slot', 'date')},
+            },
+        ),
+    ]
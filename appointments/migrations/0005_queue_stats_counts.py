@@ -0,0 +1,32 @@
+# Generated by Django 4.2.11 on 2026-10-18 09:23
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_counts(apps, schema_editor):
+    """Lignes déjà consolidées: volumes approchés par les totaux (rollup_queue_stats les recalcule exactement)"""
+    DailyQueueStats = apps.get_model('appointments', 'DailyQueueStats')
+    DailyQueueStats.objects.filter(avg_wait_time__isnull=False).update(wait_count=F('total_tickets'))
+    DailyQueueStats.objects.filter(avg_service_time__isnull=False).update(service_count=F('completed_tickets'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_slot_occupancy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyqueuestats',
+            name='service_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Services chronométrés'),
+        ),
+        migrations.AddField(
+            model_name='dailyqueuestats',
+            name='wait_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Tickets appelés'),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
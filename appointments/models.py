@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from agencies.models import Agency
 import uuid
 from datetime import date, time, timedelta
@@ -185,12 +186,37 @@ class Appointment(models.Model):
     def __str__(self):
         return f"RDV {self.confirmation_code} - {self.client_name}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Jour chargé: un report invalide aussi la disponibilité du jour quitté
+        loaded = dict(zip(field_names, values))
+        instance._loaded_day = (loaded.get('agency_id'), loaded.get('date'))
+        # Place occupée au chargement: libérée en cas d'annulation ou de report
+        instance._loaded_booking = (loaded.get('agency_id'), loaded.get('date'), loaded.get('time'), loaded.get('status'))
+        return instance
+    
     def save(self, *args, **kwargs):
-        if not self.confirmation_code:
-            import random
-            import string
-            self.confirmation_code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
-        super().save(*args, **kwargs)
+        # Réserver la place du créneau (capacité vérifiée atomiquement) et
+        # générer un code de confirmation unique
+        from .booking import save_appointment
+        save_appointment(self, super().save, *args, **kwargs)
+
+
+class SlotOccupancy(models.Model):
+    """Places réservées d'un créneau pour un jour (voir appointments/booking.py)"""
+    slot = models.ForeignKey(TimeSlot, on_delete=models.CASCADE, related_name='occupancies', verbose_name="Créneau")
+    date = models.DateField(verbose_name="Date")
+    booked = models.PositiveIntegerField(default=0, verbose_name="Places réservées")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Occupation de créneau"
+        verbose_name_plural = "Occupations de créneaux"
+        unique_together = ['slot', 'date']
+    
+    def __str__(self):
+        return f"{self.slot} {self.date}: {self.booked}/{self.slot.max_appointments}"
 
 
 class QueueTicket(models.Model):
@@ -210,6 +236,9 @@ class QueueTicket(models.Model):
         ('vip', 'VIP'),
     ]
     
+    # Ordre d'appel: VIP, puis prioritaire, puis normal (à ancienneté égale)
+    PRIORITY_RANK = {'vip': 0, 'priority': 1, 'normal': 2}
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     
     agency = models.ForeignKey(Agency, on_delete=models.CASCADE, related_name='queue_tickets', verbose_name="Agence")
@@ -274,34 +303,140 @@ class QueueTicket(models.Model):
         verbose_name = "Ticket de file"
         verbose_name_plural = "Tickets de file"
         ordering = ['date', 'priority', 'created_at']
+        indexes = [
+            # File du jour (display, stats, check, call_next)
+            models.Index(fields=['agency', 'date', 'status', 'created_at'], name='queue_ticket_agency_day'),
+            # Archivage par ancienneté
+            models.Index(fields=['date'], name='queue_ticket_date'),
+        ]
     
     def __str__(self):
         return f"Ticket {self.ticket_number} - {self.agency.name}"
     
+    @classmethod
+    def priority_rank(cls, now=None):
+        """
+        Expression SQL du rang de priorité (pour trier comme l'appel).
+        
+        Si QUEUE_PRIORITY_AGING_MINUTES est défini (0 par défaut: désactivé),
+        un ticket gagne un rang par tranche d'attente de cette durée (un
+        ticket normal finit par passer devant les nouveaux tickets
+        prioritaires): aucun ticket n'attend indéfiniment.
+        """
+        aging = getattr(settings, 'QUEUE_PRIORITY_AGING_MINUTES', 0)
+        whens = []
+        for code, rank in cls.PRIORITY_RANK.items():
+            if aging:
+                now = now or timezone.now()
+                for steps in range(rank, 0, -1):
+                    whens.append(models.When(
+                        priority=code,
+                        created_at__lte=now - timedelta(minutes=aging * steps),
+                        then=models.Value(rank - steps),
+                    ))
+            whens.append(models.When(priority=code, then=models.Value(rank)))
+        return models.Case(
+            *whens,
+            default=models.Value(len(cls.PRIORITY_RANK)),
+            output_field=models.IntegerField(),
+        )
+    
+    @classmethod
+    def in_call_order(cls, queryset, now=None):
+        """Trier des tickets dans l'ordre où ils seront appelés"""
+        return queryset.annotate(priority_rank=cls.priority_rank(now)).order_by('priority_rank', 'created_at', 'id')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Statut chargé: permet de qualifier le changement (appel, rappel, transfert...)
+        instance._loaded_status = dict(zip(field_names, values)).get('status')
+        return instance
+    
     def save(self, *args, **kwargs):
         if not self.ticket_number:
-            # Générer un numéro de ticket unique pour aujourd'hui et cette agence
-            today = date.today()
-            prefix = self.service.code[:1].upper() if self.service else 'X'
-            
-            # Trouver le dernier numéro pour ce préfixe aujourd'hui
-            last_ticket = QueueTicket.objects.filter(
-                agency=self.agency,
-                date=today,
-                ticket_number__startswith=prefix
-            ).order_by('-ticket_number').first()
-            
-            if last_ticket:
-                last_num = int(last_ticket.ticket_number[1:])
-                new_num = last_num + 1
-            else:
-                new_num = 1
-            
-            self.ticket_number = f"{prefix}{new_num:03d}"
+            # Numéro unique pour cette agence, ce jour et ce préfixe (séquence atomique)
+            from .ticketing import next_ticket_number
+            self.ticket_number = next_ticket_number(self.agency_id, self.service, ticket_date=self.date)
         
         super().save(*args, **kwargs)
 
 
+class TicketSequence(models.Model):
+    """Compteur des numéros de ticket par agence, jour et préfixe"""
+    agency = models.ForeignKey(Agency, on_delete=models.CASCADE, related_name='ticket_sequences', verbose_name="Agence")
+    date = models.DateField(verbose_name="Date")
+    prefix = models.CharField(max_length=5, verbose_name="Préfixe")
+    last_number = models.PositiveIntegerField(default=0, verbose_name="Dernier numéro attribué")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Séquence de tickets"
+        verbose_name_plural = "Séquences de tickets"
+        ordering = ['-date', 'agency', 'prefix']
+        unique_together = ['agency', 'date', 'prefix']
+    
+    def __str__(self):
+        return f"{self.prefix} - {self.date} - {self.last_number}"
+
+
+class TicketBlock(models.Model):
+    """Plage de numéros pré-réservée par une borne (next_number..last_number)"""
+    agency = models.ForeignKey(Agency, on_delete=models.CASCADE, related_name='ticket_blocks', verbose_name="Agence")
+    date = models.DateField(verbose_name="Date")
+    prefix = models.CharField(max_length=5, verbose_name="Préfixe")
+    kiosk = models.CharField(max_length=64, verbose_name="Borne")
+    next_number = models.PositiveIntegerField(default=1, verbose_name="Prochain numéro")
+    last_number = models.PositiveIntegerField(default=0, verbose_name="Dernier numéro de la plage")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Plage de tickets (borne)"
+        verbose_name_plural = "Plages de tickets (bornes)"
+        ordering = ['-date', 'agency', 'kiosk', 'prefix']
+        unique_together = ['agency', 'date', 'prefix', 'kiosk']
+    
+    def __str__(self):
+        return f"{self.kiosk} {self.prefix} {self.next_number}-{self.last_number} ({self.date})"
+
+
+class QueueTicketArchive(models.Model):
+    """
+    Ticket archivé (voir core/archiving.py): forme compacte, sans données
+    personnelles ni contraintes de clé étrangère, pour l'historique.
+    """
+    id = models.UUIDField(primary_key=True, editable=False)
+    
+    agency = models.ForeignKey(
+        Agency, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+', verbose_name="Agence"
+    )
+    service = models.ForeignKey(
+        ServiceType, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+', verbose_name="Service"
+    )
+    ticket_number = models.CharField(max_length=10, verbose_name="Numéro de ticket")
+    counter_number = models.PositiveIntegerField(null=True, blank=True, verbose_name="Guichet")
+    
+    status = models.CharField(max_length=20, choices=QueueTicket.STATUS_CHOICES, verbose_name="Statut")
+    priority = models.CharField(max_length=20, choices=QueueTicket.PRIORITY_CHOICES, verbose_name="Priorité")
+    
+    date = models.DateField(verbose_name="Date")
+    created_at = models.DateTimeField(verbose_name="Créé le")
+    called_at = models.DateTimeField(null=True, blank=True, verbose_name="Appelé le")
+    served_at = models.DateTimeField(null=True, blank=True, verbose_name="Servi le")
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name="Terminé le")
+    
+    class Meta:
+        verbose_name = "Ticket archivé"
+        verbose_name_plural = "Tickets archivés"
+        ordering = ['-date', 'ticket_number']
+        indexes = [
+            models.Index(fields=['agency', 'date'], name='queue_archive_agency_day'),
+        ]
+    
+    def __str__(self):
+        return f"Ticket {self.ticket_number} - {self.date}"
+
+
 class DailyQueueStats(models.Model):
     """Statistiques quotidiennes des files d'attente"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -316,6 +451,9 @@ class DailyQueueStats(models.Model):
     
     avg_wait_time = models.PositiveIntegerField(null=True, blank=True, verbose_name="Temps d'attente moyen (min)")
     avg_service_time = models.PositiveIntegerField(null=True, blank=True, verbose_name="Temps de service moyen (min)")
+    # Tickets sur lesquels portent les moyennes (pondération des tendances)
+    wait_count = models.PositiveIntegerField(default=0, verbose_name="Tickets appelés")
+    service_count = models.PositiveIntegerField(default=0, verbose_name="Services chronométrés")
     
     peak_hour = models.TimeField(null=True, blank=True, verbose_name="Heure de pointe")
     peak_wait_time = models.PositiveIntegerField(null=True, blank=True, verbose_name="Temps d'attente en pointe (min)")
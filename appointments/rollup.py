@@ -0,0 +1,114 @@
+"""
+Consolidation quotidienne des files d'attente (DailyQueueStats)
+
+Chaque nuit, les tickets de la veille sont résumés par agence: totaux par
+statut, temps d'attente et de service moyens, heure de pointe et attente
+moyenne à cette heure. Les tableaux de bord historiques lisent ces lignes
+au lieu de parcourir QueueTicket.
+
+Une journée coûte une seule requête agrégée, groupée par (agence, heure
+d'arrivée): les totaux de la journée sont la somme des heures, et l'heure
+de pointe se lit dans le même résultat. Les lignes sont ensuite écrites en
+une insertion groupée avec mise à jour des lignes existantes: relancer la
+consolidation d'un jour la remplace.
+"""
+from collections import defaultdict
+from datetime import time, timedelta
+
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import Coalesce, ExtractHour
+
+from .models import DailyQueueStats, QueueTicket
+
+STATS_FIELDS = [
+    'total_tickets', 'completed_tickets', 'cancelled_tickets', 'no_show_tickets',
+    'avg_wait_time', 'avg_service_time', 'wait_count', 'service_count', 'peak_hour', 'peak_wait_time',
+]
+
+
+def _duration(end, start):
+    return ExpressionWrapper(F(end) - start, output_field=DurationField())
+
+
+def hourly_rows(day):
+    """Agrégats de la journée par agence et heure d'arrivée (une requête)"""
+    return (
+        QueueTicket.objects.filter(date=day)
+        .annotate(hour=ExtractHour('created_at'))
+        .values('agency_id', 'hour')
+        .annotate(
+            total=Count('id'),
+            completed=Count('id', filter=Q(status='completed')),
+            cancelled=Count('id', filter=Q(status='cancelled')),
+            no_show=Count('id', filter=Q(status='no_show')),
+            wait_sum=Sum(_duration('called_at', F('created_at')), filter=Q(called_at__isnull=False)),
+            wait_count=Count('id', filter=Q(called_at__isnull=False)),
+            service_sum=Sum(
+                _duration('completed_at', Coalesce('served_at', 'called_at')),
+                filter=Q(status='completed', completed_at__isnull=False, called_at__isnull=False),
+            ),
+            service_count=Count(
+                'id', filter=Q(status='completed', completed_at__isnull=False, called_at__isnull=False),
+            ),
+        )
+        .order_by()
+    )
+
+
+def _minutes(total, count):
+    if not count or total is None:
+        return None
+    return max(round(total.total_seconds() / count / 60), 0)
+
+
+def build_stats(day, rows):
+    """Lignes DailyQueueStats (non enregistrées) à partir des agrégats horaires"""
+    by_agency = defaultdict(list)
+    for row in rows:
+        by_agency[row['agency_id']].append(row)
+
+    stats = []
+    for agency_id, hours in by_agency.items():
+        def total(field):
+            return sum((hour[field] for hour in hours if hour[field] is not None), timedelta())
+
+        peak = max(hours, key=lambda hour: (hour['total'], -hour['hour']))
+        wait_count = sum(hour['wait_count'] for hour in hours)
+        service_count = sum(hour['service_count'] for hour in hours)
+        stats.append(DailyQueueStats(
+            agency_id=agency_id,
+            date=day,
+            total_tickets=sum(hour['total'] for hour in hours),
+            completed_tickets=sum(hour['completed'] for hour in hours),
+            cancelled_tickets=sum(hour['cancelled'] for hour in hours),
+            no_show_tickets=sum(hour['no_show'] for hour in hours),
+            avg_wait_time=_minutes(total('wait_sum'), wait_count),
+            avg_service_time=_minutes(total('service_sum'), service_count),
+            wait_count=wait_count,
+            service_count=service_count,
+            peak_hour=time(peak['hour']) if peak['hour'] is not None else None,
+            peak_wait_time=_minutes(peak['wait_sum'], peak['wait_count']),
+        ))
+    return stats
+
+
+def rollup_day(day):
+    """Consolider une journée; retourne le nombre d'agences écrites"""
+    stats = build_stats(day, hourly_rows(day))
+    DailyQueueStats.objects.bulk_create(
+        stats,
+        update_conflicts=True,
+        unique_fields=['agency', 'date'],
+        update_fields=STATS_FIELDS,
+    )
+    return len(stats)
+
+
+def rollup_range(start, end):
+    """Consolider les journées de start à end inclus; retourne {jour: agences}"""
+    results = {}
+    day = start
+    while day <= end:
+        results[day] = rollup_day(day)
+        day += timedelta(days=1)
+    return results
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import ServiceType, Counter, TimeSlot, Appointment, QueueTicket, DailyQueueStats
+from .booking import SlotUnavailable
 
 
 class ServiceTypeSerializer(serializers.ModelSerializer):
@@ -56,6 +57,13 @@ class AppointmentSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'confirmation_code', 'created_at', 'updated_at']
+    
+    def update(self, instance, validated_data):
+        # Déplacement vers un créneau complet, ou rendez-vous annulé remis en attente
+        try:
+            return super().update(instance, validated_data)
+        except SlotUnavailable as e:
+            raise serializers.ValidationError({'time': str(e)})
 
 
 class AppointmentCreateSerializer(serializers.ModelSerializer):
@@ -80,7 +88,10 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
             if not validated_data.get('client_email'):
                 validated_data['client_email'] = request.user.email
         
-        return super().create(validated_data)
+        try:
+            return super().create(validated_data)
+        except SlotUnavailable as e:
+            raise serializers.ValidationError({'time': str(e)})
 
 
 class QueueTicketSerializer(serializers.ModelSerializer):
@@ -113,10 +124,12 @@ class QueueTicketSerializer(serializers.ModelSerializer):
 class QueueTicketCreateSerializer(serializers.ModelSerializer):
     """Serializer pour créer un ticket de file d'attente"""
     service_type = serializers.CharField(write_only=True, required=False)
+    # Identifiant de la borne: les numéros sont pris dans sa plage réservée
+    kiosk = serializers.CharField(write_only=True, required=False, allow_blank=True, max_length=64)
     
     class Meta:
         model = QueueTicket
-        fields = ['agency', 'service', 'service_type', 'client_name', 'client_phone', 'priority']
+        fields = ['agency', 'service', 'service_type', 'kiosk', 'client_name', 'client_phone', 'priority']
         extra_kwargs = {
             'service': {'required': False},
         }
@@ -126,6 +139,7 @@ class QueueTicketCreateSerializer(serializers.ModelSerializer):
         
         # Gérer service_type (code string) -> service (ForeignKey)
         service_type_code = validated_data.pop('service_type', None)
+        kiosk = validated_data.pop('kiosk', None)
         if service_type_code and not validated_data.get('service'):
             # Chercher le service par son code ou en créer un par défaut
             service = ServiceType.objects.filter(code__iexact=service_type_code).first()
@@ -144,22 +158,31 @@ class QueueTicketCreateSerializer(serializers.ModelSerializer):
             if not validated_data.get('client_phone') and hasattr(request.user, 'phone'):
                 validated_data['client_phone'] = request.user.phone or ''
         
-        # Calculer la position dans la file
-        from django.utils import timezone
-        today = timezone.now().date()
-        waiting_count = QueueTicket.objects.filter(
-            agency=validated_data['agency'],
-            date=today,
-            status='waiting'
-        ).count()
-        validated_data['queue_position'] = waiting_count + 1
-        
-        # Estimer le temps d'attente (durée moyenne * position)
+        # Position (selon la priorité) et attente estimée, depuis l'état en direct de la file
+        from . import live_state
         service = validated_data.get('service')
-        if service:
-            validated_data['estimated_wait_time'] = service.estimated_duration * validated_data['queue_position']
+        default_minutes = service.estimated_duration if service else 15
+        state = live_state.get_state(validated_data['agency'].pk)
+        if state is not None:
+            position, eta = live_state.estimated_wait_for_new(
+                state, validated_data.get('priority', 'normal'), default_minutes, service.pk if service else None
+            )
         else:
-            validated_data['estimated_wait_time'] = 15 * validated_data['queue_position']
+            from django.utils import timezone
+            position = QueueTicket.objects.filter(
+                agency=validated_data['agency'],
+                date=timezone.now().date(),
+                status='waiting'
+            ).count() + 1
+            eta = default_minutes * position
+        validated_data['queue_position'] = position
+        validated_data['estimated_wait_time'] = eta
+        
+        if kiosk:
+            from .ticketing import next_ticket_number
+            validated_data['ticket_number'] = next_ticket_number(
+                validated_data['agency'].pk, service, kiosk=kiosk
+            )
         
         return super().create(validated_data)
 
@@ -0,0 +1,99 @@
+"""
+Signaux Django pour maintenir et diffuser l'état en direct des files d'attente,
+et invalider la disponibilité des rendez-vous en cache
+
+La diffusion (robust=True) ne doit jamais faire échouer la requête qui a
+modifié le ticket ou le guichet: une erreur est seulement journalisée.
+"""
+from datetime import date
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from agencies.models import Agency
+
+from . import availability, booking, dispatch, feed, live_state, wait_estimator
+from .models import Appointment, Counter, QueueTicket, TimeSlot
+
+
+@receiver(post_save, sender=QueueTicket)
+def queue_ticket_post_save(sender, instance, created, **kwargs):
+    """Ticket créé, appelé, terminé, transféré...: mettre à jour l'état de la file et le diffuser"""
+    action = feed.ticket_action(instance, created)
+    # Mesures relevées maintenant: l'instance peut encore changer avant la validation
+    sample = wait_estimator.sample_event(instance, getattr(instance, '_loaded_status', None), created)
+    instance._loaded_status = instance.status
+    
+    def record():
+        try:
+            estimates = wait_estimator.observe(sample) if sample else None
+            live_state.record_ticket(instance, estimates=estimates, created=created)
+        except Exception:
+            # L'état ne reflète plus la base: la lecture suivante le reconstruit
+            live_state.invalidate(instance.agency_id, instance.date)
+            raise
+    
+    transaction.on_commit(record, robust=True)
+    transaction.on_commit(lambda: feed.publish_ticket(instance, action), robust=True)
+
+
+@receiver(post_delete, sender=QueueTicket)
+def queue_ticket_post_delete(sender, instance, **kwargs):
+    agency_id, day, ticket_id = instance.agency_id, instance.date, instance.pk
+    if day < date.today():
+        # Archivage de l'historique: aucun état en direct à corriger
+        return
+    transaction.on_commit(lambda: live_state.forget_ticket(agency_id, day, ticket_id), robust=True)
+
+
+def _refresh_counters(agency_id):
+    feed.publish_counters(agency_id, live_state.refresh_counters(agency_id))
+
+
+@receiver(post_save, sender=Counter)
+@receiver(post_delete, sender=Counter)
+def counter_changed(sender, instance, **kwargs):
+    """Guichet ouvert, fermé, ticket en cours changé: recharger les guichets affichés"""
+    agency_id = instance.agency_id
+    transaction.on_commit(lambda: dispatch.invalidate_service_map(agency_id))
+    transaction.on_commit(lambda: _refresh_counters(agency_id), robust=True)
+
+
+@receiver(m2m_changed, sender=Counter.services.through)
+def counter_services_changed(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Counter):
+        agency_id = instance.agency_id
+        transaction.on_commit(lambda: dispatch.invalidate_service_map(agency_id))
+        transaction.on_commit(lambda: _refresh_counters(agency_id), robust=True)
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def appointment_changed(sender, instance, **kwargs):
+    """Rendez-vous pris, reporté ou annulé: disponibilité des jours concernés à recalculer"""
+    days = {(instance.agency_id, instance.date), getattr(instance, '_loaded_day', (None, None))}
+    instance._loaded_day = (instance.agency_id, instance.date)
+    for agency_id, day in days:
+        if agency_id and day:
+            transaction.on_commit(lambda agency_id=agency_id, day=day: availability.invalidate_day(agency_id, day))
+
+
+@receiver(post_delete, sender=Appointment)
+def appointment_deleted(sender, instance, **kwargs):
+    """Rendez-vous supprimé: sa place dans le créneau est rendue"""
+    booking.release_deleted(instance)
+
+
+@receiver(post_save, sender=TimeSlot)
+@receiver(post_delete, sender=TimeSlot)
+def time_slot_changed(sender, instance, **kwargs):
+    agency_id = instance.agency_id
+    transaction.on_commit(lambda: availability.invalidate_agency(agency_id))
+
+
+@receiver(post_save, sender=Agency)
+def agency_changed(sender, instance, created, **kwargs):
+    """Nom ou activation de l'agence modifiés: l'état sera reconstruit"""
+    if not created:
+        transaction.on_commit(lambda: live_state.invalidate(instance.pk))
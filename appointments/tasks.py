@@ -0,0 +1,38 @@
+from celery import shared_task
+from django.utils import timezone
+from datetime import date, timedelta
+
+
+@shared_task
+def rollup_queue_stats(day=None):
+    """Consolider les statistiques des files d'une journée (la veille par défaut)"""
+    from .rollup import rollup_day
+    
+    day = date.fromisoformat(day) if day else timezone.localdate() - timedelta(days=1)
+    count = rollup_day(day)
+    return f"Statistiques du {day.isoformat()}: {count} agence(s) consolidée(s)"
+
+
+@shared_task
+def preissue_appointment_tickets():
+    """
+    Émettre à l'avance les tickets des rendez-vous confirmés du jour dont
+    l'heure approche (APPOINTMENT_PREISSUE_MINUTES), agence par agence
+    """
+    from django.conf import settings
+    from .conversion import convert_appointments
+    from .models import Appointment
+    
+    lead = getattr(settings, 'APPOINTMENT_PREISSUE_MINUTES', 30)
+    now = timezone.localtime()
+    until = now + timedelta(minutes=lead)
+    # Fenêtre jusqu'à la fin de journée si le délai passe minuit
+    end = until.time() if until.date() == now.date() else None
+    
+    agency_ids = set(Appointment.objects.filter(
+        date=now.date(), status='confirmed', queue_ticket__isnull=True,
+        **({'time__lte': end} if end else {}),
+    ).values_list('agency_id', flat=True))
+    
+    converted = sum(len(convert_appointments(agency_id, now.date(), end=end)) for agency_id in agency_ids)
+    return f"{converted} ticket(s) émis pour {len(agency_ids)} agence(s)"
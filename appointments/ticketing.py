@@ -0,0 +1,132 @@
+"""
+Numérotation des tickets de file d'attente
+
+Chaque (agence, jour, préfixe) possède un compteur TicketSequence. Un numéro
+est attribué par un UPDATE atomique (last_number = last_number + n) suivi de
+la relecture du compteur dans la même transaction: le verrou de ligne posé
+par l'UPDATE sérialise les bornes concurrentes, sans doublon possible et
+sans lire le dernier ticket émis.
+
+Une borne peut aussi travailler sur une plage pré-réservée (TicketBlock): ses
+tickets sont pris dans sa plage, sous le verrou de la ligne de la plage, sans
+toucher au compteur de l'agence, qui n'est sollicité qu'une fois par plage. Les numéros non utilisés d'une plage
+sont perdus en fin de journée (trous dans la numérotation, jamais de doublon).
+"""
+import re
+from datetime import date
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, IntegerField, Max
+from django.db.models.functions import Cast, Substr
+from django.utils import timezone
+
+from .models import QueueTicket, TicketBlock, TicketSequence
+
+TICKET_NUMBER_DIGITS = 3
+
+
+def ticket_prefix(service):
+    """Préfixe des tickets d'un service (première lettre du code)"""
+    return service.code[:1].upper() if service and service.code else 'X'
+
+
+def format_ticket_number(prefix, number):
+    return f"{prefix}{number:0{TICKET_NUMBER_DIGITS}d}"
+
+
+def _initial_number(agency_id, ticket_date, prefix):
+    """Plus grand numéro déjà attribué ce jour (tickets émis avant le compteur)"""
+    return QueueTicket.objects.filter(
+        agency_id=agency_id,
+        date=ticket_date,
+        ticket_number__regex=rf'^{re.escape(prefix)}[0-9]+$',
+    ).aggregate(
+        last=Max(Cast(Substr('ticket_number', len(prefix) + 1), IntegerField()))
+    )['last'] or 0
+
+
+def allocate_ticket_numbers(agency_id, ticket_date, prefix, count=1):
+    """
+    Réserver `count` numéros consécutifs sur le compteur de l'agence.
+
+    Retourne le premier numéro de la plage.
+    """
+    sequence = TicketSequence.objects.filter(agency_id=agency_id, date=ticket_date, prefix=prefix)
+    with transaction.atomic():
+        if not sequence.update(last_number=F('last_number') + count, updated_at=timezone.now()):
+            # Premier ticket du jour pour ce préfixe: créer le compteur
+            initial = _initial_number(agency_id, ticket_date, prefix)
+            try:
+                with transaction.atomic():
+                    TicketSequence.objects.create(
+                        agency_id=agency_id, date=ticket_date, prefix=prefix,
+                        last_number=initial + count,
+                    )
+                return initial + 1
+            except IntegrityError:
+                # Créé entre-temps par une autre borne
+                sequence.update(last_number=F('last_number') + count, updated_at=timezone.now())
+        last = sequence.values_list('last_number', flat=True).get()
+    return last - count + 1
+
+
+def _locked_block(agency_id, ticket_date, prefix, kiosk):
+    """Plage de la borne, créée vide au besoin, verrouillée jusqu'à la fin de la transaction"""
+    block, _ = TicketBlock.objects.get_or_create(
+        agency_id=agency_id, date=ticket_date, prefix=prefix, kiosk=kiosk,
+        defaults={'next_number': 1, 'last_number': 0},
+    )
+    return TicketBlock.objects.select_for_update().get(pk=block.pk)
+
+
+def _refill(block, size=None):
+    size = size or getattr(settings, 'QUEUE_TICKET_BLOCK_SIZE', 20)
+    start = allocate_ticket_numbers(block.agency_id, block.date, block.prefix, size)
+    block.next_number, block.last_number = start, start + size - 1
+    return start
+
+
+def reserve_ticket_block(agency_id, ticket_date, prefix, kiosk, size=None):
+    """
+    Réserver une nouvelle plage de numéros pour une borne (remplace la
+    précédente). Retourne le premier numéro de la plage.
+    """
+    with transaction.atomic():
+        block = _locked_block(agency_id, ticket_date, prefix, kiosk)
+        start = _refill(block, size)
+        block.save(update_fields=['next_number', 'last_number', 'updated_at'])
+    return start
+
+
+def _take_from_block(agency_id, ticket_date, prefix, kiosk):
+    """
+    Prendre le prochain numéro de la plage de la borne. La plage est lue,
+    rechargée si elle est épuisée et avancée sous le verrou de sa ligne:
+    deux requêtes de la même borne ne peuvent ni réserver deux plages qui
+    s'écrasent, ni obtenir le même numéro.
+    """
+    with transaction.atomic():
+        block = _locked_block(agency_id, ticket_date, prefix, kiosk)
+        if block.next_number > block.last_number:
+            # Plage épuisée (ou première utilisation): en réserver une nouvelle
+            _refill(block)
+        number = block.next_number
+        block.next_number += 1
+        block.save(update_fields=['next_number', 'last_number', 'updated_at'])
+    return number
+
+
+def next_ticket_number(agency_id, service, ticket_date=None, kiosk=None):
+    """
+    Numéro du prochain ticket (ex: A042) pour une agence et un service.
+
+    Avec `kiosk`, le numéro est pris dans la plage réservée par cette borne.
+    """
+    ticket_date = ticket_date or date.today()
+    prefix = ticket_prefix(service)
+    if kiosk:
+        number = _take_from_block(agency_id, ticket_date, prefix, kiosk)
+    else:
+        number = allocate_ticket_numbers(agency_id, ticket_date, prefix)
+    return format_ticket_number(prefix, number)
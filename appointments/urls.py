@@ -2,7 +2,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     ServiceTypeViewSet, CounterViewSet, TimeSlotViewSet,
-    AppointmentViewSet, QueueTicketViewSet, DailyQueueStatsViewSet
+    AppointmentViewSet, QueueTicketViewSet, DailyQueueStatsViewSet,
+    queue_feed
 )
 
 router = DefaultRouter()
@@ -14,5 +15,7 @@ router.register(r'queue', QueueTicketViewSet, basename='queue')
 router.register(r'stats', DailyQueueStatsViewSet, basename='stats')
 
 urlpatterns = [
+    # Avant le routeur: "feed" serait sinon pris pour l'identifiant d'un ticket
+    path('queue/feed/', queue_feed, name='queue-feed'),
     path('', include(router.urls)),
 ]
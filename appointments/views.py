@@ -4,9 +4,14 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db.models import F, Max, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
 from django.utils import timezone
+from asgiref.sync import sync_to_async
 from datetime import date, timedelta
 
+from . import availability, conversion, dispatch, feed, live_state
 from .models import ServiceType, Counter, TimeSlot, Appointment, QueueTicket, DailyQueueStats
 from .serializers import (
     ServiceTypeSerializer, CounterSerializer, TimeSlotSerializer,
@@ -63,13 +68,8 @@ class CounterViewSet(viewsets.ModelViewSet):
             old_ticket.completed_at = timezone.now()
             old_ticket.save()
         
-        # Trouver le prochain ticket
-        next_ticket = QueueTicket.objects.filter(
-            agency=counter.agency,
-            date=date.today(),
-            status='waiting',
-            service__in=counter.services.all()
-        ).order_by('priority', 'created_at').first()
+        # Appeler le prochain ticket des services du guichet
+        next_ticket = dispatch.call_next(counter.agency_id, counter=counter, served_by=request.user)
         
         if not next_ticket:
             counter.current_ticket = None
@@ -77,17 +77,6 @@ class CounterViewSet(viewsets.ModelViewSet):
             counter.save()
             return Response({'message': 'Aucun ticket en attente', 'counter': self.get_serializer(counter).data})
         
-        # Appeler le ticket
-        next_ticket.status = 'called'
-        next_ticket.called_at = timezone.now()
-        next_ticket.counter = counter
-        next_ticket.served_by = request.user
-        next_ticket.save()
-        
-        counter.current_ticket = next_ticket
-        counter.status = 'busy'
-        counter.save()
-        
         return Response({
             'message': f'Ticket {next_ticket.ticket_number} appelé',
             'ticket': QueueTicketSerializer(next_ticket).data,
@@ -168,44 +157,36 @@ class TimeSlotViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def available(self, request):
-        """Récupérer les créneaux disponibles pour une agence et une date"""
+        """
+        Récupérer les créneaux disponibles pour une agence et une date
+        (?date=), ou pour une plage de jours (?from=&to=, par jour).
+        """
         agency_id = request.query_params.get('agency')
         date_str = request.query_params.get('date')
+        from_str = request.query_params.get('from')
         
-        if not agency_id or not date_str:
-            return Response({'error': 'agency and date parameters required'}, status=400)
+        if not agency_id or not (date_str or from_str):
+            return Response({'error': 'agency and date (or from/to) parameters required'}, status=400)
         
         from datetime import datetime
         try:
-            target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+            start = datetime.strptime(date_str or from_str, '%Y-%m-%d').date()
+            end = datetime.strptime(request.query_params['to'], '%Y-%m-%d').date() if (
+                not date_str and request.query_params.get('to')
+            ) else start
         except ValueError:
             return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=400)
         
-        day_of_week = target_date.weekday()
-        
-        slots = self.get_queryset().filter(
-            agency_id=agency_id,
-            day_of_week=day_of_week,
-            is_active=True
-        )
+        if end < start or (end - start).days >= availability.MAX_RANGE_DAYS:
+            return Response(
+                {'error': f'Invalid range: to must follow from, {availability.MAX_RANGE_DAYS} days at most'},
+                status=400,
+            )
         
-        # Vérifier la disponibilité de chaque créneau
-        available_slots = []
-        for slot in slots:
-            existing_count = Appointment.objects.filter(
-                agency_id=agency_id,
-                date=target_date,
-                time__gte=slot.start_time,
-                time__lt=slot.end_time,
-                status__in=['pending', 'confirmed']
-            ).count()
-            
-            if existing_count < slot.max_appointments:
-                slot_data = self.get_serializer(slot).data
-                slot_data['available_spots'] = slot.max_appointments - existing_count
-                available_slots.append(slot_data)
-        
-        return Response(available_slots)
+        days = availability.availability(agency_id, start, end)
+        if date_str:
+            return Response(days[start])
+        return Response({day.isoformat(): slots for day, slots in days.items()})
 
 
 class AppointmentViewSet(viewsets.ModelViewSet):
@@ -217,6 +198,11 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     filterset_fields = ['agency', 'service', 'status', 'date']
     search_fields = ['client_name', 'client_phone', 'confirmation_code']
     ordering_fields = ['date', 'time', 'created_at']
+    # Rôles qui voient et traitent les rendez-vous de toutes les agences
+    staff_roles = ['admin', 'manager', 'operations']
+    
+    def is_staff_user(self, user):
+        return user.is_authenticated and getattr(user, 'role', None) in self.staff_roles
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -226,7 +212,7 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.is_authenticated:
-            if hasattr(user, 'role') and user.role in ['admin', 'manager', 'operations']:
+            if self.is_staff_user(user):
                 return Appointment.objects.all()
             return Appointment.objects.filter(user=user)
         return Appointment.objects.none()
@@ -294,6 +280,41 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             'appointment': self.get_serializer(appointment).data
         })
     
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def convert_bulk(self, request):
+        """
+        Convertir en tickets tous les rendez-vous confirmés d'une agence
+        pour un jour (aujourd'hui par défaut) et une fenêtre horaire
+        optionnelle (from, to au format HH:MM)
+        """
+        # Porte sur les rendez-vous de tous les clients: réservé aux mêmes rôles que get_queryset
+        if not self.is_staff_user(request.user):
+            return Response({'error': 'Action réservée au personnel des agences'}, status=status.HTTP_403_FORBIDDEN)
+        
+        agency_id = request.data.get('agency')
+        if not agency_id:
+            return Response({'error': 'agency requis'}, status=400)
+        
+        from datetime import datetime
+        try:
+            day = datetime.strptime(request.data['date'], '%Y-%m-%d').date() if request.data.get('date') else date.today()
+            start, end = (
+                datetime.strptime(request.data[key], '%H:%M').time() if request.data.get(key) else None
+                for key in ('from', 'to')
+            )
+        except ValueError:
+            return Response({'error': 'Format invalide (date AAAA-MM-JJ, heures HH:MM)'}, status=400)
+        
+        tickets = conversion.convert_appointments(agency_id, day, start=start, end=end)
+        
+        return Response({
+            'message': f'{len(tickets)} ticket(s) créé(s)',
+            'tickets': [
+                {'id': str(ticket.pk), 'ticket_number': ticket.ticket_number, 'client_name': ticket.client_name}
+                for ticket in tickets
+            ],
+        })
+    
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def convert_to_ticket(self, request, pk=None):
         """Convertir un rendez-vous en ticket de file d'attente"""
@@ -350,7 +371,7 @@ class QueueTicketViewSet(viewsets.ModelViewSet):
         if not date_param:
             queryset = queryset.filter(date=date.today())
         
-        return queryset.order_by('priority', 'created_at')
+        return QueueTicket.in_call_order(queryset)
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -375,52 +396,14 @@ class QueueTicketViewSet(viewsets.ModelViewSet):
         if not agency_id:
             return Response({'error': 'agency parameter required'}, status=400)
         
-        from agencies.models import Agency
-        try:
-            agency = Agency.objects.get(id=agency_id, is_active=True)
-        except Agency.DoesNotExist:
+        # État en direct (cache), reconstruit depuis la base si nécessaire
+        state = live_state.get_state(agency_id)
+        if state is None:
             return Response({'error': 'Agence introuvable'}, status=404)
         
-        today = date.today()
-        
-        # Guichets actifs
-        counters = Counter.objects.filter(
-            agency=agency,
-            is_active=True,
-            status__in=['available', 'busy']
-        ).select_related('current_ticket', 'current_agent')
-        
-        # Tickets en attente
-        waiting_tickets = QueueTicket.objects.filter(
-            agency=agency,
-            date=today,
-            status='waiting'
-        ).order_by('priority', 'created_at')[:20]
-        
-        # Tickets appelés (5 derniers)
-        called_tickets = QueueTicket.objects.filter(
-            agency=agency,
-            date=today,
-            status__in=['called', 'serving']
-        ).order_by('-called_at')[:5]
-        
-        # Stats
-        total_waiting = QueueTicket.objects.filter(
-            agency=agency,
-            date=today,
-            status='waiting'
-        ).count()
-        
-        avg_wait = 15  # TODO: Calculer à partir des données réelles
-        
         return Response({
-            'agency_name': agency.name,
             'current_datetime': timezone.now(),
-            'counters': CounterSerializer(counters, many=True).data,
-            'waiting_tickets': QueueTicketSerializer(waiting_tickets, many=True).data,
-            'called_tickets': QueueTicketSerializer(called_tickets, many=True).data,
-            'total_waiting': total_waiting,
-            'avg_wait_time': avg_wait
+            **live_state.display_payload(state),
         })
     
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
@@ -432,28 +415,29 @@ class QueueTicketViewSet(viewsets.ModelViewSet):
         if not ticket_number:
             return Response({'error': 'ticket parameter required'}, status=400)
         
-        filters = {'ticket_number': ticket_number.upper(), 'date': date.today()}
-        if agency_id:
-            filters['agency_id'] = agency_id
+        ticket_number = ticket_number.upper()
+        if not agency_id:
+            # Sans agence, retrouver l'agence du ticket en base
+            agency_id = QueueTicket.objects.filter(
+                ticket_number=ticket_number, date=date.today()
+            ).values_list('agency_id', flat=True).first()
         
-        ticket = QueueTicket.objects.filter(**filters).first()
+        state = live_state.get_state(agency_id) if agency_id else None
+        entry = live_state.find_ticket(state, ticket_number) if state else None
         
-        if not ticket:
+        if not entry:
             return Response({'error': 'Ticket introuvable'}, status=404)
         
-        # Calculer la position actuelle
-        if ticket.status == 'waiting':
-            position = QueueTicket.objects.filter(
-                agency=ticket.agency,
-                date=ticket.date,
-                status='waiting',
-                created_at__lt=ticket.created_at
-            ).count() + 1
+        ticket_id = entry['id']
+        if entry['data'] is not None:
+            data = dict(entry['data'])
         else:
-            position = 0
+            # Ticket clôturé: absent de l'état détaillé, lu en base
+            data = QueueTicketSerializer(QueueTicket.objects.get(pk=ticket_id)).data
         
-        data = QueueTicketSerializer(ticket).data
-        data['current_position'] = position
+        data['current_position'] = live_state.waiting_position(state, ticket_id)
+        if data['current_position']:
+            data['estimated_wait_time'] = live_state.estimated_wait(state, ticket_id)
         
         return Response(data)
     
@@ -487,14 +471,18 @@ class QueueTicketViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        today = date.today()
-        
-        # Trouver le prochain ticket en attente (prioritaire d'abord)
-        next_ticket = QueueTicket.objects.filter(
-            agency_id=agency_id,
-            status='waiting',
-            date=today
-        ).order_by('priority', 'created_at').first()
+        # Guichet enregistré: ses services et le rattachement du ticket.
+        # Sinon (identifiant généré par le frontend), tous les services.
+        counter = dispatch.resolve_counter(agency_id, counter_id)
+        if counter is not None:
+            counter_name = request.data.get('counter_name') or counter.name or f'Guichet {counter.number}'
+        
+        next_ticket = dispatch.call_next(
+            agency_id,
+            counter=counter,
+            served_by=request.user if request.user.is_authenticated else None,
+            notes=None if counter else f"Guichet: {counter_name} (ID: {counter_id})",
+        )
         
         if not next_ticket:
             return Response(
@@ -502,13 +490,6 @@ class QueueTicketViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Mettre à jour le ticket
-        next_ticket.status = 'called'
-        next_ticket.called_at = timezone.now()
-        # Stocker le counter_id dans notes puisque counter est un ForeignKey
-        next_ticket.notes = f"Guichet: {counter_name} (ID: {counter_id})"
-        next_ticket.save()
-        
         # Préparer la réponse avec les champs attendus par le frontend
         response_data = self.get_serializer(next_ticket).data
         response_data['counter'] = counter_id
@@ -588,40 +569,11 @@ class QueueTicketViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        today = date.today()
-        tickets_today = QueueTicket.objects.filter(
-            agency_id=agency_id,
-            date=today
-        )
-        
-        # Compter par statut
-        waiting_count = tickets_today.filter(status='waiting').count()
-        serving_count = tickets_today.filter(status__in=['called', 'serving']).count()
-        completed_count = tickets_today.filter(status='completed').count()
-        
-        # Calculer le temps d'attente moyen (en minutes)
-        completed_with_times = tickets_today.filter(
-            status='completed',
-            called_at__isnull=False
-        )
-        
-        if completed_with_times.exists():
-            wait_times = []
-            for t in completed_with_times:
-                if t.called_at and t.created_at:
-                    wait_time = (t.called_at - t.created_at).total_seconds() / 60
-                    wait_times.append(wait_time)
-            average_wait_time = sum(wait_times) / len(wait_times) if wait_times else 0
-        else:
-            average_wait_time = 0
+        state = live_state.get_state(agency_id)
+        if state is None:
+            return Response({'error': 'Agence introuvable'}, status=status.HTTP_404_NOT_FOUND)
         
-        return Response({
-            'waiting_count': waiting_count,
-            'serving_count': serving_count,
-            'completed_today': completed_count,
-            'average_wait_time': round(average_wait_time, 1),
-            'total_today': tickets_today.count(),
-        })
+        return Response(live_state.queue_stats(state))
 
 
 class DailyQueueStatsViewSet(viewsets.ReadOnlyModelViewSet):
@@ -630,5 +582,91 @@ class DailyQueueStatsViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = DailyQueueStatsSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, OrderingFilter]
-    filterset_fields = ['agency', 'date']
+    filterset_fields = {'agency': ['exact'], 'date': ['exact', 'gte', 'lte']}
     ordering_fields = ['date']
+    
+    TREND_PERIODS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+    
+    @action(detail=False, methods=['get'])
+    def trends(self, request):
+        """
+        Tendances par jour, semaine ou mois, calculées sur les statistiques
+        consolidées uniquement (jamais sur les tickets).
+        
+        Paramètres: agency, date_from, date_to, period (day, week, month).
+        """
+        period = request.query_params.get('period', 'day')
+        if period not in self.TREND_PERIODS:
+            return Response({'error': 'period doit valoir day, week ou month'}, status=400)
+        
+        queryset = self.get_queryset()
+        if request.query_params.get('agency'):
+            queryset = queryset.filter(agency_id=request.query_params['agency'])
+        try:
+            if request.query_params.get('date_from'):
+                queryset = queryset.filter(date__gte=date.fromisoformat(request.query_params['date_from']))
+            if request.query_params.get('date_to'):
+                queryset = queryset.filter(date__lte=date.fromisoformat(request.query_params['date_to']))
+        except ValueError:
+            return Response({'error': 'Date invalide (AAAA-MM-JJ)'}, status=400)
+        
+        rows = (
+            queryset.annotate(period=self.TREND_PERIODS[period]('date'))
+            .values('period')
+            .annotate(
+                total_tickets=Sum('total_tickets'),
+                completed_tickets=Sum('completed_tickets'),
+                cancelled_tickets=Sum('cancelled_tickets'),
+                no_show_tickets=Sum('no_show_tickets'),
+                # Moyennes pondérées par le nombre de tickets de chaque jour
+                wait_total=Sum(F('avg_wait_time') * F('wait_count')),
+                wait_count=Sum('wait_count'),
+                service_total=Sum(F('avg_service_time') * F('service_count')),
+                service_count=Sum('service_count'),
+                peak_wait_time=Max('peak_wait_time'),
+            )
+            .order_by('period')
+        )
+        
+        def weighted(total, count):
+            return round(total / count) if count and total is not None else None
+        
+        return Response([
+            {
+                'period': row['period'].date() if hasattr(row['period'], 'date') else row['period'],
+                'total_tickets': row['total_tickets'],
+                'completed_tickets': row['completed_tickets'],
+                'cancelled_tickets': row['cancelled_tickets'],
+                'no_show_tickets': row['no_show_tickets'],
+                'avg_wait_time': weighted(row['wait_total'], row['wait_count']),
+                'avg_service_time': weighted(row['service_total'], row['service_count']),
+                'peak_wait_time': row['peak_wait_time'],
+            }
+            for row in rows
+        ])
+
+
+async def queue_feed(request):
+    """
+    Flux Server-Sent Events d'une agence (moniteurs, bornes, guichets).
+    
+    Envoie un instantané de l'écran (ou les événements manqués si
+    Last-Event-ID est fourni), puis un delta à chaque changement.
+    """
+    agency_id = request.GET.get('agency')
+    if not agency_id:
+        return JsonResponse({'error': 'agency parameter required'}, status=400)
+    
+    state = await sync_to_async(live_state.get_state)(agency_id)
+    if state is None:
+        return JsonResponse({'error': 'Agence introuvable'}, status=404)
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    response = StreamingHttpResponse(
+        feed.event_stream(agency_id, last_event_id),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Pas de mise en tampon par un proxy nginx
+    response['X-Accel-Buffering'] = 'no'
+    return response
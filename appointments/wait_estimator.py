@@ -0,0 +1,168 @@
+"""
+Estimation en ligne des temps d'attente
+
+Pour chaque (agence, service), et pour l'agence entière, on tient des
+moyennes mobiles exponentielles (EWMA) de la durée de service (pris en
+charge ou appelé -> terminé) et de l'intervalle entre deux arrivées. La
+mémoire est constante et chaque événement de ticket coûte O(1).
+
+L'attente d'un ticket est estimée à partir de sa position dans la file et
+du nombre de guichets ouverts:
+
+    attente = (position - guichets libres) × durée de service moyenne / guichets ouverts
+
+La durée de service est celle du service du ticket dès que son estimateur
+a SERVICE_MIN_SAMPLES mesures, celle de l'agence sinon.
+
+Les statistiques sont conservées dans le cache sur une longue durée, pour
+que les estimations du matin profitent des journées précédentes. Une
+mise à jour perdue lors d'écritures concurrentes ne fait que retarder
+légèrement la convergence de la moyenne.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+# Au-delà, l'écart entre deux arrivées n'est pas un intervalle (nuit, fermeture)
+SESSION_GAP_SECONDS = 2 * 3600
+STATS_TIMEOUT = 30 * 24 * 3600
+DEFAULT_SERVICE_MINUTES = 15
+# Mesures avant de préférer la durée d'un service à celle de l'agence
+SERVICE_MIN_SAMPLES = 5
+
+ALL_SERVICES = '*'
+
+
+def _alpha():
+    return getattr(settings, 'QUEUE_ESTIMATOR_ALPHA', 0.2)
+
+
+class FlowEstimator:
+    """Statistiques EWMA d'un flux de tickets (un service ou toute l'agence)"""
+
+    def __init__(self, alpha=None, service_seconds=None, interarrival_seconds=None,
+                 last_arrival=None, samples=0):
+        self.alpha = alpha or _alpha()
+        self.service_seconds = service_seconds
+        self.interarrival_seconds = interarrival_seconds
+        self.last_arrival = last_arrival
+        self.samples = samples
+
+    def _smooth(self, current, sample):
+        return sample if current is None else current + self.alpha * (sample - current)
+
+    def observe_arrival(self, timestamp):
+        """Arrivée d'un ticket (horodatage en secondes)"""
+        if self.last_arrival is not None:
+            gap = timestamp - self.last_arrival
+            if 0 <= gap <= SESSION_GAP_SECONDS:
+                self.interarrival_seconds = self._smooth(self.interarrival_seconds, gap)
+        self.last_arrival = max(timestamp, self.last_arrival or timestamp)
+
+    def observe_service(self, seconds):
+        """Durée d'un service terminé"""
+        if seconds >= 0:
+            self.service_seconds = self._smooth(self.service_seconds, seconds)
+            self.samples += 1
+
+    def arrivals_per_hour(self):
+        if not self.interarrival_seconds:
+            return None
+        return 3600 / self.interarrival_seconds
+
+    def to_dict(self):
+        return {
+            'service_seconds': self.service_seconds,
+            'interarrival_seconds': self.interarrival_seconds,
+            'last_arrival': self.last_arrival,
+            'samples': self.samples,
+        }
+
+    @classmethod
+    def from_dict(cls, data, alpha=None):
+        return cls(alpha=alpha, **(data or {}))
+
+
+def eta_minutes(position, open_counters, service_seconds, idle_counters=0):
+    """
+    Attente estimée (minutes) d'un ticket à la position donnée (1 = prochain).
+
+    Les premiers tickets sont pris par les guichets libres; au-delà, il
+    faut attendre (position - guichets libres) fins de service, qui
+    surviennent en moyenne toutes les durée / guichets secondes.
+    """
+    remaining = position - idle_counters
+    if remaining <= 0:
+        return 0
+    return round(remaining * service_seconds / max(open_counters, 1) / 60)
+
+
+def _key(agency_id, service_id):
+    return f'appointments:wait-estimator:{agency_id}:{service_id}'
+
+
+def _service_durations(estimators):
+    """{service: durée de service} des estimateurs de service assez alimentés"""
+    return {
+        str(service_id): estimator.service_seconds
+        for service_id, estimator in estimators.items()
+        if estimator.samples >= SERVICE_MIN_SAMPLES and estimator.service_seconds
+    }
+
+
+def snapshot(estimator, services=None):
+    """Résumé de l'agence (et de ses services) conservé dans l'état en direct de la file"""
+    arrivals = estimator.arrivals_per_hour()
+    return {
+        'service_seconds': estimator.service_seconds,
+        'arrivals_per_hour': round(arrivals, 1) if arrivals else None,
+        'samples': estimator.samples,
+        'services': _service_durations(services or {}),
+    }
+
+
+def agency_snapshot(agency_id, service_ids=()):
+    """Résumé de l'agence et des services donnés (une lecture du cache)"""
+    service_ids = {str(service_id) for service_id in service_ids}
+    keys = {_key(agency_id, service_id): service_id for service_id in service_ids}
+    stored = cache.get_many([_key(agency_id, ALL_SERVICES), *keys])
+    services = {service_id: FlowEstimator.from_dict(stored.get(key)) for key, service_id in keys.items()}
+    return snapshot(FlowEstimator.from_dict(stored.get(_key(agency_id, ALL_SERVICES))), services)
+
+
+def sample_event(ticket, previous_status, created):
+    """
+    Mesures apportées par la sauvegarde d'un ticket (arrivée, durée d'un
+    service terminé), relevées au moment de la sauvegarde. None si aucune.
+    """
+    arrival = ticket.created_at.timestamp() if created and ticket.created_at else None
+    service_seconds = None
+    started = ticket.served_at or ticket.called_at
+    if ticket.status == 'completed' and previous_status != 'completed' and started and ticket.completed_at:
+        service_seconds = (ticket.completed_at - started).total_seconds()
+    if arrival is None and service_seconds is None:
+        return None
+    return {
+        'agency_id': ticket.agency_id,
+        'service_id': ticket.service_id,
+        'arrival': arrival,
+        'service_seconds': service_seconds,
+    }
+
+
+def observe(sample):
+    """
+    Intégrer une mesure aux statistiques; retourne le résumé à jour de
+    l'agence, avec la durée du service du ticket s'il est assez alimenté
+    """
+    keys = [_key(sample['agency_id'], ALL_SERVICES), _key(sample['agency_id'], sample['service_id'])]
+    stored = cache.get_many(keys)
+    estimators = [FlowEstimator.from_dict(stored.get(key)) for key in keys]
+
+    for estimator in estimators:
+        if sample['arrival'] is not None:
+            estimator.observe_arrival(sample['arrival'])
+        if sample['service_seconds'] is not None:
+            estimator.observe_service(sample['service_seconds'])
+
+    cache.set_many({key: estimator.to_dict() for key, estimator in zip(keys, estimators)}, STATS_TIMEOUT)
+    return snapshot(estimators[0], {sample['service_id']: estimators[1]})
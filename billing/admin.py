@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Invoice, InvoiceLine, Payment, Reminder
+from .models import Invoice, InvoiceLine, InvoiceSequence, OutboxMessage, Payment, Reminder
 
 class InvoiceLineInline(admin.TabularInline):
     model = InvoiceLine
@@ -10,17 +10,17 @@ class InvoiceAdmin(admin.ModelAdmin):
     list_display = ('invoice_number', 'client', 'total', 'status', 'created_at')
     list_filter = ('status', 'created_at')
     search_fields = ('invoice_number', 'client__last_name')
-    readonly_fields = ('invoice_number', 'created_at', 'updated_at')
+    readonly_fields = ('invoice_number', 'amount_paid', 'balance', 'created_at', 'updated_at')
     inlines = [InvoiceLineInline]
     fieldsets = (
         ('Informations', {
-            'fields': ('invoice_number', 'client', 'site', 'status')
+            'fields': ('invoice_number', 'client', 'site', 'contract', 'status')
         }),
         ('Période', {
             'fields': ('period_start', 'period_end')
         }),
         ('Montants', {
-            'fields': ('currency', 'subtotal', 'tax_amount', 'total')
+            'fields': ('currency', 'subtotal', 'tax_amount', 'total', 'amount_paid', 'balance')
         }),
         ('Fichiers', {
             'fields': ('pdf_file',),
@@ -45,3 +45,15 @@ class ReminderAdmin(admin.ModelAdmin):
     list_filter = ('reminder_type', 'sent_date')
     search_fields = ('invoice__invoice_number',)
     readonly_fields = ('sent_date',)
+
+@admin.register(InvoiceSequence)
+class InvoiceSequenceAdmin(admin.ModelAdmin):
+    list_display = ('prefix', 'last_number', 'updated_at')
+    readonly_fields = ('updated_at',)
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'recipient', 'subject', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('kind', 'status', 'created_at')
+    search_fields = ('recipient', 'subject', 'invoice__invoice_number')
+    readonly_fields = ('created_at', 'sent_at')
@@ -0,0 +1,284 @@
+"""
+Génération mensuelle des factures à partir des contrats et des relevés
+
+Les contrats actifs sont parcourus par lots (pagination par clé). Pour chaque
+lot, les relevés d'ouverture et de clôture de chaque compteur sont lus en une
+requête (sous-requêtes corrélées), la consommation est agrégée par site, puis
+factures et lignes sont insérées en masse avec une plage de numéros allouée
+en une seule fois sur la séquence.
+
+La génération est idempotente: une facture par (contrat, début de période),
+garantie par une contrainte d'unicité et une anti-jointure sous le verrou de
+la séquence.
+
+Les relevés sont rattachés aux sites, pas aux contrats: un site portant
+plusieurs contrats de consommation actifs sur la période ne peut être
+réparti entre eux. Ces contrats ne sont pas facturés (chacun aurait reçu
+toute la consommation du site) et sont signalés pour un traitement manuel.
+"""
+import calendar
+import re
+import time
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from crm.models import Contract
+from operations.models import Meter, MeterReading
+from .models import Invoice, InvoiceLine, InvoiceSequence
+
+INVOICE_PREFIX = 'MES'
+INVOICE_NUMBER_DIGITS = 6
+
+GENERATION_CHUNK_SIZE = getattr(settings, 'BILLING_GENERATION_CHUNK_SIZE', 1000)
+
+LINE_DESCRIPTIONS = {
+    'consommation': "Consommation électrique",
+    'mensuel': "Abonnement mensuel",
+    'forfait': "Forfait",
+}
+
+
+def invoice_prefix(year=None):
+    """Préfixe de numérotation de l'année (ex: MES-2026)"""
+    return f"{INVOICE_PREFIX}-{year or timezone.localdate().year}"
+
+
+def _initial_number(prefix):
+    """Plus grand numéro déjà attribué pour ce préfixe (reprise d'un existant)"""
+    pattern = rf'^{re.escape(prefix)}-[0-9]{{{INVOICE_NUMBER_DIGITS}}}$'
+    last = Invoice.objects.filter(invoice_number__regex=pattern).aggregate(
+        last=Max('invoice_number')
+    )['last']
+    return int(last.rsplit('-', 1)[1]) if last else 0
+
+
+def _locked_sequence(prefix):
+    try:
+        return InvoiceSequence.objects.select_for_update().get(prefix=prefix)
+    except InvoiceSequence.DoesNotExist:
+        try:
+            with transaction.atomic():
+                InvoiceSequence.objects.create(prefix=prefix, last_number=_initial_number(prefix))
+        except IntegrityError:
+            # Créée entre-temps par un autre processus
+            pass
+        return InvoiceSequence.objects.select_for_update().get(prefix=prefix)
+
+
+def allocate_invoice_numbers(count, prefix=None):
+    """
+    Réserver `count` numéros consécutifs en une seule écriture sur la séquence.
+
+    À appeler dans la transaction qui insère les factures: le verrou sur la
+    séquence est conservé jusqu'à la validation et une annulation restitue la
+    plage, ce qui garantit une numérotation sans trou.
+    """
+    prefix = prefix or invoice_prefix()
+    with transaction.atomic():
+        sequence = _locked_sequence(prefix)
+        start = sequence.last_number + 1
+        InvoiceSequence.objects.filter(pk=sequence.pk).update(last_number=F('last_number') + count)
+    return [f"{prefix}-{number:0{INVOICE_NUMBER_DIGITS}d}" for number in range(start, start + count)]
+
+
+def parse_period(value):
+    """'YYYY-MM' -> (premier jour, dernier jour)"""
+    match = re.fullmatch(r'(\d{4})-(\d{2})', value or '')
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        raise ValueError(f"Période invalide: {value!r} (format attendu: YYYY-MM)")
+    year, month = int(match.group(1)), int(match.group(2))
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def active_contracts(period_start, period_end):
+    """Contrats actifs sur la période"""
+    return Contract.objects.filter(
+        status='actif',
+        start_date__lte=period_end,
+    ).filter(
+        Q(end_date__isnull=True) | Q(end_date__gte=period_start)
+    )
+
+
+def billable_contracts(period_start, period_end):
+    """Contrats actifs sur la période et pas encore facturés pour celle-ci"""
+    return active_contracts(period_start, period_end).exclude(
+        Exists(Invoice.objects.filter(contract=OuterRef('pk'), period_start=period_start))
+    ).order_by('pk')
+
+
+def shared_consumption_sites(period_start, period_end):
+    """Sites portant plusieurs contrats de consommation actifs sur la période"""
+    # order_by(): le tri par défaut des contrats fausserait le regroupement
+    return set(
+        active_contracts(period_start, period_end).filter(contract_type='consommation')
+        .order_by().values('site_id').annotate(contracts=Count('pk'))
+        .filter(contracts__gt=1).values_list('site_id', flat=True)
+    )
+
+
+def site_consumption(site_ids, period_start, period_end):
+    """
+    Consommation de la période par site, en une requête.
+
+    Relevé d'ouverture: dernier relevé avant la période, à défaut le premier
+    relevé de la période. Relevé de clôture: dernier relevé de la période.
+    """
+    readings = MeterReading.objects.filter(meter=OuterRef('pk'))
+    opening = Coalesce(
+        Subquery(
+            readings.filter(reading_date__lt=period_start)
+            .order_by('-reading_date').values('reading_value')[:1]
+        ),
+        Subquery(
+            readings.filter(reading_date__gte=period_start, reading_date__lte=period_end)
+            .order_by('reading_date').values('reading_value')[:1]
+        ),
+    )
+    closing = Subquery(
+        readings.filter(reading_date__gte=period_start, reading_date__lte=period_end)
+        .order_by('-reading_date').values('reading_value')[:1]
+    )
+
+    consumption = {}
+    rows = Meter.objects.filter(equipment__site_id__in=site_ids).annotate(
+        opening=opening, closing=closing
+    ).values_list('equipment__site_id', 'opening', 'closing')
+    for site_id, opening_value, closing_value in rows:
+        if opening_value is None or closing_value is None:
+            continue
+        delta = max(Decimal(closing_value) - Decimal(opening_value), Decimal('0'))
+        consumption[site_id] = consumption.get(site_id, Decimal('0')) + delta
+    return consumption
+
+
+def build_invoices(contracts, consumption, period_start, period_end, user=None):
+    """Construire (sans les enregistrer) les factures et lignes d'un lot de contrats"""
+    invoices, lines = [], []
+    for contract_id, client_id, site_id, contract_type, rate, currency in contracts:
+        if contract_type == 'consommation':
+            quantity = consumption.get(site_id, Decimal('0'))
+        else:
+            quantity = Decimal('1')
+        total = (quantity * rate).quantize(Decimal('0.01'))
+
+        invoice = Invoice(
+            id=uuid.uuid4(),
+            contract_id=contract_id,
+            client_id=client_id,
+            site_id=site_id,
+            period_start=period_start,
+            period_end=period_end,
+            currency=currency,
+            subtotal=total,
+            tax_amount=0,
+            total=total,
+            amount_paid=0,
+            balance=total,
+            status='brouillon',
+            created_by=user,
+        )
+        invoices.append(invoice)
+        lines.append(InvoiceLine(
+            invoice_id=invoice.id,
+            description=f"{LINE_DESCRIPTIONS.get(contract_type, contract_type)} {period_start:%m/%Y}",
+            quantity=quantity,
+            unit_price=rate,
+            discount=0,
+            total=total,
+        ))
+    return invoices, lines
+
+
+def generate_invoices(period, chunk_size=None, user=None):
+    """
+    Générer les factures brouillon de la période 'YYYY-MM'.
+
+    Mémoire bornée par la taille de lot; chaque lot est inséré dans sa propre
+    transaction. Retourne le nombre de factures, de lignes, le montant total,
+    les contrats écartés (consommation d'un site partagé) et les durées de
+    chaque phase.
+    """
+    period_start, period_end = parse_period(period)
+    chunk_size = chunk_size or GENERATION_CHUNK_SIZE
+
+    stats = {
+        'period': period,
+        'invoices': 0,
+        'lines': 0,
+        'amount': Decimal('0'),
+        'batches': 0,
+        'skipped': [],
+        'timings': {'select': 0.0, 'compute': 0.0, 'insert': 0.0, 'total': 0.0},
+    }
+    started = time.monotonic()
+
+    candidates = billable_contracts(period_start, period_end)
+    shared_sites = shared_consumption_sites(period_start, period_end)
+    last_pk = None
+
+    while True:
+        chunk = candidates.filter(pk__gt=last_pk) if last_pk else candidates
+
+        t0 = time.monotonic()
+        rows = list(chunk.values_list(
+            'pk', 'client_id', 'site_id', 'contract_type', 'rate', 'currency'
+        )[:chunk_size])
+        stats['timings']['select'] += time.monotonic() - t0
+
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+
+        # Consommation d'un site à plusieurs contrats: non répartissable
+        shared = [row for row in rows if row[3] == 'consommation' and row[2] in shared_sites]
+        stats['skipped'] += [str(row[0]) for row in shared]
+        rows = [row for row in rows if row not in shared]
+        if not rows:
+            continue
+
+        t0 = time.monotonic()
+        consumption = site_consumption(
+            {row[2] for row in rows if row[3] == 'consommation'}, period_start, period_end
+        )
+        stats['timings']['compute'] += time.monotonic() - t0
+
+        t0 = time.monotonic()
+        with transaction.atomic():
+            prefix = invoice_prefix()
+            _locked_sequence(prefix)
+
+            # Sous le verrou: écarter les contrats facturés par un passage concurrent
+            already_billed = set(Invoice.objects.filter(
+                contract_id__in=[row[0] for row in rows], period_start=period_start
+            ).values_list('contract_id', flat=True))
+            rows = [row for row in rows if row[0] not in already_billed]
+            if not rows:
+                continue
+
+            invoices, lines = build_invoices(rows, consumption, period_start, period_end, user=user)
+            for invoice, number in zip(invoices, allocate_invoice_numbers(len(invoices), prefix)):
+                invoice.invoice_number = number
+
+            Invoice.objects.bulk_create(invoices)
+            InvoiceLine.objects.bulk_create(lines)
+        stats['timings']['insert'] += time.monotonic() - t0
+
+        stats['invoices'] += len(invoices)
+        stats['lines'] += len(lines)
+        stats['amount'] += sum(invoice.total for invoice in invoices)
+        stats['batches'] += 1
+
+    stats['amount'] = str(stats['amount'])
+    stats['timings'] = {
+        phase: round(seconds, 3) for phase, seconds in stats['timings'].items()
+    }
+    stats['timings']['total'] = round(time.monotonic() - started, 3)
+    return stats
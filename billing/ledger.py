@@ -0,0 +1,100 @@
+"""
+Grand livre des factures (montant payé / solde)
+
+Invoice.amount_paid et Invoice.balance sont maintenus de façon incrémentale:
+chaque changement d'un paiement confirmé applique un delta par un UPDATE
+atomique (expressions F), sans jamais recalculer la somme des paiements.
+La commande reconcile_invoice_ledger recalcule tout en une requête agrégée.
+"""
+from decimal import Decimal
+
+from django.db.models import Case, CharField, DecimalField, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Invoice, Payment
+
+ZERO = Decimal('0.00')
+
+# Statuts fixés par les paiements
+PAYMENT_STATUSES = ('partiellement_payee', 'payee')
+
+
+def _decimal(value):
+    return Value(Decimal(value), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def apply_payment_delta(invoice_id, delta):
+    """
+    Ajouter `delta` au montant payé d'une facture en un seul UPDATE.
+
+    Le solde et le statut sont calculés à partir de l'ancien montant payé et
+    placés AVANT amount_paid: MySQL évalue les affectations du SET de gauche à
+    droite avec les valeurs déjà modifiées.
+
+    Le statut suit le montant payé dans les deux sens: un paiement retiré
+    (supprimé ou plus confirmé) repasse une facture payée en
+    partiellement_payee, ou en envoyee s'il ne reste rien, pour qu'elle
+    soit de nouveau relancée. Un retrait ne touche pas au statut des
+    factures qui n'étaient pas en cours de paiement (brouillon, annulée...).
+    """
+    delta = Decimal(delta)
+    if not invoice_id or not delta:
+        return 0
+
+    new_amount_paid = F('amount_paid') + _decimal(delta)
+    updates = {
+        'balance': Greatest(F('total') - new_amount_paid, _decimal(ZERO)),
+    }
+    unchanged = [] if delta > 0 else [When(~Q(status__in=PAYMENT_STATUSES), then=F('status'))]
+    updates['status'] = Case(
+        *unchanged,
+        When(Q(total__lte=new_amount_paid), then=Value('payee')),
+        When(Q(amount_paid__gt=-delta), then=Value('partiellement_payee')),
+        default=Value('envoyee'),
+        output_field=CharField(),
+    )
+    updates['amount_paid'] = new_amount_paid
+
+    return Invoice.objects.filter(pk=invoice_id).update(**updates)
+
+
+def refresh_balance(invoice):
+    """Recalculer le solde d'une facture après modification de son total"""
+    Invoice.objects.filter(pk=invoice.pk).update(
+        balance=Greatest(F('total') - F('amount_paid'), _decimal(ZERO))
+    )
+    invoice.balance = Invoice.objects.values_list('balance', flat=True).get(pk=invoice.pk)
+
+
+def confirmed_total_subquery():
+    """Somme des paiements confirmés de la facture courante (sous-requête corrélée)"""
+    confirmed = (
+        Payment.objects.filter(invoice=OuterRef('pk'), status='confirmed')
+        .order_by()
+        .values('invoice')
+        .annotate(total_paid=Sum('amount'))
+        .values('total_paid')
+    )
+    return Coalesce(
+        Subquery(confirmed, output_field=DecimalField(max_digits=12, decimal_places=2)),
+        _decimal(ZERO),
+    )
+
+
+def ledger_drift(queryset=None):
+    """Factures dont le grand livre ne correspond pas aux paiements confirmés"""
+    queryset = Invoice.objects.all() if queryset is None else queryset
+    return queryset.annotate(expected_paid=confirmed_total_subquery()).filter(
+        ~Q(amount_paid=F('expected_paid'))
+        | ~Q(balance=Greatest(F('total') - F('expected_paid'), _decimal(ZERO)))
+    )
+
+
+def reconcile_ledger(queryset=None):
+    """Recalculer le grand livre en un seul UPDATE (sous-requête agrégée)"""
+    queryset = Invoice.objects.all() if queryset is None else queryset
+    paid = confirmed_total_subquery()
+    return queryset.update(
+        balance=Greatest(F('total') - paid, _decimal(ZERO)),
+        amount_paid=paid,
+    )
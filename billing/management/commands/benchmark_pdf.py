@@ -0,0 +1,144 @@
+"""
+Commande pour mesurer le débit de génération des PDF (documents / seconde / cœur).
+
+Les documents sont synthétiques (objets non enregistrés) et rendus en mémoire:
+aucune écriture en base ni sur disque.
+"""
+
+import io
+import os
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+
+def _synthetic_invoice(index, line_count):
+    from django.utils import timezone
+    from billing.models import Invoice, InvoiceLine
+    from crm.models import Client
+
+    client = Client(
+        first_name='Client',
+        last_name=f'Benchmark {index}',
+        email=f'client{index}@example.com',
+        phone='+243 000 000 000',
+        address='Avenue du Commerce, Gombe, Kinshasa',
+    )
+    invoice = Invoice(
+        invoice_number=f'BENCH-{index:06d}',
+        client=client,
+        period_start=date(2026, 1, 1),
+        period_end=date(2026, 1, 31),
+        currency='USD',
+        subtotal=Decimal('100.00') * line_count,
+        tax_amount=Decimal('0.00'),
+        total=Decimal('100.00') * line_count,
+        status='validee',
+        created_at=timezone.now(),
+    )
+    lines = [
+        InvoiceLine(
+            invoice=invoice,
+            description=f'Consommation électrique - poste {n + 1}',
+            quantity=Decimal('500.00'),
+            unit_price=Decimal('0.20'),
+            discount=Decimal('0.00'),
+            total=Decimal('100.00'),
+        )
+        for n in range(line_count)
+    ]
+    # Lignes "préchargées": invoice.lines.all() ne touche pas la base
+    invoice._prefetched_objects_cache = {'lines': lines}
+    return invoice
+
+
+def _synthetic_payment(index, line_count):
+    from billing.models import Payment
+
+    return Payment(
+        invoice=_synthetic_invoice(index, line_count),
+        reference=f'BENCH-PAY-{index:06d}',
+        amount=Decimal('100.00'),
+        method='mobile_money',
+        status='confirmed',
+        mobile_operator='mpesa',
+        mobile_number='+243 111 222 333',
+        transaction_id=f'TX-{index}',
+        payment_date=date(2026, 2, 1),
+    )
+
+
+def _render_synthetic(kind, start, count, line_count, cold=False):
+    """Rendre `count` documents en mémoire; retourne la durée en secondes"""
+    from billing.pdf_generator import (
+        generate_invoice_pdf, generate_receipt_pdf, get_styles, get_table_styles,
+    )
+
+    build, render = {
+        'invoice': (_synthetic_invoice, generate_invoice_pdf),
+        'receipt': (_synthetic_payment, generate_receipt_pdf),
+    }[kind]
+    documents = [build(start + i, line_count) for i in range(count)]
+
+    started = time.perf_counter()
+    for document in documents:
+        if cold:
+            # Comportement historique: styles reconstruits à chaque document
+            get_styles.cache_clear()
+            get_table_styles.cache_clear()
+        render(document, io.BytesIO())
+    return time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = 'Mesure le débit de génération des PDF (factures ou reçus) par cœur'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=['invoice', 'receipt'], default='invoice', help='Type de document')
+        parser.add_argument('--count', type=int, default=200, help='Nombre de documents par mesure')
+        parser.add_argument('--lines', type=int, default=5, help='Lignes par facture')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Processus du pool')
+
+    def handle(self, *args, **options):
+        from concurrent.futures import ProcessPoolExecutor
+        from billing.pdf_batch import _init_worker
+
+        kind = options['kind']
+        count = options['count']
+        line_count = options['lines']
+        workers = max(options['workers'], 1)
+
+        self.stdout.write(f'\n📊 Benchmark PDF: {count} {kind}(s), {line_count} ligne(s), {workers} processus')
+        self.stdout.write('=' * 50)
+
+        # Échauffement (import des polices, premier rendu)
+        _render_synthetic(kind, 0, 1, line_count)
+
+        cold = _render_synthetic(kind, 0, count, line_count, cold=True)
+        self.stdout.write(f'Séquentiel, styles reconstruits : {count / cold:8.1f} PDF/s')
+
+        warm = _render_synthetic(kind, 0, count, line_count)
+        self.stdout.write(f'Séquentiel, styles en cache     : {count / warm:8.1f} PDF/s')
+
+        per_worker = max(count // workers, 1)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            # Démarrage et échauffement des processus hors mesure
+            list(pool.map(_render_synthetic, [kind] * workers, [0] * workers, [1] * workers, [line_count] * workers))
+            
+            started = time.perf_counter()
+            futures = [
+                pool.submit(_render_synthetic, kind, i * per_worker, per_worker, line_count)
+                for i in range(workers)
+            ]
+            for future in futures:
+                future.result()
+            elapsed = time.perf_counter() - started
+        total = per_worker * workers
+
+        self.stdout.write(f"{f'Pool ({workers} processus)':<32} : {total / elapsed:8.1f} PDF/s")
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {total / elapsed / workers:.1f} PDF/s par cœur '
+            f'(gain cache: x{cold / warm:.2f})'
+        ))
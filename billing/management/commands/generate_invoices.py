@@ -0,0 +1,41 @@
+"""
+Commande pour générer les factures mensuelles à partir des contrats actifs.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Génère les factures brouillon de la période à partir des contrats et des relevés'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--period',
+            required=True,
+            help='Période à facturer au format YYYY-MM',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Nombre de contrats traités par lot',
+        )
+
+    def handle(self, *args, **options):
+        from billing.invoicing import generate_invoices
+
+        try:
+            stats = generate_invoices(options['period'], chunk_size=options.get('chunk_size'))
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Période {stats['period']}: {stats['invoices']} facture(s), "
+            f"{stats['lines']} ligne(s), montant total {stats['amount']}"
+        ))
+        timings = ', '.join(f'{phase}={seconds}s' for phase, seconds in stats['timings'].items())
+        self.stdout.write(f"⏱️  {stats['batches']} lot(s) - {timings}")
+        if stats['skipped']:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️  {len(stats['skipped'])} contrat(s) de consommation non facturé(s), "
+                f"site partagé entre plusieurs contrats: {', '.join(stats['skipped'])}"
+            ))
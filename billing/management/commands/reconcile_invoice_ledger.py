@@ -0,0 +1,38 @@
+"""
+Commande pour recalculer le grand livre des factures (montant payé / solde).
+"""
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Recalcule Invoice.amount_paid et Invoice.balance à partir des paiements confirmés'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Affiche les factures en écart sans les corriger (code de sortie 1 si écart)",
+        )
+
+    def handle(self, *args, **options):
+        from billing.ledger import ledger_drift, reconcile_ledger
+
+        drift = ledger_drift()
+
+        if options.get('check'):
+            rows = list(drift.values_list('invoice_number', 'amount_paid', 'expected_paid')[:50])
+            count = drift.count()
+            for invoice_number, amount_paid, expected_paid in rows:
+                self.stdout.write(f'⚠️  {invoice_number}: {amount_paid} enregistré, {expected_paid} attendu')
+            if count:
+                self.stdout.write(self.style.ERROR(f'{count} facture(s) en écart'))
+                raise SystemExit(1)
+            self.stdout.write(self.style.SUCCESS('Grand livre cohérent'))
+            return
+
+        count = drift.count()
+        updated = reconcile_ledger()
+        self.stdout.write(self.style.SUCCESS(
+            f'Grand livre recalculé: {updated} facture(s), {count} écart(s) corrigé(s)'
+        ))
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:15
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+def backfill_ledger(apps, schema_editor):
+    """Initialiser le grand livre à partir des paiements confirmés (un seul UPDATE)"""
+    Invoice = apps.get_model('billing', 'Invoice')
+    Payment = apps.get_model('billing', 'Payment')
+
+    zero = Value(Decimal('0.00'), output_field=DecimalField(max_digits=12, decimal_places=2))
+    confirmed = (
+        Payment.objects.filter(invoice=OuterRef('pk'), status='confirmed')
+        .order_by()
+        .values('invoice')
+        .annotate(total_paid=Sum('amount'))
+        .values('total_paid')
+    )
+    paid = Coalesce(Subquery(confirmed, output_field=DecimalField(max_digits=12, decimal_places=2)), zero)
+    Invoice.objects.update(
+        balance=Greatest(F('total') - paid, zero),
+        amount_paid=paid,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0002_payment_mobile_number_payment_mobile_operator_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='amount_paid',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='balance',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0003_add_user_link_and_optional_fields'),
+        ('billing', '0003_invoice_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=20, unique=True)),
+                ('last_number', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Séquence de facturation',
+                'verbose_name_plural': 'Séquences de facturation',
+            },
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='contract',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='invoices', to='crm.contract'),
+        ),
+        migrations.AddConstraint(
+            model_name='invoice',
+            constraint=models.UniqueConstraint(fields=('contract', 'period_start'), name='unique_invoice_contract_period'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0004_invoice_contract_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='pdf_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='receipt_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
@@ -1,5 +1,5 @@
-from django.db import models
-from crm.models import Client, Site
+from django.db import models, transaction
+from crm.models import Client, Contract, Site
 from accounts.models import User
 import uuid
 
@@ -18,6 +18,7 @@ class Invoice(models.Model):
     
     client = models.ForeignKey(Client, on_delete=models.PROTECT, related_name='invoices')
     site = models.ForeignKey(Site, on_delete=models.SET_NULL, null=True, blank=True)
+    contract = models.ForeignKey(Contract, on_delete=models.SET_NULL, null=True, blank=True, related_name='invoices')
     
     period_start = models.DateField()
     period_end = models.DateField()
@@ -27,9 +28,14 @@ class Invoice(models.Model):
     tax_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     total = models.DecimalField(max_digits=12, decimal_places=2)
     
+    # Grand livre: maintenu par les signaux de Payment (voir billing/ledger.py)
+    amount_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    
     status = models.CharField(max_length=30, choices=STATUS_CHOICES, default='brouillon')
     
     pdf_file = models.FileField(upload_to='invoices/', null=True, blank=True)
+    pdf_hash = models.CharField(max_length=64, blank=True, editable=False)
     
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='created_invoices')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -43,9 +49,62 @@ class Invoice(models.Model):
             models.Index(fields=['client', '-created_at']),
             models.Index(fields=['status', '-created_at']),
         ]
+        constraints = [
+            # Une seule facture par contrat et par période (génération idempotente)
+            models.UniqueConstraint(fields=['contract', 'period_start'], name='unique_invoice_contract_period'),
+        ]
+    
+    LEDGER_FIELDS = ('amount_paid', 'balance')
     
     def __str__(self):
         return f"{self.invoice_number} - {self.client.last_name}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_total = dict(zip(field_names, values)).get('total')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        from .ledger import refresh_balance
+        
+        if self._state.adding:
+            self.balance = max(self.total - self.amount_paid, 0)
+            if not self.invoice_number:
+                # Numéro réservé et facture insérée dans la même transaction
+                from .invoicing import allocate_invoice_numbers
+                with transaction.atomic():
+                    self.invoice_number = allocate_invoice_numbers(1)[0]
+                    return super().save(*args, **kwargs)
+            return super().save(*args, **kwargs)
+        
+        # Ne jamais écraser le grand livre avec une valeur en mémoire
+        # potentiellement périmée: il n'est modifié que par des UPDATE atomiques
+        if kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.LEDGER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+        
+        loaded_total = getattr(self, '_loaded_total', None)
+        if loaded_total is not None and loaded_total != self.total:
+            refresh_balance(self)
+        self._loaded_total = self.total
+
+
+class InvoiceSequence(models.Model):
+    """Compteur de numérotation des factures par préfixe (ex: MES-2026)"""
+    prefix = models.CharField(max_length=20, unique=True)
+    last_number = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Séquence de facturation'
+        verbose_name_plural = 'Séquences de facturation'
+    
+    def __str__(self):
+        return f"{self.prefix} - {self.last_number}"
 
 
 class InvoiceLine(models.Model):
@@ -116,6 +175,7 @@ class Payment(models.Model):
     
     payment_date = models.DateField()
     receipt_pdf = models.FileField(upload_to='receipts/', null=True, blank=True)
+    receipt_hash = models.CharField(max_length=64, blank=True, editable=False)
     
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='created_payments')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -132,6 +192,21 @@ class Payment(models.Model):
     
     def __str__(self):
         return f"{self.reference} - {self.amount}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        row = dict(zip(field_names, values))
+        if {'invoice_id', 'status', 'amount'} <= row.keys():
+            instance._ledger_entry = (
+                row['invoice_id'],
+                row['amount'] if row['status'] == 'confirmed' else 0,
+            )
+        return instance
+    
+    def ledger_entry(self):
+        """Contribution actuelle du paiement au grand livre: (facture, montant)"""
+        return self.invoice_id, self.amount if self.status == 'confirmed' else 0
 
 
 class Reminder(models.Model):
@@ -154,3 +229,45 @@ class Reminder(models.Model):
     
     def __str__(self):
         return f"{self.invoice.invoice_number} - {self.reminder_type}"
+
+
+class OutboxMessage(models.Model):
+    """Notification email en attente d'envoi (vidée par lots, voir billing/outbox.py)"""
+    KINDS = [
+        ('reminder', 'Relance'),
+        ('deactivation', 'Coupure de service'),
+        ('reactivation', 'Réactivation de service'),
+        ('payment_confirmation', 'Confirmation de paiement'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('sent', 'Envoyé'),
+        ('failed', 'Échoué'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=30, choices=KINDS)
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    
+    invoice = models.ForeignKey(Invoice, on_delete=models.SET_NULL, null=True, blank=True, related_name='notifications')
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Notification (outbox)'
+        verbose_name_plural = 'Notifications (outbox)'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} - {self.recipient}"
@@ -0,0 +1,160 @@
+"""
+Outbox des notifications email de la facturation
+
+Les notifications sont rendues à partir des gabarits billing/emails/<type>.txt
+au moment de leur mise en file et stockées dans OutboxMessage. Elles sont
+ensuite envoyées par lots à travers une seule connexion SMTP par worker
+(send_messages); un lot en échec est retenté jusqu'à
+BILLING_OUTBOX_MAX_ATTEMPTS tentatives avant d'être marqué en échec.
+
+Le serveur SMTP ferme les connexions restées inactives: un envoi qui
+trouve la connexion coupée la rouvre et renvoie le lot une fois, sans
+compter de tentative.
+"""
+import time
+from smtplib import SMTPServerDisconnected
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+FROM_EMAIL = 'noreply@mwolo.energy'
+
+# Connexion SMTP conservée pour toute la vie du worker
+_connection = None
+
+
+@lru_cache(maxsize=None)
+def _templates(kind):
+    """Gabarits (sujet, corps) compilés une seule fois par processus"""
+    return (
+        get_template(f'billing/emails/{kind}_subject.txt'),
+        get_template(f'billing/emails/{kind}.txt'),
+    )
+
+
+def render_email(kind, context):
+    """Rendre (sujet, corps) d'une notification"""
+    subject_template, body_template = _templates(kind)
+    subject = ' '.join(subject_template.render(context).split())
+    return subject, body_template.render(context).strip() + '\n'
+
+
+def build_message(kind, recipient, context, invoice=None):
+    """Construire (sans l'enregistrer) une notification rendue"""
+    subject, body = render_email(kind, context)
+    return OutboxMessage(
+        kind=kind,
+        recipient=recipient,
+        subject=subject[:255],
+        body=body,
+        invoice=invoice,
+    )
+
+
+def enqueue(messages):
+    """Mettre en file une liste de notifications (une seule insertion)"""
+    messages = [message for message in messages if message.recipient]
+    OutboxMessage.objects.bulk_create(messages)
+    return len(messages)
+
+
+def enqueue_email(kind, recipient, context, invoice=None):
+    """Mettre en file une notification"""
+    return enqueue([build_message(kind, recipient, context, invoice=invoice)])
+
+
+def get_worker_connection():
+    """Connexion email ouverte une fois et réutilisée par le worker"""
+    global _connection
+    if _connection is None:
+        _connection = get_connection(fail_silently=False)
+        _connection.open()
+    return _connection
+
+
+def reset_worker_connection():
+    """Fermer la connexion (après une erreur): la suivante sera rouverte"""
+    global _connection
+    if _connection is not None:
+        try:
+            _connection.close()
+        except Exception:
+            pass
+    _connection = None
+
+
+def send_batch(emails):
+    """Envoyer sur la connexion du worker, rouverte une fois si elle a été coupée"""
+    try:
+        return get_worker_connection().send_messages(emails)
+    except (SMTPServerDisconnected, OSError):
+        reset_worker_connection()
+        return get_worker_connection().send_messages(emails)
+
+
+def drain_outbox(batch_size=None, max_batches=None):
+    """
+    Envoyer les notifications en attente par lots.
+
+    Chaque lot est verrouillé (SKIP LOCKED: plusieurs workers peuvent vider
+    l'outbox en parallèle), envoyé en un appel send_messages puis marqué
+    envoyé. En cas d'erreur, tout le lot est remis en attente avec une
+    tentative de plus, ou marqué en échec au-delà du maximum.
+
+    Retourne les métriques du passage (lots, envoyés, retentés, échecs,
+    débit en messages par seconde).
+    """
+    batch_size = batch_size or getattr(settings, 'BILLING_OUTBOX_BATCH_SIZE', 100)
+    max_attempts = getattr(settings, 'BILLING_OUTBOX_MAX_ATTEMPTS', 5)
+
+    stats = {'batches': 0, 'sent': 0, 'retried': 0, 'failed': 0, 'seconds': 0.0, 'per_second': 0.0}
+    started = time.monotonic()
+
+    while max_batches is None or stats['batches'] < max_batches:
+        with transaction.atomic():
+            batch = list(
+                OutboxMessage.objects.select_for_update(skip_locked=True)
+                .filter(status='pending')
+                .order_by('created_at')[:batch_size]
+            )
+            if not batch:
+                break
+            ids = [message.pk for message in batch]
+            stats['batches'] += 1
+
+            try:
+                send_batch([
+                    EmailMessage(message.subject, message.body, FROM_EMAIL, [message.recipient])
+                    for message in batch
+                ])
+            except Exception as e:
+                reset_worker_connection()
+                error = str(e)[:1000]
+                exhausted = [m.pk for m in batch if m.attempts + 1 >= max_attempts]
+                OutboxMessage.objects.filter(pk__in=ids).exclude(pk__in=exhausted).update(
+                    attempts=F('attempts') + 1, last_error=error,
+                )
+                OutboxMessage.objects.filter(pk__in=exhausted).update(
+                    attempts=F('attempts') + 1, last_error=error, status='failed',
+                )
+                stats['retried'] += len(ids) - len(exhausted)
+                stats['failed'] += len(exhausted)
+                # Lot remis en attente: on s'arrête, le prochain passage le retentera
+                break
+
+            OutboxMessage.objects.filter(pk__in=ids).update(
+                status='sent', sent_at=timezone.now(), attempts=F('attempts') + 1, last_error='',
+            )
+            stats['sent'] += len(ids)
+
+    stats['seconds'] = round(time.monotonic() - started, 3)
+    if stats['seconds']:
+        stats['per_second'] = round(stats['sent'] / stats['seconds'], 1)
+    return stats
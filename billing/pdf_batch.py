@@ -0,0 +1,90 @@
+"""
+Rendu des PDF par lots
+
+Un lot est rendu dans un seul processus: les styles ReportLab (mis en cache
+par pdf_generator) sont construits une fois, les objets sont chargés en une
+requête avec leurs relations et les chemins sont enregistrés en un seul
+bulk_update. Les lots sont répartis sur un groupe de tâches Celery
+(render_pdf_batch).
+
+Les factures et les reçus sont nommés et empreintés comme par le cache
+adressé par contenu (pdf_cache): un PDF rendu par lot est servi tel quel
+au premier téléchargement.
+"""
+import os
+
+from django.conf import settings
+from django.db.models import Prefetch
+
+from hr.models import Payroll
+from .models import Invoice, InvoiceLine, Payment
+from .pdf_cache import DOCUMENTS, pdf_path, remove_replaced
+from .pdf_generator import generate_invoice_pdf, generate_payroll_pdf, generate_receipt_pdf
+
+PDF_BATCH_SIZE = getattr(settings, 'BILLING_PDF_BATCH_SIZE', 200)
+
+PDF_KINDS = ('invoice', 'receipt', 'payroll')
+
+
+def _batch_queryset(kind, ids):
+    if kind == 'invoice':
+        return Invoice.objects.filter(id__in=ids).select_related('client', 'site').prefetch_related(
+            Prefetch('lines', queryset=InvoiceLine.objects.all()), 'payments'
+        ), generate_invoice_pdf, 'pdf_file'
+    if kind == 'receipt':
+        return Payment.objects.filter(id__in=ids).select_related(
+            'invoice__client'
+        ), generate_receipt_pdf, 'receipt_pdf'
+    if kind == 'payroll':
+        return Payroll.objects.filter(id__in=ids).select_related(
+            'employee__agency'
+        ), generate_payroll_pdf, 'pdf_file'
+    raise ValueError(f"Type de document inconnu: {kind}")
+
+
+def render_batch(kind, ids):
+    """
+    Rendre un lot de documents dans le processus courant.
+
+    Retourne {'rendered': n, 'errors': {id: message}}.
+    """
+    queryset, renderer, field = _batch_queryset(kind, ids)
+    fields = [field]
+    if kind in DOCUMENTS:
+        _, _, content_hash, _, _, hash_field, _, _ = DOCUMENTS[kind]
+        fields.append(hash_field)
+
+    rendered, replaced, errors = [], [], {}
+    for obj in queryset:
+        try:
+            if kind in DOCUMENTS:
+                digest = content_hash(obj)
+                filepath = pdf_path(kind, obj, digest)
+                if not os.path.exists(filepath):
+                    renderer(obj, filepath)
+                replaced.append((getattr(obj, field), filepath))
+                setattr(obj, hash_field, digest)
+            else:
+                filepath = renderer(obj)
+            setattr(obj, field, filepath)
+            rendered.append(obj)
+        except Exception as e:
+            errors[str(obj.pk)] = str(e)
+
+    # update via bulk_update: pas de signaux post_save par document
+    queryset.model.objects.bulk_update(rendered, fields, batch_size=PDF_BATCH_SIZE)
+    for previous, filepath in replaced:
+        remove_replaced(previous, filepath)
+    return {'rendered': len(rendered), 'errors': errors}
+
+
+def split_batches(ids, batch_size=None):
+    batch_size = batch_size or PDF_BATCH_SIZE
+    ids = [str(pk) for pk in ids]
+    return [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+
+
+def _init_worker():
+    """Initialiseur des processus d'un pool (benchmark_pdf)"""
+    import django
+    django.setup()
@@ -0,0 +1,150 @@
+"""
+Cache des PDF adressé par contenu (factures et reçus)
+
+Chaque document est identifié par l'empreinte SHA-256 des données qu'il
+affiche (facture, lignes, paiements). Le fichier est nommé d'après cette
+empreinte, qui sert aussi d'ETag: un PDF dont l'empreinte enregistrée ne
+correspond plus aux données est périmé et régénéré en arrière-plan.
+"""
+import hashlib
+import json
+import os
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Invoice, Payment
+from .pdf_generator import generate_invoice_pdf, generate_receipt_pdf
+
+# Durée du verrou évitant de lancer plusieurs rendus du même document
+RENDER_LOCK_TIMEOUT = getattr(settings, 'BILLING_PDF_RENDER_LOCK_TIMEOUT', 300)
+
+
+def _canonical(value):
+    if isinstance(value, (Decimal, int, float)) and not isinstance(value, bool):
+        return f"{Decimal(value):.2f}"
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value if value is None else str(value)
+
+
+def _digest(payload):
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    ).hexdigest()
+
+
+def invoice_content_hash(invoice):
+    """Empreinte de la facture, de ses lignes et de ses paiements"""
+    client = invoice.client
+    lines = sorted(invoice.lines.all(), key=lambda line: str(line.pk))
+    payments = sorted(invoice.payments.all(), key=lambda payment: str(payment.pk))
+    return _digest({
+        'invoice': [_canonical(value) for value in (
+            invoice.invoice_number, invoice.status, invoice.currency,
+            invoice.period_start, invoice.period_end,
+            invoice.created_at.date() if invoice.created_at else None,
+            invoice.subtotal, invoice.tax_amount, invoice.total,
+            invoice.site.name if invoice.site_id else None,
+        )],
+        'client': [client.first_name, client.last_name, client.email, client.phone, client.address],
+        'lines': [
+            [_canonical(value) for value in (
+                line.description, line.quantity, line.unit_price, line.discount, line.total,
+            )]
+            for line in lines
+        ],
+        'payments': [
+            [_canonical(value) for value in (payment.reference, payment.amount, payment.status)]
+            for payment in payments
+        ],
+    })
+
+
+def receipt_content_hash(payment):
+    """Empreinte d'un reçu de paiement"""
+    invoice = payment.invoice
+    return _digest({
+        'payment': [_canonical(value) for value in (
+            payment.reference, payment.amount, payment.method, payment.status,
+            payment.payment_date, payment.mobile_operator, payment.mobile_number,
+            payment.transaction_id,
+        )],
+        'invoice': [invoice.invoice_number, invoice.currency],
+        'client': [invoice.client.first_name, invoice.client.last_name],
+    })
+
+
+# type -> (modèle, relations, empreinte, rendu, champ fichier, champ empreinte, dossier, nom)
+DOCUMENTS = {
+    'invoice': (
+        Invoice, ('client', 'site'), invoice_content_hash, generate_invoice_pdf,
+        'pdf_file', 'pdf_hash', 'invoices', lambda obj: obj.invoice_number,
+    ),
+    'receipt': (
+        Payment, ('invoice__client',), receipt_content_hash, generate_receipt_pdf,
+        'receipt_pdf', 'receipt_hash', 'receipts', lambda obj: obj.reference,
+    ),
+}
+
+
+def cached_pdf(kind, obj):
+    """
+    Retourner (empreinte, chemin) si le PDF en cache est à jour, sinon
+    (empreinte, None).
+    """
+    _, _, content_hash, _, file_field, hash_field, _, _ = DOCUMENTS[kind]
+    digest = content_hash(obj)
+    stored = getattr(obj, file_field)
+    if getattr(obj, hash_field) == digest and stored and os.path.exists(stored.path):
+        return digest, stored.path
+    return digest, None
+
+
+def schedule_render(kind, obj, digest):
+    """Lancer le rendu en arrière-plan, une seule fois par version du document"""
+    from .tasks import render_cached_pdf
+
+    if cache.add(f'billing:pdf-render:{kind}:{obj.pk}:{digest}', 1, RENDER_LOCK_TIMEOUT):
+        render_cached_pdf.delay(kind, str(obj.pk))
+        return True
+    return False
+
+
+def pdf_path(kind, obj, digest):
+    """Chemin du PDF d'une version du document (nommé d'après son empreinte)"""
+    _, _, _, _, _, _, subdir, name = DOCUMENTS[kind]
+    return os.path.join(settings.MEDIA_ROOT, subdir, f"{kind}_{name(obj)}_{digest[:16]}.pdf")
+
+
+def remove_replaced(previous, filepath):
+    """Supprimer l'ancien fichier d'un document régénéré sous un autre nom"""
+    if previous and previous.name != filepath:
+        try:
+            if os.path.exists(previous.path):
+                os.remove(previous.path)
+        except (OSError, ValueError):
+            pass
+
+
+def render_pdf(kind, pk):
+    """
+    Générer le PDF de la version courante du document et l'enregistrer sous
+    un nom dérivé de son empreinte. L'ancien fichier est supprimé.
+    """
+    model, related, content_hash, renderer, file_field, hash_field, _, _ = DOCUMENTS[kind]
+    obj = model.objects.select_related(*related).get(pk=pk)
+    digest = content_hash(obj)
+
+    filepath = pdf_path(kind, obj, digest)
+    if not os.path.exists(filepath):
+        renderer(obj, filepath)
+
+    previous = getattr(obj, file_field)
+    # update(): pas de signaux post_save, pas d'écrasement des autres champs
+    model.objects.filter(pk=pk).update(**{file_field: filepath, hash_field: digest})
+    remove_replaced(previous, filepath)
+
+    cache.delete(f'billing:pdf-render:{kind}:{pk}:{digest}')
+    return filepath
@@ -8,32 +8,138 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT
 from django.conf import settings
+from functools import lru_cache
 import os
 from datetime import datetime
 
+BRAND_COLOR = colors.HexColor('#1a5490')
 
-def generate_invoice_pdf(invoice):
-    """Générer le PDF d'une facture"""
-    filename = f"invoice_{invoice.invoice_number}.pdf"
-    filepath = os.path.join(settings.MEDIA_ROOT, 'invoices', filename)
-    
-    # Créer le répertoire si nécessaire
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+
+@lru_cache(maxsize=None)
+def get_styles():
+    """Feuilles de style construites une seule fois par processus"""
+    styles = getSampleStyleSheet()
+    return {
+        'base': styles,
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            textColor=BRAND_COLOR,
+            spaceAfter=30,
+            alignment=TA_CENTER
+        ),
+        'footer': ParagraphStyle(
+            'Footer',
+            parent=styles['Normal'],
+            fontSize=9,
+            textColor=colors.grey,
+            alignment=TA_CENTER
+        ),
+        'confirmation': ParagraphStyle(
+            'Confirmation',
+            parent=styles['Normal'],
+            fontSize=14,
+            textColor=colors.green,
+            alignment=TA_CENTER,
+            spaceAfter=20
+        ),
+        'confidential': ParagraphStyle(
+            'Confidential',
+            parent=styles['Normal'],
+            fontSize=9,
+            textColor=colors.red,
+            alignment=TA_CENTER
+        ),
+    }
+
+
+@lru_cache(maxsize=None)
+def get_table_styles():
+    """Styles des tableaux, construits une seule fois par processus"""
+    return {
+        'invoice_info': TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ]),
+        'invoice_lines': TableStyle([
+            # En-tête
+            ('BACKGROUND', (0, 0), (-1, 0), BRAND_COLOR),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            
+            # Corps
+            ('ALIGN', (1, 1), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 1), (-1, -4), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -4), 1, colors.grey),
+            
+            # Totaux
+            ('ALIGN', (3, -3), (3, -1), 'RIGHT'),
+            ('ALIGN', (4, -3), (4, -1), 'RIGHT'),
+            ('FONTNAME', (3, -3), (-1, -1), 'Helvetica-Bold'),
+            ('LINEABOVE', (3, -3), (-1, -3), 2, colors.black),
+            ('LINEABOVE', (3, -1), (-1, -1), 2, colors.black),
+        ]),
+        'receipt': TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 11),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+            ('PADDING', (0, 0), (-1, -1), 10),
+        ]),
+        'payroll_employee': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), BRAND_COLOR),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('PADDING', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+            ('BACKGROUND', (0, 1), (0, -1), colors.lightgrey),
+        ]),
+        'payroll_details': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), BRAND_COLOR),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('PADDING', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -2), 1, colors.grey),
+            ('BACKGROUND', (0, 1), (0, -2), colors.lightgrey),
+            ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
+            ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, -1), (-1, -1), 14),
+            ('BACKGROUND', (0, -1), (-1, -1), colors.lightgreen),
+        ]),
+    }
+
+
+def _output_path(subdir, filename, output):
+    """
+    Destination du document: chemin ou fichier (ex: BytesIO) fourni par
+    l'appelant, sinon MEDIA_ROOT/<subdir>/<filename>.
+    """
+    if output is None:
+        output = os.path.join(settings.MEDIA_ROOT, subdir, filename)
+    if isinstance(output, str):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    return output
+
+
+def generate_invoice_pdf(invoice, output=None):
+    """Générer le PDF d'une facture (output: chemin ou fichier, optionnel)"""
+    filepath = _output_path('invoices', f"invoice_{invoice.invoice_number}.pdf", output)
     
     # Créer le document
     doc = SimpleDocTemplate(filepath, pagesize=A4)
     elements = []
-    styles = getSampleStyleSheet()
-    
-    # Style personnalisé pour le titre
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1a5490'),
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
+    cached = get_styles()
+    styles = cached['base']
+    title_style = cached['title']
     
     # En-tête
     elements.append(Paragraph("MWOLO ENERGY SYSTEMS", title_style))
@@ -57,10 +163,7 @@ def generate_invoice_pdf(invoice):
         info_data.insert(4, ['<b>Site:</b>', invoice.site.name])
     
     info_table = Table(info_data, colWidths=[4*cm, 12*cm])
-    info_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-    ]))
+    info_table.setStyle(get_table_styles()['invoice_info'])
     elements.append(info_table)
     elements.append(Spacer(1, 1*cm))
     
@@ -85,40 +188,13 @@ def generate_invoice_pdf(invoice):
     data.append(['', '', '', '<b>TOTAL:</b>', f"<b>{invoice.total} {invoice.currency}</b>"])
     
     table = Table(data, colWidths=[8*cm, 2*cm, 3*cm, 3*cm, 3*cm])
-    table.setStyle(TableStyle([
-        # En-tête
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a5490')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        
-        # Corps
-        ('ALIGN', (1, 1), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 1), (-1, -4), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -4), 1, colors.grey),
-        
-        # Totaux
-        ('ALIGN', (3, -3), (3, -1), 'RIGHT'),
-        ('ALIGN', (4, -3), (4, -1), 'RIGHT'),
-        ('FONTNAME', (3, -3), (-1, -1), 'Helvetica-Bold'),
-        ('LINEABOVE', (3, -3), (-1, -3), 2, colors.black),
-        ('LINEABOVE', (3, -1), (-1, -1), 2, colors.black),
-    ]))
+    table.setStyle(get_table_styles()['invoice_lines'])
     
     elements.append(table)
     elements.append(Spacer(1, 2*cm))
     
     # Pied de page
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.grey,
-        alignment=TA_CENTER
-    )
+    footer_style = cached['footer']
     
     elements.append(Paragraph(
         "Merci de votre confiance | Mwolo Energy Systems",
@@ -135,26 +211,15 @@ def generate_invoice_pdf(invoice):
     return filepath
 
 
-def generate_receipt_pdf(payment):
-    """Générer le PDF d'un reçu de paiement"""
-    filename = f"receipt_{payment.reference}.pdf"
-    filepath = os.path.join(settings.MEDIA_ROOT, 'receipts', filename)
-    
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+def generate_receipt_pdf(payment, output=None):
+    """Générer le PDF d'un reçu de paiement (output: chemin ou fichier, optionnel)"""
+    filepath = _output_path('receipts', f"receipt_{payment.reference}.pdf", output)
     
     doc = SimpleDocTemplate(filepath, pagesize=A4)
     elements = []
-    styles = getSampleStyleSheet()
-    
-    # Style personnalisé
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1a5490'),
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
+    cached = get_styles()
+    styles = cached['base']
+    title_style = cached['title']
     
     # En-tête
     elements.append(Paragraph("MWOLO ENERGY SYSTEMS", title_style))
@@ -182,38 +247,18 @@ def generate_receipt_pdf(payment):
             payment_data.append(['<b>Transaction ID:</b>', payment.transaction_id])
     
     payment_table = Table(payment_data, colWidths=[5*cm, 11*cm])
-    payment_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-        ('PADDING', (0, 0), (-1, -1), 10),
-    ]))
+    payment_table.setStyle(get_table_styles()['receipt'])
     
     elements.append(payment_table)
     elements.append(Spacer(1, 2*cm))
     
     # Message de confirmation
     if payment.status == 'confirmed':
-        confirmation_style = ParagraphStyle(
-            'Confirmation',
-            parent=styles['Normal'],
-            fontSize=14,
-            textColor=colors.green,
-            alignment=TA_CENTER,
-            spaceAfter=20
-        )
+        confirmation_style = cached['confirmation']
         elements.append(Paragraph("✓ PAIEMENT CONFIRMÉ", confirmation_style))
     
     # Pied de page
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.grey,
-        alignment=TA_CENTER
-    )
+    footer_style = cached['footer']
     
     elements.append(Spacer(1, 1*cm))
     elements.append(Paragraph(
@@ -234,26 +279,19 @@ def generate_receipt_pdf(payment):
     return filepath
 
 
-def generate_payroll_pdf(payroll):
-    """Générer le PDF d'un bulletin de paie"""
-    filename = f"payroll_{payroll.employee.employee_number}_{payroll.month.strftime('%Y%m')}.pdf"
-    filepath = os.path.join(settings.MEDIA_ROOT, 'payrolls', filename)
-    
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+def generate_payroll_pdf(payroll, output=None):
+    """Générer le PDF d'un bulletin de paie (output: chemin ou fichier, optionnel)"""
+    filepath = _output_path(
+        'payrolls',
+        f"payroll_{payroll.employee.employee_number}_{payroll.month.strftime('%Y%m')}.pdf",
+        output,
+    )
     
     doc = SimpleDocTemplate(filepath, pagesize=A4)
     elements = []
-    styles = getSampleStyleSheet()
-    
-    # Style personnalisé
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1a5490'),
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
+    cached = get_styles()
+    styles = cached['base']
+    title_style = cached['title']
     
     # En-tête
     elements.append(Paragraph("MWOLO ENERGY SYSTEMS", title_style))
@@ -277,15 +315,7 @@ def generate_payroll_pdf(payroll):
     ]
     
     employee_table = Table(employee_data, colWidths=[5*cm, 11*cm])
-    employee_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a5490')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('PADDING', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-        ('BACKGROUND', (0, 1), (0, -1), colors.lightgrey),
-    ]))
+    employee_table.setStyle(get_table_styles()['payroll_employee'])
     
     elements.append(employee_table)
     elements.append(Spacer(1, 1*cm))
@@ -301,45 +331,20 @@ def generate_payroll_pdf(payroll):
     ]
     
     payroll_table = Table(payroll_data, colWidths=[10*cm, 6*cm])
-    payroll_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a5490')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('PADDING', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -2), 1, colors.grey),
-        ('BACKGROUND', (0, 1), (0, -2), colors.lightgrey),
-        ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
-        ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, -1), (-1, -1), 14),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgreen),
-    ]))
+    payroll_table.setStyle(get_table_styles()['payroll_details'])
     
     elements.append(payroll_table)
     elements.append(Spacer(1, 2*cm))
     
     # Note confidentielle
-    confidential_style = ParagraphStyle(
-        'Confidential',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.red,
-        alignment=TA_CENTER
-    )
+    confidential_style = cached['confidential']
     elements.append(Paragraph(
         "<b>DOCUMENT CONFIDENTIEL</b>",
         confidential_style
     ))
     
     # Pied de page
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.grey,
-        alignment=TA_CENTER
-    )
+    footer_style = cached['footer']
     
     elements.append(Spacer(1, 0.5*cm))
     elements.append(Paragraph(
@@ -0,0 +1,172 @@
+"""
+Balayage ensembliste des factures impayées (relances J+3 / J+7 / J+14)
+
+Une seule requête annotée classe les factures ouvertes dans leur palier de
+relance et exclut (anti-jointure) celles qui ont déjà reçu la relance du
+palier. Les relances sont insérées en masse, puis une seule tâche Celery est
+publiée par lot de factures.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BooleanField, Case, CharField, Exists, OuterRef, Q, Value, When
+from django.utils import timezone
+
+from operations.models import Meter
+from .models import Invoice, Reminder
+
+UNPAID_STATUSES = ['envoyee', 'partiellement_payee']
+
+# Paliers de relance dans l'ordre d'envoi: (type de relance, jours de retard)
+REMINDER_STAGES = [('j3', 3), ('j7', 7), ('j14', 14)]
+
+DEACTIVATION_DELAY_DAYS = 14
+
+SWEEP_CHUNK_SIZE = getattr(settings, 'BILLING_SWEEP_CHUNK_SIZE', 500)
+
+CURSOR_TIMEOUT = 24 * 3600
+
+
+def annotate_reminder_stage(queryset, today):
+    """
+    Annoter chaque facture avec:
+    - reminder_stage: prochaine relance à envoyer (j3, j7, j14) ou None
+    - due_for_deactivation: True si le service doit être coupé
+
+    Les relances sont envoyées dans l'ordre: une facture à J+14 sans relance
+    J+3 reçoit d'abord la J+3. La coupure n'intervient qu'après les relances
+    J+3 et J+7, et seulement si le site a encore des compteurs actifs.
+    """
+    reminders = Reminder.objects.filter(invoice=OuterRef('pk'))
+    annotations = {
+        f'has_{reminder_type}': Exists(reminders.filter(reminder_type=reminder_type))
+        for reminder_type, _ in REMINDER_STAGES
+    }
+    annotations['has_active_meter'] = Exists(
+        Meter.objects.filter(equipment__site=OuterRef('site'), service_active=True)
+    )
+
+    stage_cases = [
+        When(
+            Q(period_end__lte=today - timedelta(days=days)) & Q(**{f'has_{reminder_type}': False}),
+            then=Value(reminder_type),
+        )
+        for reminder_type, days in REMINDER_STAGES
+    ]
+
+    return queryset.annotate(**annotations).annotate(
+        reminder_stage=Case(*stage_cases, default=None, output_field=CharField()),
+        due_for_deactivation=Case(
+            When(
+                period_end__lte=today - timedelta(days=DEACTIVATION_DELAY_DAYS),
+                has_j3=True,
+                has_j7=True,
+                has_active_meter=True,
+                then=Value(True),
+            ),
+            default=Value(False),
+            output_field=BooleanField(),
+        ),
+    )
+
+
+def sweep_unpaid_invoices(today=None, chunk_size=None, resume=True):
+    """
+    Parcourir les factures impayées par lots (pagination par clé) et:
+    - insérer en masse les relances dues (ignore_conflicts sur invoice/type)
+    - publier une tâche d'envoi par lot et par type de relance
+    - publier une tâche de coupure par lot
+
+    Le curseur (dernière clé traitée) est conservé dans le cache pour la
+    journée: un balayage interrompu reprend là où il s'est arrêté. L'anti-
+    jointure sur les relances rend de toute façon un nouveau passage sans effet
+    sur les factures déjà relancées.
+
+    Retourne les compteurs par palier et les durées de chaque phase.
+    """
+    from .tasks import deactivate_services_for_invoices, send_invoice_reminders_batch
+
+    today = today or timezone.localdate()
+    chunk_size = chunk_size or SWEEP_CHUNK_SIZE
+    cursor_key = f'billing:unpaid-sweep:cursor:{today.isoformat()}'
+
+    stats = {
+        'date': today.isoformat(),
+        'resumed_from': None,
+        'reminders': {reminder_type: 0 for reminder_type, _ in REMINDER_STAGES},
+        'deactivations': 0,
+        'batches': 0,
+        'timings': {'select': 0.0, 'insert': 0.0, 'dispatch': 0.0, 'total': 0.0},
+    }
+    started = time.monotonic()
+
+    last_pk = cache.get(cursor_key) if resume else None
+    stats['resumed_from'] = str(last_pk) if last_pk else None
+
+    candidates = annotate_reminder_stage(
+        Invoice.objects.filter(status__in=UNPAID_STATUSES), today
+    ).filter(
+        Q(reminder_stage__isnull=False) | Q(due_for_deactivation=True)
+    ).order_by('pk')
+
+    while True:
+        chunk = candidates.filter(pk__gt=last_pk) if last_pk else candidates
+
+        t0 = time.monotonic()
+        rows = list(chunk.values_list('pk', 'reminder_stage', 'due_for_deactivation')[:chunk_size])
+        stats['timings']['select'] += time.monotonic() - t0
+
+        if not rows:
+            break
+
+        by_stage = {}
+        to_deactivate = []
+        for pk, stage, deactivate in rows:
+            if stage:
+                by_stage.setdefault(stage, []).append(pk)
+            if deactivate:
+                to_deactivate.append(str(pk))
+
+        with transaction.atomic():
+            t0 = time.monotonic()
+            Reminder.objects.bulk_create(
+                [
+                    Reminder(invoice_id=pk, reminder_type=stage)
+                    for stage, pks in by_stage.items()
+                    for pk in pks
+                ],
+                ignore_conflicts=True,
+            )
+            stats['timings']['insert'] += time.monotonic() - t0
+
+            # Publier uniquement après validation de l'insertion
+            t0 = time.monotonic()
+            for stage, pks in by_stage.items():
+                ids = [str(pk) for pk in pks]
+                transaction.on_commit(
+                    lambda ids=ids, stage=stage: send_invoice_reminders_batch.delay(ids, stage)
+                )
+                stats['reminders'][stage] += len(ids)
+                stats['batches'] += 1
+            if to_deactivate:
+                transaction.on_commit(
+                    lambda ids=to_deactivate: deactivate_services_for_invoices.delay(ids)
+                )
+                stats['deactivations'] += len(to_deactivate)
+                stats['batches'] += 1
+            stats['timings']['dispatch'] += time.monotonic() - t0
+
+        last_pk = rows[-1][0]
+        cache.set(cursor_key, last_pk, CURSOR_TIMEOUT)
+
+    # Balayage complet: le prochain passage repart du début
+    cache.delete(cursor_key)
+
+    stats['timings'] = {
+        phase: round(seconds, 3) for phase, seconds in stats['timings'].items()
+    }
+    stats['timings']['total'] = round(time.monotonic() - started, 3)
+    return stats
@@ -33,8 +33,8 @@ class PaymentSerializer(serializers.ModelSerializer):
 class InvoiceSerializer(serializers.ModelSerializer):
     lines = InvoiceLineSerializer(many=True, read_only=True)
     payments = PaymentSerializer(many=True, read_only=True)
-    amount_paid = serializers.SerializerMethodField()
-    balance = serializers.SerializerMethodField()
+    amount_paid = serializers.DecimalField(max_digits=12, decimal_places=2, coerce_to_string=False, read_only=True)
+    balance = serializers.DecimalField(max_digits=12, decimal_places=2, coerce_to_string=False, read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
 
     class Meta:
@@ -61,9 +61,3 @@ class InvoiceSerializer(serializers.ModelSerializer):
             'updated_at',
         ]
         read_only_fields = ['invoice_number', 'created_at', 'updated_at']
-
-    def get_amount_paid(self, obj):
-        return sum(payment.amount for payment in obj.payments.all())
-
-    def get_balance(self, obj):
-        return max(obj.total - self.get_amount_paid(obj), 0)
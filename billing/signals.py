@@ -1,8 +1,10 @@
 """
 Signaux Django pour automatiser les actions sur les factures et paiements
 """
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from .ledger import apply_payment_delta
 from .models import Invoice, Payment
 from .tasks import (
     generate_invoice_pdf_task,
@@ -27,6 +29,29 @@ def invoice_post_save(sender, instance, created, **kwargs):
         check_unpaid_invoices.apply_async(countdown=60)
 
 
+@receiver(post_save, sender=Payment)
+def payment_ledger_post_save(sender, instance, created, **kwargs):
+    """Appliquer au grand livre de la facture le delta du paiement"""
+    old_invoice_id, old_amount = getattr(instance, '_ledger_entry', (None, 0))
+    new_invoice_id, new_amount = instance.ledger_entry()
+    
+    with transaction.atomic():
+        if old_invoice_id == new_invoice_id:
+            apply_payment_delta(new_invoice_id, new_amount - old_amount)
+        else:
+            apply_payment_delta(old_invoice_id, -old_amount)
+            apply_payment_delta(new_invoice_id, new_amount)
+    
+    instance._ledger_entry = (new_invoice_id, new_amount)
+
+
+@receiver(post_delete, sender=Payment)
+def payment_ledger_post_delete(sender, instance, **kwargs):
+    """Retirer du grand livre un paiement supprimé"""
+    invoice_id, amount = getattr(instance, '_ledger_entry', instance.ledger_entry())
+    apply_payment_delta(invoice_id, -amount)
+
+
 @receiver(post_save, sender=Payment)
 def payment_post_save(sender, instance, created, **kwargs):
     """Actions après sauvegarde d'un paiement"""
@@ -41,15 +66,5 @@ def payment_post_save(sender, instance, created, **kwargs):
         # Vérifier si le service doit être réactivé
         activate_service_for_payment.delay(str(instance.id))
         
-        # Mettre à jour le statut de la facture
-        invoice = instance.invoice
-        total_paid = sum(
-            p.amount for p in invoice.payments.filter(status='confirmed')
-        )
-        
-        if total_paid >= invoice.total:
-            invoice.status = 'payee'
-        elif total_paid > 0:
-            invoice.status = 'partiellement_payee'
-        
-        invoice.save()
+        # Le statut de la facture est mis à jour avec le grand livre
+        # (payment_ledger_post_save)
@@ -1,9 +1,8 @@
-from celery import shared_task
-from django.core.mail import send_mail
+from celery import group, shared_task
 from django.utils import timezone
 from datetime import timedelta
 from .models import Invoice, Reminder, Payment
-from .pdf_generator import generate_invoice_pdf, generate_receipt_pdf, generate_payroll_pdf
+from .pdf_generator import generate_payroll_pdf
 from operations.models import Meter
 from hr.models import Payroll
 
@@ -11,11 +10,10 @@ from hr.models import Payroll
 @shared_task
 def generate_invoice_pdf_task(invoice_id):
     """Générer le PDF d'une facture de manière asynchrone"""
+    from .pdf_cache import render_pdf
+    
     try:
-        invoice = Invoice.objects.get(id=invoice_id)
-        filepath = generate_invoice_pdf(invoice)
-        invoice.pdf_file = filepath
-        invoice.save()
+        filepath = render_pdf('invoice', invoice_id)
         return f"PDF généré: {filepath}"
     except Invoice.DoesNotExist:
         return f"Facture {invoice_id} introuvable"
@@ -26,11 +24,10 @@ def generate_invoice_pdf_task(invoice_id):
 @shared_task
 def generate_receipt_pdf_task(payment_id):
     """Générer le PDF d'un reçu de paiement de manière asynchrone"""
+    from .pdf_cache import render_pdf
+    
     try:
-        payment = Payment.objects.get(id=payment_id)
-        filepath = generate_receipt_pdf(payment)
-        payment.receipt_pdf = filepath
-        payment.save()
+        filepath = render_pdf('receipt', payment_id)
         return f"Reçu PDF généré: {filepath}"
     except Payment.DoesNotExist:
         return f"Paiement {payment_id} introuvable"
@@ -38,6 +35,14 @@ def generate_receipt_pdf_task(payment_id):
         return f"Erreur lors de la génération du reçu: {str(e)}"
 
 
+@shared_task
+def render_cached_pdf(kind, object_id):
+    """Régénérer en arrière-plan un PDF absent ou périmé (facture ou reçu)"""
+    if kind == 'invoice':
+        return generate_invoice_pdf_task(object_id)
+    return generate_receipt_pdf_task(object_id)
+
+
 @shared_task
 def generate_payroll_pdf_task(payroll_id):
     """Générer le PDF d'un bulletin de paie de manière asynchrone"""
@@ -53,11 +58,43 @@ def generate_payroll_pdf_task(payroll_id):
         return f"Erreur lors de la génération du bulletin: {str(e)}"
 
 
+@shared_task
+def render_pdf_batch(kind, ids):
+    """Rendre un lot de PDF (invoice, receipt, payroll) dans un seul worker"""
+    from .pdf_batch import render_batch
+    
+    return render_batch(kind, ids)
+
+
+@shared_task
+def render_pdfs(kind, ids, batch_size=None):
+    """Découper une liste de documents en lots et les répartir sur les workers Celery"""
+    from .pdf_batch import split_batches
+    
+    batches = split_batches(ids, batch_size)
+    group(render_pdf_batch.s(kind, batch) for batch in batches).apply_async()
+    return f"{len(ids)} document(s) répartis en {len(batches)} lot(s)"
+
+
+@shared_task
+def generate_monthly_invoices(period=None):
+    """Générer les factures brouillon d'une période 'YYYY-MM' (par défaut: mois précédent)"""
+    from .invoicing import generate_invoices
+    
+    if not period:
+        previous_month = timezone.localdate().replace(day=1) - timedelta(days=1)
+        period = previous_month.strftime('%Y-%m')
+    
+    return generate_invoices(period)
+
+
 @shared_task
 def send_invoice_reminder(invoice_id, reminder_type):
     """Envoyer une relance pour une facture impayée"""
+    from .outbox import enqueue_email
+    
     try:
-        invoice = Invoice.objects.get(id=invoice_id)
+        invoice = Invoice.objects.select_related('client').get(id=invoice_id)
         
         # Vérifier si la relance n'a pas déjà été envoyée
         if Reminder.objects.filter(invoice=invoice, reminder_type=reminder_type).exists():
@@ -66,32 +103,9 @@ def send_invoice_reminder(invoice_id, reminder_type):
         # Créer la relance
         Reminder.objects.create(invoice=invoice, reminder_type=reminder_type)
         
-        # Envoyer l'email
-        subject = f"Relance facture {invoice.invoice_number}"
-        message = f"""
-Bonjour {invoice.client.first_name} {invoice.client.last_name},
-
-Nous vous rappelons que la facture {invoice.invoice_number} 
-d'un montant de {invoice.total} {invoice.currency} 
-n'a pas encore été payée.
-
-Période: {invoice.period_start} au {invoice.period_end}
-Montant dû: {invoice.total} {invoice.currency}
-
-Veuillez procéder au paiement dès que possible pour éviter 
-toute interruption de service.
-
-Cordialement,
-Mwolo Energy Systems
-        """
-        
-        send_mail(
-            subject,
-            message,
-            'noreply@mwolo.energy',
-            [invoice.client.email],
-            fail_silently=False,
-        )
+        # Mettre l'email en file (outbox)
+        enqueue_email('reminder', invoice.client.email, {'invoice': invoice, 'client': invoice.client}, invoice=invoice)
+        drain_outbox_task.delay()
         
         # TODO: Envoyer SMS si numéro disponible
         # send_sms(invoice.client.phone, message)
@@ -104,95 +118,87 @@ Mwolo Energy Systems
 
 
 @shared_task
-def check_unpaid_invoices():
-    """Vérifier les factures impayées et envoyer des relances"""
-    today = timezone.now().date()
+def send_invoice_reminders_batch(invoice_ids, reminder_type):
+    """Mettre en file les relances d'un lot de factures (relances déjà enregistrées par le balayage)"""
+    from .outbox import build_message, enqueue
+    
+    invoices = Invoice.objects.filter(id__in=invoice_ids).select_related('client')
+    queued = enqueue([
+        build_message('reminder', invoice.client.email, {'invoice': invoice, 'client': invoice.client}, invoice=invoice)
+        for invoice in invoices
+    ])
+    drain_outbox_task.delay()
+    
+    return f"Relances {reminder_type} mises en file: {queued}/{len(invoice_ids)}"
+
+
+@shared_task
+def drain_outbox_task(batch_size=None):
+    """Envoyer les notifications en attente de l'outbox (par lots, connexion réutilisée)"""
+    from .outbox import drain_outbox
+    
+    return drain_outbox(batch_size=batch_size)
+
+
+@shared_task
+def check_unpaid_invoices(resume=True):
+    """Vérifier les factures impayées et envoyer des relances (balayage par lots)"""
+    from .reminders import sweep_unpaid_invoices
+    
+    return sweep_unpaid_invoices(resume=resume)
+
+
+def _deactivate_invoices(invoices):
+    """Couper les compteurs des sites d'un lot de factures et notifier chaque client une seule fois"""
+    from operations.service_state import deactivate_meters
+    from .outbox import build_message, enqueue
+    
+    invoices = [invoice for invoice in invoices if invoice.site_id]
+    if not invoices:
+        return None
     
-    # Factures impayées
-    unpaid_invoices = Invoice.objects.filter(
-        status__in=['envoyee', 'partiellement_payee']
+    result = deactivate_meters(
+        Meter.objects.filter(equipment__site_id__in={invoice.site_id for invoice in invoices}),
+        reason="Facture impayée: " + ", ".join(invoice.invoice_number for invoice in invoices)[:200],
     )
     
-    relances_sent = 0
-    services_deactivated = 0
+    # Une seule notification par client, listant ses factures concernées
+    messages = []
+    for client_meters in result['by_client'].values():
+        client_invoices = [invoice for invoice in invoices if invoice.site_id in client_meters['sites']]
+        if not client_invoices:
+            continue
+        client = client_invoices[0].client
+        messages.append(build_message(
+            'deactivation', client.email, {'client': client, 'invoices': client_invoices},
+        ))
+    if enqueue(messages):
+        drain_outbox_task.delay()
     
-    for invoice in unpaid_invoices:
-        days_overdue = (today - invoice.period_end).days
-        
-        # Relance J+3
-        if days_overdue >= 3 and not Reminder.objects.filter(
-            invoice=invoice, reminder_type='j3'
-        ).exists():
-            send_invoice_reminder.delay(str(invoice.id), 'j3')
-            relances_sent += 1
-        
-        # Relance J+7
-        elif days_overdue >= 7 and not Reminder.objects.filter(
-            invoice=invoice, reminder_type='j7'
-        ).exists():
-            send_invoice_reminder.delay(str(invoice.id), 'j7')
-            relances_sent += 1
-        
-        # Relance J+14 + désactivation service
-        elif days_overdue >= 14:
-            if not Reminder.objects.filter(
-                invoice=invoice, reminder_type='j14'
-            ).exists():
-                send_invoice_reminder.delay(str(invoice.id), 'j14')
-                relances_sent += 1
-            
-            # Désactiver le service
-            result = deactivate_service_for_invoice.delay(str(invoice.id))
-            if result:
-                services_deactivated += 1
+    return result
+
+
+@shared_task
+def deactivate_services_for_invoices(invoice_ids):
+    """Désactiver le service pour un lot de factures impayées"""
+    invoices = Invoice.objects.filter(id__in=invoice_ids).select_related('client')
+    result = _deactivate_invoices(invoices)
     
-    return f"Vérification terminée: {unpaid_invoices.count()} factures impayées, {relances_sent} relances envoyées, {services_deactivated} services désactivés"
+    if result is None:
+        return "Aucun site associé aux factures"
+    return f"Service désactivé pour {result['changed']} compteur(s), {len(result['by_client'])} client(s)"
 
 
 @shared_task
 def deactivate_service_for_invoice(invoice_id):
     """Désactiver le service client pour facture impayée"""
     try:
-        invoice = Invoice.objects.get(id=invoice_id)
+        invoice = Invoice.objects.select_related('client').get(id=invoice_id)
+        result = _deactivate_invoices([invoice])
         
-        # Trouver le compteur du site
-        if invoice.site:
-            meters = Meter.objects.filter(
-                equipment__site=invoice.site,
-                service_active=True
-            )
-            
-            deactivated_count = 0
-            for meter in meters:
-                meter.deactivate_service()
-                deactivated_count += 1
-                
-                # TODO: Envoyer commande au compteur IoT
-                # send_iot_command(meter.meter_number, 'DEACTIVATE')
-                
-                # Envoyer notification au client
-                send_mail(
-                    "Service désactivé - Facture impayée",
-                    f"""
-Bonjour {invoice.client.first_name} {invoice.client.last_name},
-
-Votre service a été désactivé en raison du non-paiement de la facture {invoice.invoice_number}.
-
-Montant dû: {invoice.total} {invoice.currency}
-
-Veuillez procéder au paiement pour réactiver votre service.
-
-Cordialement,
-Mwolo Energy Systems
-                    """,
-                    'noreply@mwolo.energy',
-                    [invoice.client.email],
-                    fail_silently=True,
-                )
-            
-            return f"Service désactivé pour {deactivated_count} compteur(s)"
-        
-        return "Aucun site associé à la facture"
+        if result is None:
+            return "Aucun site associé à la facture"
+        return f"Service désactivé pour {result['changed']} compteur(s)"
     except Invoice.DoesNotExist:
         return f"Facture {invoice_id} introuvable"
     except Exception as e:
@@ -202,59 +208,35 @@ Mwolo Energy Systems
 @shared_task
 def activate_service_for_payment(payment_id):
     """Réactiver le service client après paiement"""
+    from operations.service_state import activate_meters
+    from .outbox import enqueue_email
+    
     try:
-        payment = Payment.objects.get(id=payment_id)
+        payment = Payment.objects.select_related('invoice__client').get(id=payment_id)
         
         if payment.status != 'confirmed':
             return "Paiement non confirmé"
         
         invoice = payment.invoice
         
-        # Vérifier si la facture est maintenant payée
-        total_paid = sum(p.amount for p in invoice.payments.filter(status='confirmed'))
-        
-        if total_paid >= invoice.total:
-            invoice.status = 'payee'
-            invoice.save()
-            
+        # Vérifier si la facture est maintenant payée (grand livre)
+        if invoice.balance <= 0:
             # Réactiver le service
-            if invoice.site:
-                meters = Meter.objects.filter(
-                    equipment__site=invoice.site,
-                    service_active=False
+            if invoice.site_id:
+                result = activate_meters(
+                    Meter.objects.filter(equipment__site_id=invoice.site_id),
+                    reason=f"Paiement {payment.reference} (facture {invoice.invoice_number})",
                 )
                 
-                activated_count = 0
-                for meter in meters:
-                    meter.service_active = True
-                    meter.status = 'actif'
-                    meter.save()
-                    activated_count += 1
-                    
-                    # TODO: Envoyer commande au compteur IoT
-                    # send_iot_command(meter.meter_number, 'ACTIVATE')
-                
-                # Envoyer notification au client
-                send_mail(
-                    "Service réactivé",
-                    f"""
-Bonjour {invoice.client.first_name} {invoice.client.last_name},
-
-Votre service a été réactivé suite au paiement de la facture {invoice.invoice_number}.
-
-Montant payé: {payment.amount} {invoice.currency}
-
-Merci de votre confiance.
-
-Cordialement,
-Mwolo Energy Systems
-                    """,
-                    'noreply@mwolo.energy',
-                    [invoice.client.email],
-                    fail_silently=True,
+                # Envoyer notification au client (outbox)
+                enqueue_email(
+                    'reactivation', invoice.client.email,
+                    {'client': invoice.client, 'invoice': invoice, 'payment': payment},
+                    invoice=invoice,
                 )
+                drain_outbox_task.delay()
                 
-                return f"Service réactivé pour {activated_count} compteur(s)"
+                return f"Service réactivé pour {result['changed']} compteur(s)"
         
         return "Facture partiellement payée, service non réactivé"
     except Payment.DoesNotExist:
@@ -266,41 +248,22 @@ Mwolo Energy Systems
 @shared_task
 def send_payment_confirmation(payment_id):
     """Envoyer une confirmation de paiement par email"""
+    from .outbox import enqueue_email
+    
     try:
-        payment = Payment.objects.get(id=payment_id)
+        payment = Payment.objects.select_related('invoice__client').get(id=payment_id)
         
         if payment.status != 'confirmed':
             return "Paiement non confirmé"
         
         invoice = payment.invoice
         
-        subject = f"Confirmation de paiement - {payment.reference}"
-        message = f"""
-Bonjour {invoice.client.first_name} {invoice.client.last_name},
-
-Nous avons bien reçu votre paiement.
-
-Référence: {payment.reference}
-Facture: {invoice.invoice_number}
-Montant: {payment.amount} {invoice.currency}
-Méthode: {payment.get_method_display()}
-Date: {payment.payment_date}
-
-Votre reçu est disponible en pièce jointe.
-
-Merci de votre confiance.
-
-Cordialement,
-Mwolo Energy Systems
-        """
-        
-        send_mail(
-            subject,
-            message,
-            'noreply@mwolo.energy',
-            [invoice.client.email],
-            fail_silently=False,
+        enqueue_email(
+            'payment_confirmation', invoice.client.email,
+            {'client': invoice.client, 'invoice': invoice, 'payment': payment},
+            invoice=invoice,
         )
+        drain_outbox_task.delay()
         
         return f"Confirmation de paiement envoyée pour {payment.reference}"
     except Payment.DoesNotExist:
@@ -4,15 +4,64 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from django.http import FileResponse
-from .models import Invoice, Payment
+from django.db.models import Prefetch
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+from .models import Invoice, InvoiceLine, Payment
 from .serializers import InvoiceSerializer, PaymentSerializer
-from .pdf_generator import generate_invoice_pdf, generate_receipt_pdf
+from .pdf_cache import cached_pdf, schedule_render
 from .tasks import generate_invoice_pdf_task, generate_receipt_pdf_task
-import os
+
+
+def serve_cached_pdf(request, kind, obj, filename):
+    """
+    Servir un PDF depuis le cache adressé par contenu.
+    
+    - PDF à jour: fichier avec ETag (304 si If-None-Match correspond)
+    - PDF absent ou périmé: 202, le rendu est lancé en arrière-plan
+    """
+    digest, path = cached_pdf(kind, obj)
+    etag = quote_etag(digest)
+    
+    if path is None:
+        schedule_render(kind, obj, digest)
+        response = Response(
+            {'message': 'Génération du PDF en cours, réessayez dans quelques instants'},
+            status=status.HTTP_202_ACCEPTED,
+        )
+        response['Retry-After'] = '5'
+        return response
+    
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+    
+    try:
+        response = FileResponse(
+            open(path, 'rb'),
+            content_type='application/pdf',
+            as_attachment=True,
+            filename=filename,
+        )
+    except Exception as e:
+        return Response(
+            {'error': f'Erreur lors de la lecture du PDF: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
 
 class InvoiceViewSet(viewsets.ModelViewSet):
-    queryset = Invoice.objects.all()
+    # Lignes et paiements imbriqués chargés en une requête chacun (montant
+    # payé et solde lus sur le grand livre de la facture)
+    queryset = Invoice.objects.prefetch_related(
+        Prefetch('lines', queryset=InvoiceLine.objects.all()),
+        Prefetch('payments', queryset=Payment.objects.all()),
+    )
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -22,34 +71,9 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def pdf(self, request, pk=None):
-        """Générer et télécharger le PDF de la facture"""
+        """Télécharger le PDF de la facture (régénéré en arrière-plan s'il est périmé)"""
         invoice = self.get_object()
-        
-        # Générer le PDF si pas déjà fait
-        if not invoice.pdf_file or not os.path.exists(invoice.pdf_file.path):
-            try:
-                filepath = generate_invoice_pdf(invoice)
-                invoice.pdf_file = filepath
-                invoice.save()
-            except Exception as e:
-                return Response(
-                    {'error': f'Erreur lors de la génération du PDF: {str(e)}'},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-        
-        # Retourner le fichier
-        try:
-            return FileResponse(
-                open(invoice.pdf_file.path, 'rb'),
-                content_type='application/pdf',
-                as_attachment=True,
-                filename=f"facture_{invoice.invoice_number}.pdf"
-            )
-        except Exception as e:
-            return Response(
-                {'error': f'Erreur lors de la lecture du PDF: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        return serve_cached_pdf(request, 'invoice', invoice, f"facture_{invoice.invoice_number}.pdf")
     
     @action(detail=True, methods=['post'])
     def generate_pdf_async(self, request, pk=None):
@@ -114,34 +138,9 @@ class PaymentViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def receipt(self, request, pk=None):
-        """Télécharger le reçu de paiement"""
+        """Télécharger le reçu de paiement (régénéré en arrière-plan s'il est périmé)"""
         payment = self.get_object()
-        
-        # Générer le reçu si pas déjà fait
-        if not payment.receipt_pdf or not os.path.exists(payment.receipt_pdf.path):
-            try:
-                filepath = generate_receipt_pdf(payment)
-                payment.receipt_pdf = filepath
-                payment.save()
-            except Exception as e:
-                return Response(
-                    {'error': f'Erreur lors de la génération du reçu: {str(e)}'},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-        
-        # Retourner le fichier
-        try:
-            return FileResponse(
-                open(payment.receipt_pdf.path, 'rb'),
-                content_type='application/pdf',
-                as_attachment=True,
-                filename=f"recu_{payment.reference}.pdf"
-            )
-        except Exception as e:
-            return Response(
-                {'error': f'Erreur lors de la lecture du reçu: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        return serve_cached_pdf(request, 'receipt', payment, f"recu_{payment.reference}.pdf")
     
     @action(detail=True, methods=['post'])
     def confirm(self, request, pk=None):
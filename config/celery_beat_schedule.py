@@ -21,4 +21,58 @@ CELERY_BEAT_SCHEDULE = {
             'expires': 3600,
         }
     },
+    
+    # Générer les factures du mois précédent le 1er de chaque mois à 2h
+    'generate-monthly-invoices': {
+        'task': 'billing.tasks.generate_monthly_invoices',
+        'schedule': crontab(day_of_month=1, hour=2, minute=0),
+        'options': {
+            'expires': 6 * 3600,
+        }
+    },
+    
+    # Vider l'outbox des notifications de facturation chaque minute
+    'drain-billing-outbox': {
+        'task': 'billing.tasks.drain_outbox_task',
+        'schedule': crontab(),
+        'options': {
+            'expires': 60,
+        }
+    },
+    
+    # Calculer les présences de la veille et la synthèse du mois à 0h45
+    'compute-attendance-nightly': {
+        'task': 'hr.tasks.compute_attendance',
+        'schedule': crontab(hour=0, minute=45),
+        'options': {
+            'expires': 6 * 3600,
+        }
+    },
+    
+    # Consolider les statistiques des files d'attente de la veille à 1h30
+    'rollup-queue-stats-nightly': {
+        'task': 'appointments.tasks.rollup_queue_stats',
+        'schedule': crontab(hour=1, minute=30),
+        'options': {
+            'expires': 6 * 3600,
+        }
+    },
+    
+    # Archiver l'historique des tickets et des scans de badge à 2h30
+    'archive-history-nightly': {
+        'task': 'core.tasks.archive_history',
+        'schedule': crontab(hour=2, minute=30),
+        'options': {
+            'expires': 6 * 3600,
+        }
+    },
+    
+    # Émettre les tickets des rendez-vous confirmés qui approchent (toutes les 10 min, 6h-18h)
+    'preissue-appointment-tickets': {
+        'task': 'appointments.tasks.preissue_appointment_tickets',
+        'schedule': crontab(minute='*/10', hour='6-18'),
+        'options': {
+            'expires': 600,
+        }
+    },
 }
@@ -105,7 +105,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
@@ -152,6 +152,17 @@ CORS_ALLOW_HEADERS = [
     'x-employee-badge',
 ]
 
+# Cache partagé entre processus (état en direct des files, verrous de rendu PDF...)
+# Sans REDIS_CACHE_URL: cache mémoire local, valable pour un seul processus
+REDIS_CACHE_URL = config('REDIS_CACHE_URL', default='')
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+        }
+    }
+
 # Celery
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localhost:6379/0')
@@ -161,6 +172,53 @@ CELERY_TASK_SERIALIZER = 'json'
 # Celery Beat Schedule
 from .celery_beat_schedule import CELERY_BEAT_SCHEDULE
 
+# Commandes de coupure / rétablissement des compteurs (voir operations/service_state.py)
+METER_COMMAND_SINK = config('METER_COMMAND_SINK', default='operations.service_state.NullCommandSink')
+
+# Taille des plages de numéros de ticket réservées par borne (voir appointments/ticketing.py)
+QUEUE_TICKET_BLOCK_SIZE = config('QUEUE_TICKET_BLOCK_SIZE', default=20, cast=int)
+
+# Durée de vie de l'état en direct des files en cache (voir appointments/live_state.py)
+QUEUE_LIVE_STATE_TTL = config('QUEUE_LIVE_STATE_TTL', default=300, cast=int)
+
+# Un ticket gagne un rang de priorité par tranche d'attente (0: désactivé).
+# Activé, l'ordre d'appel peut s'écarter des positions affichées par l'état
+# en direct (voir appointments/live_state.py)
+QUEUE_PRIORITY_AGING_MINUTES = config('QUEUE_PRIORITY_AGING_MINUTES', default=0, cast=int)
+
+# Durée de vie de la disponibilité des rendez-vous en cache (voir appointments/availability.py)
+APPOINTMENT_AVAILABILITY_TTL = config('APPOINTMENT_AVAILABILITY_TTL', default=3600, cast=int)
+
+# Les tickets des rendez-vous confirmés sont émis ce délai avant l'heure (voir appointments/conversion.py)
+APPOINTMENT_PREISSUE_MINUTES = config('APPOINTMENT_PREISSUE_MINUTES', default=30, cast=int)
+
+# Rétention dans les tables vives avant archivage (voir core/archiving.py)
+QUEUE_TICKET_RETENTION_DAYS = config('QUEUE_TICKET_RETENTION_DAYS', default=7, cast=int)
+BADGE_SCAN_RETENTION_DAYS = config('BADGE_SCAN_RETENTION_DAYS', default=90, cast=int)
+
+# Durée de vie de l'utilisateur authentifié en cache (voir accounts/authentication.py)
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=300, cast=int)
+
+# Scans de badge: durée de vie du cache, tampon d'écriture différée (voir hr/scanning.py)
+BADGE_SCAN_CACHE_TTL = config('BADGE_SCAN_CACHE_TTL', default=3600, cast=int)
+BADGE_SCAN_BUFFER_SIZE = config('BADGE_SCAN_BUFFER_SIZE', default=100, cast=int)
+BADGE_SCAN_FLUSH_SECONDS = config('BADGE_SCAN_FLUSH_SECONDS', default=2, cast=int)
+
+# Lots des bornes hors ligne: secret dont dérivent les clés des bornes et
+# ancienneté maximale d'un scan renvoyé (voir hr/scan_batches.py)
+BADGE_KIOSK_SECRET = config('BADGE_KIOSK_SECRET', default=SECRET_KEY)
+BADGE_SCAN_OFFLINE_HOURS = config('BADGE_SCAN_OFFLINE_HOURS', default=72, cast=int)
+
+# Présences: heure locale de retard et jours ouvrés, 0 = lundi (voir hr/attendance.py)
+ATTENDANCE_LATE_AFTER = config('ATTENDANCE_LATE_AFTER', default='09:00')
+ATTENDANCE_WORKING_DAYS = config('ATTENDANCE_WORKING_DAYS', default='0,1,2,3,4', cast=Csv(int))
+
+# Flux temps réel des files (voir appointments/feed.py)
+# appointments.feed.RedisFeedLayer dès que plusieurs processus servent l'API
+QUEUE_FEED_LAYER = config('QUEUE_FEED_LAYER', default='appointments.feed.InMemoryFeedLayer')
+QUEUE_FEED_REDIS_URL = config('QUEUE_FEED_REDIS_URL', default=CELERY_BROKER_URL)
+QUEUE_FEED_MAX_SECONDS = config('QUEUE_FEED_MAX_SECONDS', default=300, cast=int)
+
 # Email
 EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
 EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
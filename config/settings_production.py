@@ -158,7 +158,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
@@ -247,6 +247,27 @@ DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'noreply@mwolo.energy'
 # Celery (optionnel - utiliser Redis de Railway si disponible)
 CELERY_BROKER_URL = os.environ.get('REDIS_URL', os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0'))
 CELERY_RESULT_BACKEND = os.environ.get('REDIS_URL', os.environ.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0'))
+
+# Cache partagé entre les workers (état en direct des files, verrous...)
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+
+# Flux temps réel des files: diffusion par Redis entre les workers
+QUEUE_FEED_LAYER = os.environ.get(
+    'QUEUE_FEED_LAYER',
+    'appointments.feed.RedisFeedLayer' if os.environ.get('REDIS_URL') else 'appointments.feed.InMemoryFeedLayer'
+)
+QUEUE_FEED_REDIS_URL = os.environ.get('REDIS_URL', CELERY_BROKER_URL)
+
+# Lots des bornes de pointage hors ligne (voir hr/scan_batches.py)
+BADGE_KIOSK_SECRET = os.environ.get('BADGE_KIOSK_SECRET', SECRET_KEY)
+BADGE_SCAN_OFFLINE_HOURS = int(os.environ.get('BADGE_SCAN_OFFLINE_HOURS', 72))
+
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 
@@ -23,6 +23,9 @@ CSRF_COOKIE_SECURE = False
 CELERY_TASK_ALWAYS_EAGER = True
 CELERY_TASK_EAGER_PROPAGATES = True
 
+# Scans de badge écrits immédiatement (pas de tampon ni de minuterie)
+BADGE_SCAN_BUFFER_SIZE = 1
+
 # Désactiver les migrations pour les tests
 class DisableMigrations:
     def __contains__(self, item):
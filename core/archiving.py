@@ -0,0 +1,128 @@
+"""
+Archivage de l'historique des tables à forte croissance
+
+Les tickets de file (QueueTicket) et les scans de badge (BadgeScanLog) plus
+anciens que leur durée de rétention sont déplacés vers des tables
+d'archive compactes (QueueTicketArchive, BadgeScanArchive). Les tables
+vives ne gardent ainsi que les jours récents, servis par leurs index
+composites.
+
+Le déplacement se fait par lots: chaque lot est lu par ordre d'ancienneté,
+copié dans l'archive puis supprimé, dans une même transaction. Une
+interruption ne perd rien et la commande reprend simplement sur les lignes
+restantes; une ligne déjà copiée est ignorée à la copie suivante.
+
+Les statistiques quotidiennes des files sont consolidées avant que les
+tickets d'un jour ne quittent la table vive.
+"""
+import time
+from datetime import datetime, timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def _rollup_missing_days(before):
+    """Consolider les journées à archiver qui n'ont pas encore de statistiques"""
+    from appointments.models import DailyQueueStats, QueueTicket
+    from appointments.rollup import rollup_day
+
+    days = set(QueueTicket.objects.filter(date__lt=before).values_list('date', flat=True).order_by().distinct())
+    days -= set(DailyQueueStats.objects.filter(date__in=days).values_list('date', flat=True))
+    for day in sorted(days):
+        rollup_day(day)
+
+
+# Tables archivées: modèle vif, archive, champ de date, rétention (réglage, défaut),
+# champs lus dans la table vive -> champs de l'archive, traitement préalable
+ARCHIVES = {
+    'queue': {
+        'model': 'appointments.QueueTicket',
+        'archive_model': 'appointments.QueueTicketArchive',
+        'date_field': 'date',
+        'retention': ('QUEUE_TICKET_RETENTION_DAYS', 7),
+        'fields': {
+            'id': 'id', 'agency_id': 'agency_id', 'service_id': 'service_id',
+            'ticket_number': 'ticket_number', 'counter__number': 'counter_number',
+            'status': 'status', 'priority': 'priority', 'date': 'date',
+            'created_at': 'created_at', 'called_at': 'called_at',
+            'served_at': 'served_at', 'completed_at': 'completed_at',
+        },
+        'prepare': _rollup_missing_days,
+    },
+    'badges': {
+        'model': 'hr.BadgeScanLog',
+        'archive_model': 'hr.BadgeScanArchive',
+        'date_field': 'scanned_at',
+        'retention': ('BADGE_SCAN_RETENTION_DAYS', 90),
+        'fields': {
+            'id': 'id', 'badge_id': 'badge_id', 'agency_id': 'agency_id',
+            'scan_type': 'scan_type', 'result': 'result',
+            'scanned_at': 'scanned_at', 'ip_address': 'ip_address',
+        },
+    },
+}
+
+
+def cutoff(spec, retention_days=None):
+    """Première date conservée dans la table vive (minuit local pour un horodatage)"""
+    if retention_days is None:
+        retention_days = getattr(settings, *spec['retention'])
+    first_kept = timezone.localdate() - timedelta(days=retention_days)
+    if spec['date_field'].endswith('_at'):
+        return timezone.make_aware(datetime.combine(first_kept, datetime.min.time()))
+    return first_kept
+
+
+def archive_chunk(spec, before, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Déplacer un lot de lignes antérieures à before; retourne le nombre déplacé"""
+    model = apps.get_model(spec['model'])
+    archive_model = apps.get_model(spec['archive_model'])
+    fields = spec['fields']
+
+    with transaction.atomic():
+        rows = list(
+            model.objects.filter(**{f"{spec['date_field']}__lt": before})
+            .order_by(spec['date_field'], 'pk')
+            .values(*fields)[:chunk_size]
+        )
+        if not rows:
+            return 0
+        archive_model.objects.bulk_create(
+            [archive_model(**{target: row[source] for source, target in fields.items()}) for row in rows],
+            ignore_conflicts=True,
+        )
+        model.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def archive(name, retention_days=None, chunk_size=DEFAULT_CHUNK_SIZE, max_chunks=None, progress=None):
+    """
+    Archiver une table par lots jusqu'à épuisement (ou max_chunks lots).
+
+    Retourne les métriques du passage (lots, lignes, secondes, lignes/s).
+    """
+    spec = ARCHIVES[name]
+    before = cutoff(spec, retention_days)
+    if spec.get('prepare'):
+        spec['prepare'](before)
+
+    stats = {'chunks': 0, 'rows': 0, 'seconds': 0.0, 'per_second': 0.0}
+    started = time.monotonic()
+    while max_chunks is None or stats['chunks'] < max_chunks:
+        moved = archive_chunk(spec, before, chunk_size)
+        if not moved:
+            break
+        stats['chunks'] += 1
+        stats['rows'] += moved
+        if progress:
+            progress(stats)
+
+    stats['seconds'] = round(time.monotonic() - started, 3)
+    if stats['seconds']:
+        stats['per_second'] = round(stats['rows'] / stats['seconds'], 1)
+    return stats
@@ -0,0 +1,36 @@
+"""
+Commande pour archiver l'historique des tickets de file et des scans de badge.
+Usage: python manage.py archive_history [--only queue|badges] [--days N] [--chunk-size N]
+
+Reprenable: une exécution interrompue est simplement relancée.
+"""
+from django.core.management.base import BaseCommand
+
+from core.archiving import ARCHIVES, DEFAULT_CHUNK_SIZE, archive
+
+
+class Command(BaseCommand):
+    help = "Déplace les tickets et scans de badge anciens vers les tables d'archive, par lots"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', choices=sorted(ARCHIVES), help='Archiver une seule table')
+        parser.add_argument('--days', type=int, help='Jours conservés (par défaut: réglages de rétention)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Lignes par lot')
+        parser.add_argument('--max-chunks', type=int, help='Nombre maximal de lots (exécution partielle)')
+
+    def handle(self, *args, **options):
+        names = [options['only']] if options['only'] else list(ARCHIVES)
+
+        for name in names:
+            self.stdout.write(f'📦 Archivage: {name}')
+            stats = archive(
+                name,
+                retention_days=options['days'],
+                chunk_size=options['chunk_size'],
+                max_chunks=options['max_chunks'],
+                progress=lambda s: self.stdout.write(f"   {s['rows']} ligne(s) archivée(s)..."),
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {name}: {stats['rows']} ligne(s) en {stats['chunks']} lot(s), "
+                f"{stats['seconds']}s ({stats['per_second']} lignes/s)"
+            ))
@@ -0,0 +1,10 @@
+from celery import shared_task
+
+
+@shared_task
+def archive_history():
+    """Archiver chaque nuit l'historique des tickets de file et des scans de badge"""
+    from .archiving import ARCHIVES, archive
+    
+    results = {name: archive(name)['rows'] for name in ARCHIVES}
+    return ', '.join(f"{name}: {rows} ligne(s) archivée(s)" for name, rows in results.items())
@@ -8,7 +8,7 @@ from .models import Client, Site, Contract
 from .serializers import ClientSerializer, SiteSerializer, ContractSerializer
 
 class ClientViewSet(viewsets.ModelViewSet):
-    queryset = Client.objects.all()
+    queryset = Client.objects.select_related('agency')
     serializer_class = ClientSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Employee, LeaveType, Leave, Attendance, Payroll, EmployeeBadge, BadgeScanLog
+from .models import Employee, LeaveType, Leave, Attendance, AttendanceSummary, Payroll, EmployeeBadge, BadgeScanLog, BadgeScanArchive
 
 
 @admin.register(EmployeeBadge)
@@ -94,9 +94,29 @@ class AttendanceAdmin(admin.ModelAdmin):
     list_filter = ('status', 'date')
     search_fields = ('employee__first_name', 'employee__last_name')
 
+@admin.register(AttendanceSummary)
+class AttendanceSummaryAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'month', 'days_present', 'days_late', 'days_absent', 'days_leave', 'hours_worked')
+    list_filter = ('month',)
+    search_fields = ('employee__first_name', 'employee__last_name')
+    readonly_fields = ('updated_at',)
+
 @admin.register(Payroll)
 class PayrollAdmin(admin.ModelAdmin):
     list_display = ('employee', 'month', 'base_salary', 'bonuses', 'deductions', 'net_salary')
     list_filter = ('month',)
     search_fields = ('employee__first_name', 'employee__last_name')
     readonly_fields = ('created_at',)
+
+
+@admin.register(BadgeScanArchive)
+class BadgeScanArchiveAdmin(admin.ModelAdmin):
+    list_display = ('badge', 'scan_type', 'agency', 'scanned_at', 'result')
+    list_filter = ('scan_type', 'result', 'agency')
+    date_hierarchy = 'scanned_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,207 @@
+"""
+Calcul des présences et synthèses mensuelles
+
+Chaque nuit, les présences de la veille sont déduites de BadgeScanLog pour
+tous les employés en une passe:
+
+- une requête agrégée donne le premier et le dernier scan de présence
+  réussi de chaque employé: l'arrivée et le départ, fusionnés avec le
+  pointage déjà enregistré en direct (voir hr/scanning.py);
+- les jours ouvrés (ATTENDANCE_WORKING_DAYS), les employés actifs sans
+  pointage ce jour-là (anti-jointure) sont marqués en congé s'ils ont un
+  congé approuvé couvrant le jour, absents sinon. Un jour non ouvré ne
+  compte ni absence ni jour de congé;
+- la synthèse du mois de chaque employé (AttendanceSummary: jours
+  présents, retards, absences, congés, minutes de retard, heures
+  travaillées) est recalculée à partir des pointages du mois.
+
+Les tableaux de bord RH et la paie lisent une ligne par employé et par
+mois au lieu de parcourir les pointages ou les scans. Relancer le calcul
+d'un jour le complète sans doublon.
+
+Une arrivée est en retard à partir de ATTENDANCE_LATE_AFTER (heure locale,
+09:00 par défaut).
+"""
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, F, Max, Min, OuterRef
+from django.utils import timezone
+
+from .models import Attendance, AttendanceSummary, BadgeScanLog, Employee, Leave
+
+SUMMARY_FIELDS = ['days_present', 'days_late', 'days_absent', 'days_leave', 'late_minutes', 'hours_worked']
+
+
+def late_after():
+    """Heure locale à partir de laquelle une arrivée est en retard"""
+    value = getattr(settings, 'ATTENDANCE_LATE_AFTER', '09:00')
+    return value if isinstance(value, time) else time.fromisoformat(value)
+
+
+def working_days():
+    return set(getattr(settings, 'ATTENDANCE_WORKING_DAYS', [0, 1, 2, 3, 4]))
+
+
+def arrival_status(check_in):
+    """Statut d'une arrivée à cette heure locale"""
+    return 'retard' if check_in >= late_after() else 'present'
+
+
+def merge_times(attendance, times):
+    """
+    Fusionner des heures de présence dans un pointage (existant ou nouveau,
+    non enregistré): arrivée la plus tôt, départ le plus tard. Retourne
+    True si le pointage a changé.
+    """
+    recorded = [at for at in (attendance.check_in, attendance.check_out) if at]
+    times = sorted(recorded + list(times))
+    check_in, check_out = times[0], (times[-1] if len(times) > 1 else None)
+    if (check_in, check_out) == (attendance.check_in, attendance.check_out):
+        return False
+    if check_in != attendance.check_in and attendance.status != 'conge':
+        attendance.status = arrival_status(check_in)
+    attendance.check_in, attendance.check_out = check_in, check_out
+    return True
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def presence_rows(day):
+    """Premier et dernier scan de présence réussi de chaque employé (une requête)"""
+    start, end = _day_bounds(day)
+    return (
+        BadgeScanLog.objects.filter(scan_type='presence', result='success', scanned_at__gte=start, scanned_at__lt=end)
+        .values(employee_id=F('badge__employee_id'))
+        .annotate(first=Min('scanned_at'), last=Max('scanned_at'), scans=Count('id'))
+        .order_by()
+    )
+
+
+def _approved_leave(day, employee):
+    """Congé approuvé couvrant le jour, pour l'employé de la requête externe"""
+    return Leave.objects.filter(
+        employee=OuterRef(employee), status='approuve', start_date__lte=day, end_date__gte=day,
+    )
+
+
+def compute_day(day):
+    """Pointages d'une journée pour tous les employés; retourne les totaux écrits"""
+    rows = {row['employee_id']: row for row in presence_rows(day)}
+    totals = {'scanned': 0, 'leave': 0, 'absent': 0}
+
+    with transaction.atomic():
+        existing = {
+            attendance.employee_id: attendance
+            for attendance in Attendance.objects.select_for_update().filter(date=day, employee_id__in=rows)
+        }
+        created, changed = [], []
+        for employee_id, row in rows.items():
+            times = [timezone.localtime(row['first']).time()]
+            if row['scans'] > 1:
+                times.append(timezone.localtime(row['last']).time())
+            attendance = existing.get(employee_id)
+            if attendance is None:
+                attendance = Attendance(employee_id=employee_id, date=day)
+                merge_times(attendance, times)
+                created.append(attendance)
+            elif merge_times(attendance, times):
+                changed.append(attendance)
+        Attendance.objects.bulk_create(created)
+        Attendance.objects.bulk_update(changed, ['check_in', 'check_out', 'status'])
+        totals['scanned'] = len(created) + len(changed)
+
+        # Absences déjà marquées couvertes depuis par un congé approuvé
+        Attendance.objects.filter(date=day, status='absent', check_in__isnull=True).filter(
+            Exists(_approved_leave(day, 'employee'))
+        ).update(status='conge')
+
+        if day.weekday() not in working_days():
+            return totals
+
+        # Employés actifs sans pointage ce jour-là
+        missing = (
+            Employee.objects.filter(status='actif', hire_date__lte=day)
+            .filter(~Exists(Attendance.objects.filter(employee=OuterRef('pk'), date=day)))
+            .annotate(on_leave=Exists(_approved_leave(day, 'pk')))
+            .values_list('pk', 'on_leave')
+        )
+        marked = [
+            Attendance(employee_id=employee_id, date=day, status='conge' if on_leave else 'absent')
+            for employee_id, on_leave in missing
+        ]
+        Attendance.objects.bulk_create(marked)
+        totals['leave'] = sum(1 for attendance in marked if attendance.status == 'conge')
+        totals['absent'] = len(marked) - totals['leave']
+
+    return totals
+
+
+def _minutes_between(start, end):
+    return (datetime.combine(date.min, end) - datetime.combine(date.min, start)).total_seconds() / 60
+
+
+def build_summaries(month):
+    """Synthèses (non enregistrées) du mois commençant à month (une requête)"""
+    end = (month + timedelta(days=32)).replace(day=1)
+    threshold = late_after()
+    summaries = defaultdict(lambda: {field: 0 for field in SUMMARY_FIELDS})
+
+    rows = Attendance.objects.filter(date__gte=month, date__lt=end).values_list(
+        'employee_id', 'status', 'check_in', 'check_out',
+    )
+    for employee_id, status, check_in, check_out in rows.iterator():
+        summary = summaries[employee_id]
+        if status in ('present', 'retard'):
+            summary['days_present'] += 1
+        if status == 'retard':
+            summary['days_late'] += 1
+            if check_in and check_in > threshold:
+                summary['late_minutes'] += int(_minutes_between(threshold, check_in))
+        elif status == 'absent':
+            summary['days_absent'] += 1
+        elif status == 'conge':
+            summary['days_leave'] += 1
+        if check_in and check_out and check_out > check_in:
+            summary['hours_worked'] += _minutes_between(check_in, check_out)
+
+    return [
+        AttendanceSummary(
+            employee_id=employee_id,
+            month=month,
+            **{**summary, 'hours_worked': (Decimal(summary['hours_worked']) / 60).quantize(Decimal('0.01'))},
+        )
+        for employee_id, summary in summaries.items()
+    ]
+
+
+def summarize_month(month):
+    """Recalculer les synthèses d'un mois; retourne le nombre d'employés écrits"""
+    summaries = build_summaries(month.replace(day=1))
+    AttendanceSummary.objects.bulk_create(
+        summaries,
+        update_conflicts=True,
+        unique_fields=['employee', 'month'],
+        update_fields=[*SUMMARY_FIELDS, 'updated_at'],
+    )
+    return len(summaries)
+
+
+def compute_range(start, end):
+    """Calculer les journées de start à end inclus puis leurs mois; retourne {jour: totaux}"""
+    results = {}
+    months = set()
+    day = start
+    while day <= end:
+        results[day] = compute_day(day)
+        months.add(day.replace(day=1))
+        day += timedelta(days=1)
+    for month in sorted(months):
+        summarize_month(month)
+    return results
@@ -0,0 +1,101 @@
+"""
+Capacités d'accès des employés
+
+Les accès (dashboards, gestion des files, moniteur) dépendent uniquement
+du poste et du département. Ils sont calculés à l'enregistrement de
+l'employé et stockés en un entier (un bit par capacité) dans
+Employee.capabilities: les propriétés has_*_access / can_* ne font plus
+qu'un test de bit, et la vue décodée (noms, dashboards) est mise en
+cache par valeur de masque.
+
+Comme peu de combinaisons (poste, département) existent, les masques
+possibles sont connus d'avance: « les employés de l'agence X qui gèrent
+les files » devient un filtre capabilities IN (...) servi par l'index
+(agence, capacités).
+
+Les règles changent-elles? Recalculer les masques enregistrés avec une
+migration de données (voir hr/migrations/0007_employee_capabilities.py).
+Un QuerySet.update() du poste ou du département doit aussi les recalculer.
+"""
+from functools import lru_cache
+
+CAPABILITIES = (
+    'direction',
+    'manager',
+    'rh',
+    'comptabilite',
+    'commercial',
+    'operations',
+    'support',
+    'it',
+    'manage_queue',
+    'view_monitor',
+)
+BITS = {name: 1 << index for index, name in enumerate(CAPABILITIES)}
+
+DIRECTION_POSITIONS = {'directeur_general', 'directeur_adjoint', 'directeur_agence'}
+MANAGER_POSITIONS = {'manager', 'chef_departement', 'superviseur'}
+QUEUE_POSITIONS = {'agent_guichet', 'agent_support', 'conseiller_client', 'caissier', 'responsable_support'}
+
+# Dashboards de département: département ou postes qui y donnent accès
+DEPARTMENT_POSITIONS = {
+    'rh': {'responsable_rh', 'assistant_rh'},
+    'comptabilite': {'responsable_comptable', 'comptable', 'caissier'},
+    'commercial': {'responsable_commercial', 'agent_commercial', 'conseiller_client'},
+    'operations': {'responsable_operations', 'technicien', 'installateur'},
+    'support': {'responsable_support', 'agent_guichet', 'agent_support'},
+    'it': {'responsable_it', 'developpeur', 'administrateur_systeme'},
+}
+DASHBOARDS = ('employee', 'admin', 'rh', 'comptabilite', 'commercial', 'operations', 'support', 'it')
+
+
+def compute(position, department):
+    """Masque des capacités d'un poste dans un département"""
+    direction = position in DIRECTION_POSITIONS
+    manager = direction or position in MANAGER_POSITIONS
+    granted = {'direction'} if direction else set()
+    if manager:
+        granted.add('manager')
+    for dashboard, positions in DEPARTMENT_POSITIONS.items():
+        if direction or department == dashboard or position in positions:
+            granted.add(dashboard)
+    if manager or position in QUEUE_POSITIONS:
+        granted.add('manage_queue')
+    if manager or 'support' in granted:
+        granted.add('view_monitor')
+    return sum(BITS[name] for name in granted)
+
+
+@lru_cache(maxsize=None)
+def decode(mask):
+    """Noms des capacités d'un masque, dans l'ordre de CAPABILITIES"""
+    return tuple(name for name, bit in BITS.items() if mask & bit)
+
+
+@lru_cache(maxsize=None)
+def dashboards(mask):
+    """Dashboards accessibles avec ce masque (employee pour tous, admin pour la direction)"""
+    names = decode(mask)
+    return tuple(
+        dashboard for dashboard in DASHBOARDS
+        if dashboard == 'employee' or dashboard in names or (dashboard == 'admin' and 'direction' in names)
+    )
+
+
+@lru_cache(maxsize=None)
+def masks_with(name):
+    """Masques possibles (postes x départements) comportant cette capacité"""
+    from .models import Employee
+
+    bit = BITS[name]
+    masks = {
+        compute(position, department)
+        for position, _ in Employee.POSITION_TYPES
+        for department, _ in Employee.DEPARTMENT_TYPES
+    }
+    return tuple(sorted(mask for mask in masks if mask & bit))
+
+
+def with_capability(queryset, name):
+    """Employés du queryset ayant cette capacité (filtre indexé sur capabilities)"""
+    return queryset.filter(capabilities__in=masks_with(name))
@@ -0,0 +1,95 @@
+"""
+Commande pour mesurer la latence des scans de badge (BadgeScanView).
+
+Des scans signés (présence, borne, moniteur) sont envoyés à la vue pour
+les badges actifs existants. On rapporte les latences p50/p99 vues par
+les bornes, puis le coût de l'écriture différée (faite hors requête en
+production), et on vérifie que chaque scan a son journal et que les
+compteurs des badges ont avancé d'autant. --sync écrit chaque scan dans
+sa requête, pour comparaison.
+
+Tout est fait dans une transaction annulée à la fin: la base n'est pas
+modifiée. Usage:
+    python manage.py benchmark_badge_scans --scans 5000 [--sync]
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+from rest_framework.test import APIRequestFactory
+
+SCAN_TYPES = ('presence', 'kiosk', 'kiosk', 'monitor')
+
+
+class Command(BaseCommand):
+    help = "Mesure la latence p50/p99 des scans de badge"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scans', type=int, default=2000, help='Nombre de scans')
+        parser.add_argument('--badges', type=int, default=50, help='Badges actifs utilisés')
+        parser.add_argument('--sync', action='store_true', help='Écrire chaque scan dans sa requête')
+
+    def handle(self, *args, **options):
+        from hr import scanning
+        from hr.models import BadgeScanLog, EmployeeBadge
+        from hr.views import BadgeScanView
+
+        badges = list(EmployeeBadge.objects.filter(status='actif').select_related('employee')[:options['badges']])
+        if not badges:
+            raise CommandError('Aucun badge actif')
+
+        view = BadgeScanView.as_view()
+        factory = APIRequestFactory()
+        requests = [
+            factory.post('/api/hr/badge-scan/', {
+                'badge_code': badge.badge_code,
+                'signature': badge.signature(),
+                'agency_id': str(badge.employee.agency_id),
+                'scan_type': SCAN_TYPES[index % len(SCAN_TYPES)],
+                'device_info': 'benchmark',
+            }, format='json')
+            for index in range(options['scans'])
+            for badge in [badges[index % len(badges)]]
+        ]
+
+        # Tampon sans thread d'écriture: tout reste dans la transaction annulée
+        size = 1 if options['sync'] else len(requests) + 1
+        previous, scanning._buffer = scanning._buffer, scanning.ScanBuffer(size, 0)
+        try:
+            with transaction.atomic():
+                logs_before = BadgeScanLog.objects.count()
+                badge_ids = [badge.pk for badge in badges]
+                counted_before = EmployeeBadge.objects.filter(pk__in=badge_ids).aggregate(total=Sum('scan_count'))['total']
+
+                latencies = []
+                refused = 0
+                started = time.perf_counter()
+                for request in requests:
+                    begin = time.perf_counter()
+                    response = view(request)
+                    latencies.append((time.perf_counter() - begin) * 1000)
+                    refused += response.status_code != 200
+                flush_started = time.perf_counter()
+                scanning._buffer.flush()
+                flush_ms = (time.perf_counter() - flush_started) * 1000
+                seconds = time.perf_counter() - started
+
+                logs = BadgeScanLog.objects.count() - logs_before
+                counted = EmployeeBadge.objects.filter(pk__in=badge_ids).aggregate(total=Sum('scan_count'))['total'] - counted_before
+                transaction.set_rollback(True)
+        finally:
+            scanning._buffer = previous
+
+        percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        self.stdout.write(
+            f"🪪 {len(latencies)} scan(s) en {seconds:.2f}s ({len(latencies) / seconds:.0f}/s), "
+            f"{refused} refusé(s), écriture {'dans la requête' if options['sync'] else 'différée'}"
+        )
+        self.stdout.write(f"   p50: {percentiles[49]:.3f} ms   p99: {percentiles[98]:.3f} ms   max: {max(latencies):.3f} ms")
+        if not options['sync']:
+            self.stdout.write(f"   écriture différée: {flush_ms:.1f} ms ({flush_ms * 1000 / len(latencies):.0f} µs/scan)")
+        if logs != len(latencies) or counted != len(latencies) - refused:
+            raise CommandError(f'{logs} journal(aux) et {counted} scan(s) comptés pour {len(latencies)} scan(s)')
+        self.stdout.write(self.style.SUCCESS('✅ Journaux et compteurs complets (aucune donnée conservée)'))
@@ -0,0 +1,42 @@
+"""
+Commande pour calculer (ou recalculer) les présences et les synthèses mensuelles.
+"""
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = "Calcule les pointages à partir des scans de badge, jour par jour (la veille par défaut), puis les synthèses mensuelles"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='Premier jour (AAAA-MM-JJ), la veille par défaut')
+        parser.add_argument('--to', dest='end', help='Dernier jour inclus (AAAA-MM-JJ), --from par défaut')
+
+    def handle(self, *args, **options):
+        from hr.attendance import compute_range
+
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else timezone.localdate() - timedelta(days=1)
+            end = date.fromisoformat(options['end']) if options['end'] else start
+        except ValueError as e:
+            raise CommandError(f'Date invalide: {e}')
+        if end < start:
+            raise CommandError('--to doit être postérieur ou égal à --from')
+
+        started = time.monotonic()
+        results = compute_range(start, end)
+        for day, totals in results.items():
+            if any(totals.values()):
+                self.stdout.write(
+                    f"📅 {day.isoformat()}: {totals['scanned']} pointé(s), "
+                    f"{totals['leave']} en congé, {totals['absent']} absent(s)"
+                )
+
+        written = sum(sum(totals.values()) for totals in results.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {len(results)} jour(s) calculé(s), {written} pointage(s) écrit(s) '
+            f'en {time.monotonic() - started:.2f}s'
+        ))
@@ -0,0 +1,21 @@
+"""
+Commande pour afficher la clé de signature d'une borne de pointage.
+
+La clé est dérivée de BADGE_KIOSK_SECRET et de l'identifiant de la borne
+(voir hr/scan_batches.py): elle est installée sur l'appareil, qui signe
+avec elle les scans envoyés par lot. Usage:
+    python manage.py kiosk_key borne-01
+"""
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Affiche la clé de signature d'une borne de pointage"
+
+    def add_arguments(self, parser):
+        parser.add_argument('device_id', help='Identifiant de la borne')
+
+    def handle(self, *args, **options):
+        from hr.scan_batches import device_key
+
+        self.stdout.write(device_key(options['device_id']))
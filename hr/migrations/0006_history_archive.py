@@ -0,0 +1,56 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0004_agency_latitude_agency_longitude'),
+        ('hr', '0005_employeebadge_badgescanlog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BadgeScanArchive',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('scan_type', models.CharField(choices=[('presence', 'Pointage présence'), ('monitor', 'Activation moniteur'), ('kiosk', 'Accès borne'), ('dashboard', 'Accès dashboard'), ('door', 'Accès porte'), ('other', 'Autre')], max_length=20, verbose_name='Type de scan')),
+                ('result', models.CharField(choices=[('success', 'Succès'), ('denied', 'Refusé'), ('expired', 'Expiré'), ('invalid', 'Invalide')], max_length=20, verbose_name='Résultat')),
+                ('scanned_at', models.DateTimeField(verbose_name='Scanné le')),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True, verbose_name='Adresse IP')),
+            ],
+            options={
+                'verbose_name': 'Scan badge archivé',
+                'verbose_name_plural': 'Scans badges archivés',
+                'ordering': ['-scanned_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='badgescanlog',
+            index=models.Index(fields=['badge', 'scanned_at'], name='badge_scan_badge_time'),
+        ),
+        migrations.AddIndex(
+            model_name='badgescanlog',
+            index=models.Index(fields=['agency', 'scanned_at'], name='badge_scan_agency_time'),
+        ),
+        migrations.AddIndex(
+            model_name='badgescanlog',
+            index=models.Index(fields=['scanned_at'], name='badge_scan_time'),
+        ),
+        migrations.AddField(
+            model_name='badgescanarchive',
+            name='agency',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='agencies.agency', verbose_name='Agence'),
+        ),
+        migrations.AddField(
+            model_name='badgescanarchive',
+            name='badge',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='hr.employeebadge', verbose_name='Badge'),
+        ),
+        migrations.AddIndex(
+            model_name='badgescanarchive',
+            index=models.Index(fields=['badge', 'scanned_at'], name='badge_archive_badge_time'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:57
+
+from django.db import migrations, models
+
+from hr import capabilities
+
+
+def backfill_capabilities(apps, schema_editor):
+    """Calculer le masque des employés existants (un UPDATE par poste et département)"""
+    Employee = apps.get_model('hr', 'Employee')
+
+    pairs = Employee.objects.values_list('position', 'department').distinct()
+    for position, department in pairs:
+        Employee.objects.filter(position=position, department=department).update(
+            capabilities=capabilities.compute(position, department)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0006_history_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='capabilities',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name="Capacités d'accès"),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['agency', 'capabilities'], name='employee_agency_capabilities'),
+        ),
+        migrations.RunPython(backfill_capabilities, migrations.RunPython.noop),
+    ]
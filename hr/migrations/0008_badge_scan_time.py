@@ -0,0 +1,19 @@
+# Generated by Django 4.2.11 on 2026-10-18 09:01
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0007_employee_capabilities'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='badgescanlog',
+            name='scanned_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Scanné le'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.11 on 2026-10-18 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0008_badge_scan_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='badgescanlog',
+            name='device_id',
+            field=models.CharField(blank=True, max_length=100, null=True, verbose_name='Borne'),
+        ),
+        migrations.AddConstraint(
+            model_name='badgescanlog',
+            constraint=models.UniqueConstraint(fields=('badge', 'device_id', 'scanned_at'), name='badge_scan_device_unique'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.11 on 2026-10-18 09:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0009_badge_scan_device'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceSummary',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('month', models.DateField(help_text='Premier jour du mois', verbose_name='Mois')),
+                ('days_present', models.PositiveIntegerField(default=0, verbose_name='Jours présents')),
+                ('days_late', models.PositiveIntegerField(default=0, verbose_name='Jours en retard')),
+                ('days_absent', models.PositiveIntegerField(default=0, verbose_name="Jours d'absence")),
+                ('days_leave', models.PositiveIntegerField(default=0, verbose_name='Jours de congé')),
+                ('late_minutes', models.PositiveIntegerField(default=0, verbose_name='Minutes de retard')),
+                ('hours_worked', models.DecimalField(decimal_places=2, default=0, max_digits=7, verbose_name='Heures travaillées')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Modifié le')),
+            ],
+            options={
+                'verbose_name': 'Synthèse mensuelle des présences',
+                'verbose_name_plural': 'Synthèses mensuelles des présences',
+                'ordering': ['-month'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date'], name='attendance_date'),
+        ),
+        migrations.AddField(
+            model_name='attendancesummary',
+            name='employee',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to='hr.employee', verbose_name='Employé'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancesummary',
+            index=models.Index(fields=['month'], name='attendance_summary_month'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='attendancesummary',
+            unique_together={('employee', 'month')},
+        ),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
+from django.utils import timezone
 from accounts.models import User
 from agencies.models import Agency
 from geo.models import Nationality
+from hr import capabilities as access
 import uuid
 import hashlib
 import secrets
@@ -68,14 +70,17 @@ class EmployeeBadge(models.Model):
             'badge': self.badge_code,
             'emp': str(self.employee.employee_number),
             'agency': str(self.employee.agency_id),
-            'sig': hashlib.sha256(f"{self.badge_code}{self.qr_secret}".encode()).hexdigest()[:16]
+            'sig': self.signature()
         }
         return json.dumps(data)
     
+    def signature(self):
+        """Signature attendue dans le QR du badge"""
+        return hashlib.sha256(f"{self.badge_code}{self.qr_secret}".encode()).hexdigest()[:16]
+    
     def verify_scan(self, signature):
         """Vérifie si le scan est valide"""
-        expected_sig = hashlib.sha256(f"{self.badge_code}{self.qr_secret}".encode()).hexdigest()[:16]
-        return signature == expected_sig
+        return signature == self.signature()
     
     def record_scan(self, agency=None):
         """Enregistre un scan du badge"""
@@ -129,9 +134,12 @@ class BadgeScanLog(models.Model):
     scan_type = models.CharField(max_length=20, choices=SCAN_TYPES, verbose_name="Type de scan")
     result = models.CharField(max_length=20, choices=SCAN_RESULTS, verbose_name="Résultat")
     
-    scanned_at = models.DateTimeField(auto_now_add=True, verbose_name="Scanné le")
+    # Heure du scan, fixée à la réception (le journal peut être écrit plus tard, voir hr/scanning.py)
+    scanned_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name="Scanné le")
     ip_address = models.GenericIPAddressField(null=True, blank=True, verbose_name="Adresse IP")
     device_info = models.CharField(max_length=200, blank=True, verbose_name="Info appareil")
+    # Borne ayant envoyé le scan hors ligne (voir hr/scan_batches.py)
+    device_id = models.CharField(max_length=100, null=True, blank=True, verbose_name="Borne")
     
     notes = models.TextField(blank=True, verbose_name="Notes")
     
@@ -139,11 +147,47 @@ class BadgeScanLog(models.Model):
         verbose_name = 'Log de scan badge'
         verbose_name_plural = 'Logs de scans badges'
         ordering = ['-scanned_at']
+        constraints = [
+            # Un scan renvoyé par une borne n'est enregistré qu'une fois (NULL: scans en ligne)
+            models.UniqueConstraint(fields=['badge', 'device_id', 'scanned_at'], name='badge_scan_device_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['badge', 'scanned_at'], name='badge_scan_badge_time'),
+            models.Index(fields=['agency', 'scanned_at'], name='badge_scan_agency_time'),
+            # Archivage par ancienneté
+            models.Index(fields=['scanned_at'], name='badge_scan_time'),
+        ]
     
     def __str__(self):
         return f"{self.badge.badge_code} @ {self.agency.code} - {self.scan_type} ({self.result})"
 
 
+class BadgeScanArchive(models.Model):
+    """Scan de badge archivé (voir core/archiving.py), sans contraintes de clé étrangère"""
+    id = models.UUIDField(primary_key=True, editable=False)
+    badge = models.ForeignKey(
+        EmployeeBadge, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+', verbose_name="Badge"
+    )
+    agency = models.ForeignKey(
+        Agency, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+', verbose_name="Agence"
+    )
+    scan_type = models.CharField(max_length=20, choices=BadgeScanLog.SCAN_TYPES, verbose_name="Type de scan")
+    result = models.CharField(max_length=20, choices=BadgeScanLog.SCAN_RESULTS, verbose_name="Résultat")
+    scanned_at = models.DateTimeField(verbose_name="Scanné le")
+    ip_address = models.GenericIPAddressField(null=True, blank=True, verbose_name="Adresse IP")
+    
+    class Meta:
+        verbose_name = 'Scan badge archivé'
+        verbose_name_plural = 'Scans badges archivés'
+        ordering = ['-scanned_at']
+        indexes = [
+            models.Index(fields=['badge', 'scanned_at'], name='badge_archive_badge_time'),
+        ]
+    
+    def __str__(self):
+        return f"{self.badge_id} - {self.scan_type} ({self.result}) {self.scanned_at:%Y-%m-%d}"
+
+
 class Employee(models.Model):
     """
     Modèle Employé - La différenciation des accès se fait par le POSTE et DÉPARTEMENT
@@ -239,6 +283,7 @@ class Employee(models.Model):
     position = models.CharField(max_length=50, choices=POSITION_TYPES, default='autre', verbose_name="Poste")
     position_custom = models.CharField(max_length=100, blank=True, verbose_name="Poste personnalisé")
     department = models.CharField(max_length=50, choices=DEPARTMENT_TYPES, default='autre', verbose_name="Département")
+    capabilities = models.PositiveIntegerField(default=0, editable=False, verbose_name="Capacités d'accès")
     contract_type = models.CharField(max_length=20, choices=CONTRACT_TYPES, verbose_name="Type de contrat")
     hire_date = models.DateField(verbose_name="Date d'embauche")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='actif', verbose_name="Statut")
@@ -264,6 +309,9 @@ class Employee(models.Model):
         verbose_name = 'Employé'
         verbose_name_plural = 'Employés'
         ordering = ['last_name', 'first_name']
+        indexes = [
+            models.Index(fields=['agency', 'capabilities'], name='employee_agency_capabilities'),
+        ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.employee_number})"
@@ -274,78 +322,76 @@ class Employee(models.Model):
             return self.position_custom
         return self.get_position_display()
     
+    def save(self, *args, **kwargs):
+        # Capacités recalculées à chaque enregistrement (voir hr/capabilities.py)
+        self.capabilities = access.compute(self.position, self.department)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'position', 'department'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'capabilities'}
+        super().save(*args, **kwargs)
+    
+    def has_capability(self, name):
+        return bool(self.capabilities & access.BITS[name])
+    
+    @property
+    def capability_names(self):
+        """Capacités de l'employé (vue décodée du masque, en cache)"""
+        return access.decode(self.capabilities)
+    
     # Méthodes pour déterminer les accès aux dashboards selon le poste
     @property
     def is_direction(self):
         """Est un membre de la direction"""
-        return self.position in ['directeur_general', 'directeur_adjoint', 'directeur_agence']
+        return self.has_capability('direction')
     
     @property
     def is_manager(self):
         """Est un manager ou responsable"""
-        return self.position in ['manager', 'chef_departement', 'superviseur'] or self.is_direction
+        return self.has_capability('manager')
     
     @property
     def has_rh_access(self):
         """A accès au dashboard RH"""
-        return self.department == 'rh' or self.position in ['responsable_rh', 'assistant_rh'] or self.is_direction
+        return self.has_capability('rh')
     
     @property
     def has_comptabilite_access(self):
         """A accès au dashboard comptabilité"""
-        return self.department == 'comptabilite' or self.position in ['responsable_comptable', 'comptable', 'caissier'] or self.is_direction
+        return self.has_capability('comptabilite')
     
     @property
     def has_commercial_access(self):
         """A accès au dashboard commercial"""
-        return self.department == 'commercial' or self.position in ['responsable_commercial', 'agent_commercial', 'conseiller_client'] or self.is_direction
+        return self.has_capability('commercial')
     
     @property
     def has_operations_access(self):
         """A accès au dashboard opérations"""
-        return self.department == 'operations' or self.position in ['responsable_operations', 'technicien', 'installateur'] or self.is_direction
+        return self.has_capability('operations')
     
     @property
     def has_support_access(self):
         """A accès au dashboard support/guichet"""
-        return self.department == 'support' or self.position in ['responsable_support', 'agent_guichet', 'agent_support'] or self.is_direction
+        return self.has_capability('support')
     
     @property
     def has_it_access(self):
         """A accès au dashboard IT"""
-        return self.department == 'it' or self.position in ['responsable_it', 'developpeur', 'administrateur_systeme'] or self.is_direction
+        return self.has_capability('it')
     
     @property
     def can_manage_queue(self):
         """Peut gérer les files d'attente (guichet)"""
-        return self.position in ['agent_guichet', 'agent_support', 'conseiller_client', 'caissier', 'responsable_support'] or self.is_manager
+        return self.has_capability('manage_queue')
     
     @property
     def can_view_monitor(self):
         """Peut voir le moniteur de file d'attente"""
-        return self.has_support_access or self.is_manager
+        return self.has_capability('view_monitor')
     
     def get_accessible_dashboards(self):
         """Retourne la liste des dashboards accessibles"""
-        dashboards = ['employee']  # Tous les employés ont accès au dashboard employé
-        
-        if self.is_direction:
-            dashboards.extend(['admin', 'rh', 'comptabilite', 'commercial', 'operations', 'support', 'it'])
-        else:
-            if self.has_rh_access:
-                dashboards.append('rh')
-            if self.has_comptabilite_access:
-                dashboards.append('comptabilite')
-            if self.has_commercial_access:
-                dashboards.append('commercial')
-            if self.has_operations_access:
-                dashboards.append('operations')
-            if self.has_support_access:
-                dashboards.append('support')
-            if self.has_it_access:
-                dashboards.append('it')
-        
-        return list(set(dashboards))
+        return list(access.dashboards(self.capabilities))
 
 
 class LeaveType(models.Model):
@@ -407,11 +453,41 @@ class Attendance(models.Model):
         verbose_name_plural = 'Présences'
         unique_together = ('employee', 'date')
         ordering = ['-date']
+        indexes = [
+            # Calcul quotidien et synthèses mensuelles (voir hr/attendance.py)
+            models.Index(fields=['date'], name='attendance_date'),
+        ]
     
     def __str__(self):
         return f"{self.employee} - {self.date} ({self.status})"
 
 
+class AttendanceSummary(models.Model):
+    """Synthèse mensuelle des présences d'un employé (voir hr/attendance.py)"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='attendance_summaries', verbose_name="Employé")
+    month = models.DateField(verbose_name="Mois", help_text="Premier jour du mois")
+    days_present = models.PositiveIntegerField(default=0, verbose_name="Jours présents")
+    days_late = models.PositiveIntegerField(default=0, verbose_name="Jours en retard")
+    days_absent = models.PositiveIntegerField(default=0, verbose_name="Jours d'absence")
+    days_leave = models.PositiveIntegerField(default=0, verbose_name="Jours de congé")
+    late_minutes = models.PositiveIntegerField(default=0, verbose_name="Minutes de retard")
+    hours_worked = models.DecimalField(max_digits=7, decimal_places=2, default=0, verbose_name="Heures travaillées")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Modifié le")
+    
+    class Meta:
+        verbose_name = 'Synthèse mensuelle des présences'
+        verbose_name_plural = 'Synthèses mensuelles des présences'
+        unique_together = ['employee', 'month']
+        ordering = ['-month']
+        indexes = [
+            models.Index(fields=['month'], name='attendance_summary_month'),
+        ]
+    
+    def __str__(self):
+        return f"{self.employee} - {self.month:%m/%Y}"
+
+
 class Payroll(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='payrolls', verbose_name="Employé")
@@ -0,0 +1,177 @@
+"""
+Envoi groupé des scans d'une borne (mode hors ligne)
+
+Une borne d'agence éloignée qui perd la connexion garde ses scans signés,
+horodatés par l'appareil, et les renvoie en une requête à la reconnexion
+(/api/hr/badge-scan/batch/). Le lot est traité comme autant de scans
+unitaires (voir hr/scanning.py), dans l'ordre chronologique:
+
+- chaque scan est signé par la borne (device_signature): HMAC-SHA256, avec
+  la clé de la borne (device_key, dérivée de BADGE_KIOSK_SECRET et installée
+  sur l'appareil), de "borne|badge|agence|type|horodatage UTC" (horodatage
+  au format 2026-03-02T07:15:00Z, voir scan_message). Le QR du badge seul,
+  visible de tous, ne suffit pas à enregistrer un scan;
+- un scan plus ancien que la fenêtre hors ligne (BADGE_SCAN_OFFLINE_HOURS)
+  ou dans le futur est refusé;
+- badges et agences lus en un aller-retour au cache (une requête pour les
+  badges absents), signatures vérifiées en mémoire;
+- un scan déjà reçu de cette borne (badge, borne, horodatage) est ignoré,
+  qu'il soit dans le lot ou déjà enregistré: la borne peut renvoyer un lot
+  dont elle n'a pas reçu la réponse;
+- journaux, compteurs des badges et pointages écrits dans une seule
+  transaction, en insertions et mises à jour groupées.
+
+Pointage: pour chaque (employé, jour), l'arrivée est le scan de présence
+le plus tôt et le départ le plus tard, en fusionnant avec le pointage déjà
+enregistré (des scans en ligne ont pu arriver entre-temps). Les synthèses
+mensuelles des mois touchés sont ensuite recalculées.
+"""
+import hashlib
+import hmac
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import scanning
+from .attendance import merge_times, summarize_month
+from .models import Attendance, BadgeScanLog
+
+MAX_BATCH_SIZE = 500
+
+# Horloge de la borne en avance tolérée
+FUTURE_TOLERANCE = timedelta(minutes=5)
+
+
+def offline_window():
+    """Ancienneté maximale d'un scan renvoyé par une borne"""
+    return timedelta(hours=getattr(settings, 'BADGE_SCAN_OFFLINE_HOURS', 72))
+
+
+def device_key(device_id):
+    """Clé de signature d'une borne, à installer sur l'appareil"""
+    secret = getattr(settings, 'BADGE_KIOSK_SECRET', None) or settings.SECRET_KEY
+    return hmac.new(secret.encode(), f'kiosk:{device_id}'.encode(), hashlib.sha256).hexdigest()
+
+
+def scan_message(device_id, data):
+    """Contenu signé par la borne pour un scan"""
+    at = data['scanned_at'].astimezone(dt_timezone.utc)
+    return '|'.join([
+        device_id, data['badge_code'], str(data['agency_id']), data['scan_type'], at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+    ])
+
+
+def sign_scan(key, device_id, data):
+    return hmac.new(key.encode(), scan_message(device_id, data).encode(), hashlib.sha256).hexdigest()
+
+
+def _merge_presence(presence):
+    """Appliquer les heures de présence {(employé, jour): [heures]} aux pointages"""
+    if not presence:
+        return 0
+    existing = {
+        (attendance.employee_id, attendance.date): attendance
+        for attendance in Attendance.objects.select_for_update().filter(
+            employee_id__in={employee_id for employee_id, _ in presence},
+            date__in={day for _, day in presence},
+        )
+    }
+
+    created, changed = [], []
+    for (employee_id, day), times in presence.items():
+        attendance = existing.get((employee_id, day))
+        if attendance is None:
+            attendance = Attendance(employee_id=employee_id, date=day)
+            merge_times(attendance, times)
+            created.append(attendance)
+        elif merge_times(attendance, times):
+            changed.append(attendance)
+
+    Attendance.objects.bulk_create(created)
+    Attendance.objects.bulk_update(changed, ['check_in', 'check_out', 'status'])
+    return len(created) + len(changed)
+
+
+def upload(device_id, scans, ip_address=None):
+    """
+    Enregistrer un lot de scans validé par BadgeScanBatchSerializer.
+    Retourne le résumé et le résultat de chaque scan, dans l'ordre du lot.
+    """
+    now = timezone.now()
+    oldest = now - offline_window()
+    key = device_key(device_id)
+    badges, agencies = scanning.lookup_many({data['badge_code'] for data in scans})
+
+    # Scans de cette borne déjà enregistrés (une requête)
+    stored = set(
+        BadgeScanLog.objects.filter(
+            device_id=device_id,
+            badge_id__in={badge['id'] for badge in badges.values() if badge},
+            scanned_at__in={data['scanned_at'] for data in scans},
+        ).values_list('badge_id', 'scanned_at')
+    )
+
+    results = [None] * len(scans)
+    logs, counts, presence = [], {}, defaultdict(list)
+    for index in sorted(range(len(scans)), key=lambda index: scans[index]['scanned_at']):
+        data = scans[index]
+        at = data['scanned_at']
+        if not hmac.compare_digest(data['device_signature'], sign_scan(key, device_id, data)):
+            results[index] = {'index': index, 'result': 'invalid', 'error': 'Signature de la borne invalide'}
+            continue
+        badge = badges[data['badge_code']]
+        if badge is None:
+            results[index] = {'index': index, 'result': 'invalid', 'error': 'Badge invalide'}
+            continue
+        if str(data['agency_id']) not in agencies:
+            results[index] = {'index': index, 'result': 'invalid', 'error': 'Agence introuvable'}
+            continue
+        if at > now + FUTURE_TOLERANCE:
+            results[index] = {'index': index, 'result': 'invalid', 'error': 'Horodatage dans le futur'}
+            continue
+        if at < oldest:
+            results[index] = {'index': index, 'result': 'invalid', 'error': 'Horodatage trop ancien'}
+            continue
+
+        seen = (badge['id'], at)
+        if seen in stored:
+            results[index] = {'index': index, 'result': 'duplicate'}
+            continue
+        stored.add(seen)
+
+        refused = scanning.refusal(badge, data, at)
+        if refused:
+            result, notes, error = refused
+            log = scanning.scan_log(badge, data, result, at, ip_address, notes)
+            results[index] = {'index': index, 'result': result, 'error': error}
+        else:
+            log = scanning.scan_log(badge, data, 'success', at, ip_address)
+            totals = counts.setdefault(badge['id'], [0, None, None])
+            totals[0] += 1
+            totals[1], totals[2] = at, data['agency_id']
+            if data['scan_type'] == 'presence':
+                local = timezone.localtime(at)
+                presence[(badge['employee_id'], local.date())].append(local.time())
+            results[index] = {'index': index, 'result': 'success'}
+        log.device_id = device_id
+        logs.append(log)
+
+    with transaction.atomic():
+        # ignore_conflicts: le même lot envoyé deux fois en parallèle
+        written = scanning.write(logs, counts, ignore_conflicts=True) if logs else 0
+        attendances = _merge_presence(presence)
+    # Pointages de jours passés: synthèses (et paie) des mois touchés à jour
+    for month in sorted({day.replace(day=1) for _, day in presence}):
+        summarize_month(month)
+
+    return {
+        'device_id': device_id,
+        'received': len(scans),
+        'recorded': written,
+        'duplicates': sum(1 for result in results if result['result'] == 'duplicate'),
+        'attendances': attendances,
+        'results': results,
+    }
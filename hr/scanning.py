@@ -0,0 +1,361 @@
+"""
+Chemin rapide des scans de badge (bornes, moniteurs, pointage)
+
+Aux changements d'équipe, des centaines de scans arrivent en quelques
+minutes. Un scan ne lit plus la base:
+
+- le badge (signature attendue, statut, droits, fiche de l'employé) et la
+  liste des agences sont gardés en cache, lus ensemble en un aller-retour.
+  Les signaux les invalident dès qu'un badge, un employé ou une agence
+  change (voir hr/signals.py);
+- le journal du scan est ajouté à un tampon d'écriture différée du
+  processus, écrit en un bulk_create par un thread d'arrière-plan quand il
+  atteint BADGE_SCAN_BUFFER_SIZE entrées ou au plus tard
+  BADGE_SCAN_FLUSH_SECONDS après le premier scan en attente (avec 0, la
+  requête qui remplit le tampon l'écrit elle-même);
+- scan_count, last_scan_at et last_scan_agency sont agrégés en mémoire et
+  écrits au même moment, en un seul UPDATE pour tous les badges.
+
+Seul le pointage de présence écrit immédiatement (Attendance), car l'arrivée
+et le départ dépendent de l'état du jour.
+
+Une écriture qui échoue (base momentanément indisponible) remet ses
+journaux et compteurs dans le tampon pour l'écriture suivante. Ils ne sont
+abandonnés, avec une erreur dans les logs, qu'après FLUSH_ATTEMPTS échecs
+consécutifs, ou si le tampon dépasse MAX_PENDING_BATCHES fois sa taille.
+
+Contrepartie: les journaux en attente d'un processus qui s'arrête
+brutalement sont perdus (au plus BADGE_SCAN_FLUSH_SECONDS de scans); un
+arrêt normal vide le tampon. BADGE_SCAN_BUFFER_SIZE = 1 écrit chaque scan
+immédiatement.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections, models, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from .attendance import arrival_status
+from .models import Attendance, BadgeScanLog, EmployeeBadge
+
+logger = logging.getLogger(__name__)
+
+AGENCIES_KEY = 'hr:scan:agencies'
+MISSING = 'missing'
+
+# Échecs d'écriture consécutifs avant d'abandonner les scans en attente
+FLUSH_ATTEMPTS = 3
+# Scans gardés en attente pendant les échecs, en multiple de la taille du tampon
+MAX_PENDING_BATCHES = 10
+
+
+def _ttl():
+    return getattr(settings, 'BADGE_SCAN_CACHE_TTL', 3600)
+
+
+def _badge_key(badge_code):
+    return f'hr:scan:badge:{badge_code}'
+
+
+def invalidate_badge(badge_code):
+    cache.delete(_badge_key(badge_code))
+
+
+def invalidate_agencies():
+    cache.delete(AGENCIES_KEY)
+
+
+def _badge_entry(badge):
+    """Ce qu'il faut pour répondre à un scan de ce badge"""
+    employee = badge.employee
+    return {
+        'id': badge.pk,
+        'code': badge.badge_code,
+        'signature': badge.signature(),
+        'status': badge.status,
+        'expiry_date': badge.expiry_date,
+        'can_access_all_agencies': badge.can_access_all_agencies,
+        'can_activate_monitor': badge.can_activate_monitor,
+        'can_use_kiosk': badge.can_use_kiosk,
+        'employee_id': employee.pk,
+        'agency_id': str(employee.agency_id),
+        'employee': {
+            'name': str(employee),
+            'number': employee.employee_number,
+            'position': employee.get_position_display(),
+        },
+        'permissions': {
+            'dashboards': employee.get_accessible_dashboards(),
+            'can_manage_queue': employee.can_manage_queue,
+        },
+    }
+
+
+def lookup_many(badge_codes):
+    """
+    ({code: badge}, agences): entrées des badges (None pour un code
+    inconnu) et {id: nom} des agences. Un aller-retour au cache, une
+    requête pour les badges absents du cache.
+    """
+    from agencies.models import Agency
+
+    keys = {code: _badge_key(code) for code in badge_codes}
+    cached = cache.get_many([*keys.values(), AGENCIES_KEY])
+
+    agencies = cached.get(AGENCIES_KEY)
+    if agencies is None:
+        agencies = {str(pk): name for pk, name in Agency.objects.values_list('pk', 'name')}
+        cache.set(AGENCIES_KEY, agencies, _ttl())
+
+    entries = {code: cached[key] for code, key in keys.items() if key in cached}
+    missing = [code for code in keys if code not in entries]
+    if missing:
+        loaded = {
+            badge.badge_code: _badge_entry(badge)
+            for badge in EmployeeBadge.objects.select_related('employee').filter(badge_code__in=missing)
+        }
+        for code in missing:
+            entries[code] = loaded.get(code, MISSING)
+        cache.set_many({keys[code]: entries[code] for code in missing}, _ttl())
+
+    return {code: (None if entry == MISSING else entry) for code, entry in entries.items()}, agencies
+
+
+def lookup(badge_code):
+    """(badge, agences): entrée du badge (None s'il n'existe pas) et {id: nom} des agences"""
+    badges, agencies = lookup_many([badge_code])
+    return badges[badge_code], agencies
+
+
+def refusal(badge, data, at):
+    """(résultat, notes, erreur) si le scan est refusé, None s'il est accepté"""
+    if data['signature'] != badge['signature']:
+        return 'invalid', 'Signature invalide', 'Signature invalide'
+    if badge['status'] != 'actif' or (badge['expiry_date'] and badge['expiry_date'] < timezone.localdate(at)):
+        return 'expired', f"Badge {badge['status']}", 'Badge expiré ou désactivé'
+    if not badge['can_access_all_agencies'] and badge['agency_id'] != str(data['agency_id']):
+        return 'denied', 'Accès agence refusé', 'Accès non autorisé à cette agence'
+    if data['scan_type'] == 'monitor' and not badge['can_activate_monitor']:
+        return 'denied', 'Non autorisé à activer le moniteur', 'Non autorisé à activer le moniteur'
+    if data['scan_type'] == 'kiosk' and not badge['can_use_kiosk']:
+        return 'denied', 'Non autorisé à utiliser la borne', 'Non autorisé à utiliser cette borne'
+    return None
+
+
+class ScanBuffer:
+    """Tampon d'écriture différée des scans d'un processus"""
+
+    def __init__(self, size, flush_seconds):
+        self.size = max(size, 1)
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._logs = []
+        # {badge_id: [scans, dernier scan, dernière agence]}
+        self._counts = {}
+        self._timer = None
+        self._failures = 0
+
+    def add(self, log, counted=False):
+        with self._lock:
+            self._logs.append(log)
+            if counted:
+                totals = self._counts.setdefault(log.badge_id, [0, None, None])
+                totals[0] += 1
+                totals[1] = log.scanned_at
+                totals[2] = log.agency_id
+            # Après un échec, le seuil grandit: chaque scan ne relance pas une écriture
+            full = len(self._logs) >= self.size * (1 + self._failures)
+            if not full:
+                self._schedule()
+        if full:
+            if self.flush_seconds > 0:
+                # La requête qui remplit le tampon n'attend pas l'écriture
+                threading.Thread(target=self._flush_in_background, daemon=True).start()
+            else:
+                self.flush()
+
+    def _schedule(self):
+        # Sous self._lock
+        if self._timer is None and self.flush_seconds > 0:
+            self._timer = threading.Timer(self.flush_seconds, self._flush_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def pending(self):
+        with self._lock:
+            return len(self._logs)
+
+    def flush(self):
+        """Écrire les scans en attente; retourne le nombre de journaux écrits"""
+        with self._lock:
+            logs, counts = self._logs, self._counts
+            self._logs, self._counts = [], {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not logs:
+            return 0
+        try:
+            written = write(logs, counts)
+        except DatabaseError:
+            self._requeue(logs, counts)
+            return 0
+        with self._lock:
+            self._failures = 0
+        return written
+
+    def _requeue(self, logs, counts):
+        """Remettre un lot non écrit en tête du tampon (appelé dans le except)"""
+        with self._lock:
+            self._failures += 1
+            if self._failures >= FLUSH_ATTEMPTS or len(logs) + len(self._logs) > self.size * MAX_PENDING_BATCHES:
+                logger.exception(
+                    'Écriture de %d scan(s) de badge impossible après %d essai(s), scans abandonnés',
+                    len(logs), self._failures,
+                )
+                self._failures = 0
+                return
+            logger.warning(
+                'Écriture de %d scan(s) de badge impossible (essai %d/%d), nouvel essai au prochain vidage',
+                len(logs), self._failures, FLUSH_ATTEMPTS, exc_info=True,
+            )
+            self._logs = logs + self._logs
+            for pk, (scans, at, agency_id) in counts.items():
+                totals = self._counts.get(pk)
+                if totals is None:
+                    self._counts[pk] = [scans, at, agency_id]
+                    continue
+                totals[0] += scans
+                if at > totals[1]:
+                    totals[1], totals[2] = at, agency_id
+            self._schedule()
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            connections.close_all()
+
+
+def _older_than(at):
+    return Q(last_scan_at__isnull=True) | Q(last_scan_at__lt=at)
+
+
+def write(logs, counts, ignore_conflicts=False):
+    """Insérer les journaux et reporter les scans sur les badges (une transaction)"""
+    # Un badge supprimé entre le scan et l'écriture emporte ses journaux
+    existing = set(EmployeeBadge.objects.filter(pk__in={log.badge_id for log in logs}).values_list('pk', flat=True))
+    logs = [log for log in logs if log.badge_id in existing]
+    counts = {pk: totals for pk, totals in counts.items() if pk in existing}
+
+    with transaction.atomic():
+        BadgeScanLog.objects.bulk_create(logs, ignore_conflicts=ignore_conflicts)
+        if counts:
+            EmployeeBadge.objects.filter(pk__in=counts).update(
+                scan_count=Case(
+                    *[When(pk=pk, then=F('scan_count') + scans) for pk, (scans, _, _) in counts.items()],
+                    output_field=models.PositiveIntegerField(),
+                ),
+                # Un scan plus ancien (envoyé hors ligne) ne remplace pas le dernier scan connu
+                last_scan_at=Case(
+                    *[When(Q(pk=pk) & _older_than(at), then=Value(at)) for pk, (_, at, _) in counts.items()],
+                    default=F('last_scan_at'),
+                    output_field=models.DateTimeField(),
+                ),
+                last_scan_agency=Case(
+                    *[When(Q(pk=pk) & _older_than(at), then=Value(agency_id)) for pk, (_, at, agency_id) in counts.items()],
+                    default=F('last_scan_agency'),
+                    output_field=models.UUIDField(),
+                ),
+            )
+    return len(logs)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def scan_buffer():
+    """Tampon du processus (créé au premier scan, vidé à l'arrêt)"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = ScanBuffer(
+                    getattr(settings, 'BADGE_SCAN_BUFFER_SIZE', 100),
+                    getattr(settings, 'BADGE_SCAN_FLUSH_SECONDS', 2),
+                )
+                atexit.register(_buffer.flush)
+    return _buffer
+
+
+def record_presence(employee_id, at):
+    """Pointage: arrivée au premier scan du jour, départ au suivant"""
+    local = timezone.localtime(at)
+    attendance, created = Attendance.objects.get_or_create(
+        employee_id=employee_id,
+        date=local.date(),
+        defaults={
+            'check_in': local.time(),
+            'status': arrival_status(local.time()),
+        }
+    )
+    if not created and not attendance.check_out:
+        # C'est la sortie
+        attendance.check_out = local.time()
+        attendance.save(update_fields=['check_out'])
+
+
+def scan_log(badge, data, result, at, ip_address=None, notes=''):
+    return BadgeScanLog(
+        badge_id=badge['id'],
+        agency_id=data['agency_id'],
+        scan_type=data['scan_type'],
+        result=result,
+        scanned_at=at,
+        ip_address=ip_address,
+        device_info=data.get('device_info', ''),
+        notes=notes,
+    )
+
+
+def scan(data, ip_address=None):
+    """
+    Traiter un scan validé par BadgeScanRequestSerializer.
+    Retourne (statut HTTP, réponse), comme l'ancien BadgeScanView.
+    """
+    now = timezone.now()
+    badge, agencies = lookup(data['badge_code'])
+    if badge is None:
+        return 404, {'success': False, 'error': 'Badge invalide', 'result': 'invalid'}
+
+    if str(data['agency_id']) not in agencies:
+        # Sans agence connue, le scan ne peut pas être journalisé
+        return 404, {'success': False, 'error': 'Agence introuvable', 'result': 'invalid'}
+
+    refused = refusal(badge, data, now)
+    if refused:
+        result, notes, error = refused
+        scan_buffer().add(scan_log(badge, data, result, now, ip_address, notes))
+        return 403, {'success': False, 'error': error, 'result': result}
+
+    # Pointage écrit tout de suite, journal et compteur différés
+    if data['scan_type'] == 'presence':
+        record_presence(badge['employee_id'], now)
+    scan_buffer().add(scan_log(badge, data, 'success', now, ip_address), counted=True)
+
+    return 200, {
+        'success': True,
+        'result': 'success',
+        'employee': {**badge['employee'], 'agency': agencies.get(badge['agency_id'])},
+        'badge': {
+            'code': badge['code'],
+            'can_activate_monitor': badge['can_activate_monitor'],
+            'can_use_kiosk': badge['can_use_kiosk'],
+        },
+        'permissions': badge['permissions'],
+    }
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Employee, LeaveType, Leave, Attendance, Payroll, EmployeeBadge, BadgeScanLog
+from .models import Employee, LeaveType, Leave, Attendance, AttendanceSummary, Payroll, EmployeeBadge, BadgeScanLog
+from .scan_batches import MAX_BATCH_SIZE
 
 
 class EmployeeBadgeSerializer(serializers.ModelSerializer):
@@ -52,11 +53,24 @@ class BadgeScanRequestSerializer(serializers.Serializer):
     device_info = serializers.CharField(max_length=200, required=False, allow_blank=True)
 
 
+class BadgeScanUploadSerializer(BadgeScanRequestSerializer):
+    """Scan enregistré par une borne hors ligne, horodaté et signé par l'appareil"""
+    scanned_at = serializers.DateTimeField()
+    device_signature = serializers.CharField(max_length=64)
+
+
+class BadgeScanBatchSerializer(serializers.Serializer):
+    """Lot de scans envoyé par une borne à la reconnexion"""
+    device_id = serializers.CharField(max_length=100)
+    scans = BadgeScanUploadSerializer(many=True, allow_empty=False, max_length=MAX_BATCH_SIZE)
+
+
 class EmployeeSerializer(serializers.ModelSerializer):
     user_email = serializers.CharField(source='user.email', read_only=True)
     user_phone = serializers.CharField(source='user.phone', read_only=True)
     agency_name = serializers.CharField(source='agency.name', read_only=True)
     nationality_name = serializers.CharField(source='nationality.name', read_only=True)
+    capabilities = serializers.ListField(source='capability_names', child=serializers.CharField(), read_only=True)
     
     class Meta:
         model = Employee
@@ -64,7 +78,7 @@ class EmployeeSerializer(serializers.ModelSerializer):
             'id', 'user', 'user_email', 'user_phone', 'agency', 'agency_name',
             'first_name', 'last_name', 'post_name', 'nationality', 'nationality_name',
             'date_of_birth', 'place_of_birth', 'nif', 'employee_number', 'position',
-            'department', 'contract_type', 'hire_date', 'status', 'base_salary',
+            'department', 'capabilities', 'contract_type', 'hire_date', 'status', 'base_salary',
             'is_key_staff', 'photo', 'photo_url', 'bio', 'linkedin_url',
             'emergency_contact_name', 'emergency_contact_phone', 'created_at', 'updated_at'
         ]
@@ -113,6 +127,18 @@ class AttendanceSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
+class AttendanceSummarySerializer(serializers.ModelSerializer):
+    employee_name = serializers.StringRelatedField(source='employee')
+    
+    class Meta:
+        model = AttendanceSummary
+        fields = [
+            'id', 'employee', 'employee_name', 'month', 'days_present', 'days_late',
+            'days_absent', 'days_leave', 'late_minutes', 'hours_worked', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
 class PayrollSerializer(serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.get_full_name', read_only=True)
     
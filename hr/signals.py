@@ -0,0 +1,29 @@
+"""
+Signaux RH: invalider les données de scan de badge en cache (voir hr/scanning.py)
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Employee, EmployeeBadge
+from .scanning import invalidate_agencies, invalidate_badge
+
+
+@receiver(post_save, sender=EmployeeBadge)
+@receiver(post_delete, sender=EmployeeBadge)
+def badge_changed(sender, instance, **kwargs):
+    """Badge modifié (statut, droits, secret), créé ou supprimé"""
+    transaction.on_commit(lambda: invalidate_badge(instance.badge_code))
+
+
+@receiver(post_save, sender=Employee)
+def employee_changed(sender, instance, **kwargs):
+    """Nom, poste ou agence de l'employé affichés par le scan de son badge"""
+    codes = list(EmployeeBadge.objects.filter(employee=instance).values_list('badge_code', flat=True))
+    transaction.on_commit(lambda: [invalidate_badge(code) for code in codes])
+
+
+@receiver(post_save, sender='agencies.Agency')
+@receiver(post_delete, sender='agencies.Agency')
+def agency_changed(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_agencies)
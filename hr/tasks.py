@@ -0,0 +1,17 @@
+from celery import shared_task
+from django.utils import timezone
+from datetime import date, timedelta
+
+
+@shared_task
+def compute_attendance(day=None):
+    """Calculer les présences d'une journée (la veille par défaut) et la synthèse de son mois"""
+    from .attendance import compute_day, summarize_month
+    
+    day = date.fromisoformat(day) if day else timezone.localdate() - timedelta(days=1)
+    totals = compute_day(day)
+    count = summarize_month(day)
+    return (
+        f"Présences du {day.isoformat()}: {totals['scanned']} pointé(s), {totals['leave']} en congé, "
+        f"{totals['absent']} absent(s); {count} synthèse(s) mensuelle(s)"
+    )
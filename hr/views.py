@@ -3,12 +3,15 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.views import APIView
-from django.utils import timezone
-from .models import Employee, LeaveType, Leave, Attendance, Payroll, EmployeeBadge, BadgeScanLog
+from datetime import date
+
+from django.db import IntegrityError
+from . import capabilities as access, scan_batches, scanning
+from .models import Employee, LeaveType, Leave, Attendance, AttendanceSummary, Payroll, EmployeeBadge, BadgeScanLog
 from .serializers import (
     EmployeeSerializer, LeaveTypeSerializer, LeaveSerializer, 
-    AttendanceSerializer, PayrollSerializer, KeyStaffSerializer,
-    EmployeeBadgeSerializer, BadgeScanLogSerializer, BadgeScanRequestSerializer
+    AttendanceSerializer, AttendanceSummarySerializer, PayrollSerializer, KeyStaffSerializer,
+    EmployeeBadgeSerializer, BadgeScanLogSerializer, BadgeScanRequestSerializer, BadgeScanBatchSerializer
 )
 
 class EmployeeViewSet(viewsets.ModelViewSet):
@@ -34,6 +37,11 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         if department:
             queryset = queryset.filter(department=department)
         
+        # Filtrer par capacité (ex: manage_queue), voir hr/capabilities.py
+        capability = self.request.query_params.get('capability')
+        if capability in access.BITS:
+            queryset = access.with_capability(queryset, capability)
+        
         return queryset.order_by('last_name', 'first_name')
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
@@ -201,6 +209,36 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
+class AttendanceSummaryViewSet(viewsets.ReadOnlyModelViewSet):
+    """Synthèses mensuelles des présences (calculées chaque nuit, voir hr/attendance.py)"""
+    queryset = AttendanceSummary.objects.all()
+    serializer_class = AttendanceSummarySerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = AttendanceSummary.objects.select_related('employee')
+        
+        # Filtrer par employé
+        employee_id = self.request.query_params.get('employee')
+        if employee_id:
+            queryset = queryset.filter(employee_id=employee_id)
+        
+        # Filtrer par agence
+        agency_id = self.request.query_params.get('agency')
+        if agency_id:
+            queryset = queryset.filter(employee__agency_id=agency_id)
+        
+        # Filtrer par mois (AAAA-MM)
+        month = self.request.query_params.get('month')
+        if month:
+            try:
+                queryset = queryset.filter(month=date.fromisoformat(f'{month}-01'))
+            except ValueError:
+                return queryset.none()
+        
+        return queryset.order_by('-month', 'employee__last_name', 'employee__first_name')
+
+
 class PayrollViewSet(viewsets.ModelViewSet):
     queryset = Payroll.objects.all()
     serializer_class = PayrollSerializer
@@ -289,172 +327,32 @@ class BadgeScanView(APIView):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        data = serializer.validated_data
-        
-        # Trouver le badge
-        try:
-            badge = EmployeeBadge.objects.select_related('employee', 'employee__agency').get(
-                badge_code=data['badge_code']
-            )
-        except EmployeeBadge.DoesNotExist:
-            return Response({
-                'success': False,
-                'error': 'Badge invalide',
-                'result': 'invalid'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-        # Vérifier la signature
-        if not badge.verify_scan(data['signature']):
-            BadgeScanLog.objects.create(
-                badge=badge,
-                agency_id=data['agency_id'],
-                scan_type=data['scan_type'],
-                result='invalid',
-                ip_address=self.get_client_ip(request),
-                device_info=data.get('device_info', ''),
-                notes='Signature invalide'
-            )
-            return Response({
-                'success': False,
-                'error': 'Signature invalide',
-                'result': 'invalid'
-            }, status=status.HTTP_403_FORBIDDEN)
-        
-        # Vérifier si le badge est valide
-        if not badge.is_valid():
-            BadgeScanLog.objects.create(
-                badge=badge,
-                agency_id=data['agency_id'],
-                scan_type=data['scan_type'],
-                result='expired',
-                ip_address=self.get_client_ip(request),
-                device_info=data.get('device_info', ''),
-                notes=f'Badge {badge.status}'
-            )
-            return Response({
-                'success': False,
-                'error': 'Badge expiré ou désactivé',
-                'result': 'expired'
-            }, status=status.HTTP_403_FORBIDDEN)
-        
-        # Vérifier l'accès à l'agence
-        if not badge.can_access_agency(data['agency_id']):
-            BadgeScanLog.objects.create(
-                badge=badge,
-                agency_id=data['agency_id'],
-                scan_type=data['scan_type'],
-                result='denied',
-                ip_address=self.get_client_ip(request),
-                device_info=data.get('device_info', ''),
-                notes='Accès agence refusé'
-            )
-            return Response({
-                'success': False,
-                'error': 'Accès non autorisé à cette agence',
-                'result': 'denied'
-            }, status=status.HTTP_403_FORBIDDEN)
-        
-        # Vérifications spécifiques selon le type de scan
-        scan_type = data['scan_type']
-        
-        if scan_type == 'monitor' and not badge.can_activate_monitor:
-            BadgeScanLog.objects.create(
-                badge=badge,
-                agency_id=data['agency_id'],
-                scan_type=scan_type,
-                result='denied',
-                ip_address=self.get_client_ip(request),
-                device_info=data.get('device_info', ''),
-                notes='Non autorisé à activer le moniteur'
-            )
-            return Response({
-                'success': False,
-                'error': 'Non autorisé à activer le moniteur',
-                'result': 'denied'
-            }, status=status.HTTP_403_FORBIDDEN)
-        
-        if scan_type == 'kiosk' and not badge.can_use_kiosk:
-            BadgeScanLog.objects.create(
-                badge=badge,
-                agency_id=data['agency_id'],
-                scan_type=scan_type,
-                result='denied',
-                ip_address=self.get_client_ip(request),
-                device_info=data.get('device_info', ''),
-                notes='Non autorisé à utiliser la borne'
-            )
-            return Response({
-                'success': False,
-                'error': 'Non autorisé à utiliser cette borne',
-                'result': 'denied'
-            }, status=status.HTTP_403_FORBIDDEN)
-        
-        # Enregistrer le scan réussi
-        from agencies.models import Agency
-        try:
-            agency = Agency.objects.get(id=data['agency_id'])
-        except Agency.DoesNotExist:
-            agency = None
-        
-        badge.record_scan(agency)
-        
-        BadgeScanLog.objects.create(
-            badge=badge,
-            agency_id=data['agency_id'],
-            scan_type=scan_type,
-            result='success',
-            ip_address=self.get_client_ip(request),
-            device_info=data.get('device_info', '')
-        )
-        
-        # Si c'est un pointage présence, créer/màj l'attendance
-        if scan_type == 'presence':
-            self.handle_presence_scan(badge, agency)
-        
-        return Response({
-            'success': True,
-            'result': 'success',
-            'employee': {
-                'name': str(badge.employee),
-                'number': badge.employee.employee_number,
-                'position': badge.employee.get_position_display(),
-                'agency': badge.employee.agency.name,
-            },
-            'badge': {
-                'code': badge.badge_code,
-                'can_activate_monitor': badge.can_activate_monitor,
-                'can_use_kiosk': badge.can_use_kiosk,
-            },
-            'permissions': {
-                'dashboards': badge.employee.get_accessible_dashboards(),
-                'can_manage_queue': badge.employee.can_manage_queue,
-            }
-        })
+        # Badge et agences en cache, journal différé (voir hr/scanning.py)
+        status_code, payload = scanning.scan(serializer.validated_data, self.get_client_ip(request))
+        return Response(payload, status=status_code)
     
     def get_client_ip(self, request):
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
         if x_forwarded_for:
             return x_forwarded_for.split(',')[0]
         return request.META.get('REMOTE_ADDR')
+
+
+class BadgeScanBatchView(BadgeScanView):
+    """API publique: lot de scans d'une borne revenue en ligne (voir hr/scan_batches.py)"""
     
-    def handle_presence_scan(self, badge, agency):
-        """Gérer le pointage de présence"""
-        today = timezone.now().date()
-        current_time = timezone.now().time()
-        
-        attendance, created = Attendance.objects.get_or_create(
-            employee=badge.employee,
-            date=today,
-            defaults={
-                'check_in': current_time,
-                'status': 'present' if current_time.hour < 9 else 'retard'
-            }
-        )
+    def post(self, request):
+        serializer = BadgeScanBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        if not created and not attendance.check_out:
-            # C'est la sortie
-            attendance.check_out = current_time
-            attendance.save(update_fields=['check_out'])
+        data = serializer.validated_data
+        try:
+            summary = scan_batches.upload(data['device_id'], data['scans'], self.get_client_ip(request))
+        except IntegrityError:
+            # Pointage créé en même temps par un autre scan: rien n'est enregistré, la borne renvoie le lot
+            return Response({'error': 'Conflit avec un autre scan, renvoyer le lot'}, status=status.HTTP_409_CONFLICT)
+        return Response(summary)
 
 
 class BadgeScanLogViewSet(viewsets.ReadOnlyModelViewSet):
@@ -0,0 +1,133 @@
+"""
+Moteur de coupure / rétablissement du service des compteurs
+
+Les compteurs sont traités par lots: un UPDATE ... WHERE id IN (...) par lot,
+une ligne de journal d'audit par lot et une commande par lot envoyée au
+"sink" de commandes (IoT, file de messages...). Le sink est configurable via
+settings.METER_COMMAND_SINK.
+"""
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from accounts.models import AuditLog
+from .models import Meter
+
+ACTIVATE = 'ACTIVATE'
+DEACTIVATE = 'DEACTIVATE'
+
+SERVICE_STATE_CHUNK_SIZE = getattr(settings, 'SERVICE_STATE_CHUNK_SIZE', 1000)
+
+
+class CommandSink:
+    """Destination des commandes de service envoyées aux compteurs"""
+
+    def send(self, command, meter_numbers):
+        raise NotImplementedError
+
+
+class NullCommandSink(CommandSink):
+    """Aucun envoi (compteurs non connectés)"""
+
+    def send(self, command, meter_numbers):
+        return None
+
+
+class LocalCommandSink(CommandSink):
+    """Conserve les commandes en mémoire (tests, développement)"""
+
+    def __init__(self):
+        self.commands = []
+
+    def send(self, command, meter_numbers):
+        self.commands.append((command, list(meter_numbers)))
+
+
+def get_command_sink():
+    """Instancier le sink configuré dans settings.METER_COMMAND_SINK"""
+    path = getattr(settings, 'METER_COMMAND_SINK', 'operations.service_state.NullCommandSink')
+    return import_string(path)()
+
+
+def set_service_state(meters, active, reason='', user=None, sink=None, chunk_size=None):
+    """
+    Activer ou désactiver le service d'un ensemble de compteurs.
+
+    `meters` est un queryset de Meter; seuls les compteurs qui ne sont pas déjà
+    dans l'état demandé sont modifiés. Chaque lot est verrouillé, mis à jour
+    en un seul UPDATE et journalisé dans AuditLog; la commande est envoyée au
+    sink après validation de la transaction.
+
+    Retourne le nombre de compteurs modifiés, le nombre de lots et les
+    compteurs regroupés par client (pour une notification par client).
+    """
+    sink = sink or get_command_sink()
+    chunk_size = chunk_size or SERVICE_STATE_CHUNK_SIZE
+    command = ACTIVATE if active else DEACTIVATE
+
+    result = {'changed': 0, 'batches': 0, 'by_client': {}}
+
+    candidates = meters.filter(service_active=not active).order_by('pk')
+    last_pk = None
+
+    while True:
+        chunk = candidates.filter(pk__gt=last_pk) if last_pk else candidates
+        ids = list(chunk.values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            break
+        last_pk = ids[-1]
+
+        with transaction.atomic():
+            rows = list(
+                Meter.objects.select_for_update()
+                .filter(pk__in=ids, service_active=not active)
+                .values_list('pk', 'meter_number', 'equipment__site_id', 'equipment__site__client_id')
+            )
+            if not rows:
+                continue
+
+            Meter.objects.filter(pk__in=[row[0] for row in rows]).update(
+                service_active=active,
+                status='actif' if active else 'inactif',
+                updated_at=timezone.now(),
+            )
+
+            meter_numbers = [row[1] for row in rows]
+            AuditLog.objects.create(
+                user=user,
+                action='update',
+                module='operations',
+                object_id=str(uuid.uuid4()),
+                object_repr=f"{command} {len(rows)} compteur(s)"[:255],
+                changes={
+                    'command': command,
+                    'service_active': active,
+                    'reason': reason,
+                    'meters': meter_numbers,
+                },
+            )
+            transaction.on_commit(
+                lambda numbers=meter_numbers: sink.send(command, numbers)
+            )
+
+        result['changed'] += len(rows)
+        result['batches'] += 1
+        for _, meter_number, site_id, client_id in rows:
+            group = result['by_client'].setdefault(client_id, {'meters': [], 'sites': set()})
+            group['meters'].append(meter_number)
+            group['sites'].add(site_id)
+
+    return result
+
+
+def deactivate_meters(meters, reason='', user=None, sink=None, chunk_size=None):
+    """Couper le service d'un ensemble de compteurs"""
+    return set_service_state(meters, False, reason=reason, user=user, sink=sink, chunk_size=chunk_size)
+
+
+def activate_meters(meters, reason='', user=None, sink=None, chunk_size=None):
+    """Rétablir le service d'un ensemble de compteurs"""
+    return set_service_state(meters, True, reason=reason, user=user, sink=sink, chunk_size=chunk_size)
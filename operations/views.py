@@ -12,12 +12,12 @@ from .serializers import (
 )
 
 class EquipmentViewSet(viewsets.ModelViewSet):
-    queryset = Equipment.objects.all()
+    queryset = Equipment.objects.select_related('site')
     serializer_class = EquipmentSerializer
     permission_classes = [AllowAny]
     
     def get_queryset(self):
-        queryset = Equipment.objects.all()
+        queryset = super().get_queryset()
         
         # Filtrer par site
         site_id = self.request.query_params.get('site')
@@ -43,20 +43,20 @@ class EquipmentViewSet(viewsets.ModelViewSet):
         if not site_id:
             return Response({'error': 'site_id requis'}, status=status.HTTP_400_BAD_REQUEST)
         
-        equipment = Equipment.objects.filter(site_id=site_id)
+        equipment = self.queryset.filter(site_id=site_id)
         serializer = self.get_serializer(equipment, many=True)
         return Response(serializer.data)
 
 
 class MeterViewSet(viewsets.ModelViewSet):
-    queryset = Meter.objects.all()
+    queryset = Meter.objects.select_related('equipment__site').order_by('meter_number')
     serializer_class = MeterSerializer
     permission_classes = [AllowAny]
     
     @action(detail=False, methods=['get'])
     def active(self, request):
         """Récupérer les compteurs actifs"""
-        meters = Meter.objects.filter(status='actif', service_active=True)
+        meters = self.queryset.filter(status='actif', service_active=True)
         serializer = self.get_serializer(meters, many=True)
         return Response(serializer.data)
     
@@ -70,12 +70,12 @@ class MeterViewSet(viewsets.ModelViewSet):
 
 
 class MeterReadingViewSet(viewsets.ModelViewSet):
-    queryset = MeterReading.objects.all()
+    queryset = MeterReading.objects.select_related('meter')
     serializer_class = MeterReadingSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        queryset = MeterReading.objects.all()
+        queryset = super().get_queryset()
         
         # Filtrer par compteur
         meter_id = self.request.query_params.get('meter')
@@ -91,18 +91,18 @@ class MeterReadingViewSet(viewsets.ModelViewSet):
         if not meter_id:
             return Response({'error': 'meter_id requis'}, status=status.HTTP_400_BAD_REQUEST)
         
-        reading = MeterReading.objects.filter(meter_id=meter_id).latest('reading_date')
+        reading = self.queryset.filter(meter_id=meter_id).latest('reading_date')
         serializer = self.get_serializer(reading)
         return Response(serializer.data)
 
 
 class InterventionViewSet(viewsets.ModelViewSet):
-    queryset = Intervention.objects.all()
+    queryset = Intervention.objects.select_related('site', 'assigned_to')
     serializer_class = InterventionSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        queryset = Intervention.objects.all()
+        queryset = super().get_queryset()
         
         # Filtrer par site
         site_id = self.request.query_params.get('site')
@@ -124,6 +124,6 @@ class InterventionViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def pending(self, request):
         """Récupérer les interventions en attente"""
-        interventions = Intervention.objects.filter(status__in=['planifiee', 'en_cours']).order_by('scheduled_date')
+        interventions = self.queryset.filter(status__in=['planifiee', 'en_cours']).order_by('scheduled_date')
         serializer = self.get_serializer(interventions, many=True)
         return Response(serializer.data)
@@ -1,9 +1,28 @@
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from rest_framework.test import APIClient
 
 User = get_user_model()
 
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Cache vidé avant et après chaque test (états en direct, verrous, badges...)"""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def concurrent_db(transactional_db):
+    """Base partagée entre threads (test ignoré sur SQLite en mémoire)"""
+    # Vérifié à l'exécution: la collecte n'a pas accès à la base
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        pytest.skip("SQLite en mémoire: pas d'écritures concurrentes entre threads")
+
+
 @pytest.fixture
 def api_client():
     """Fixture pour le client API"""
@@ -25,3 +44,111 @@ def authenticated_client(api_client, authenticated_user):
     """Fixture pour un client API authentifié"""
     api_client.force_authenticate(user=authenticated_user)
     return api_client
+
+
+@pytest.fixture
+def geo(db):
+    """Fixture pour la géographie de base (RDC / Kinshasa)"""
+    from geo.models import Country, Province, Commune, Territory, Nationality
+
+    country = Country.objects.create(name='RDC', code='CD')
+    province = Province.objects.create(country=country, name='Kinshasa', code='KIN')
+    commune = Commune.objects.create(province=province, name='Gombe', code='GOM')
+    territory = Territory.objects.create(commune=commune, name='Gombe', code='GOM-T')
+    nationality = Nationality.objects.create(country=country, name='Congolaise')
+    return {
+        'country': country,
+        'province': province,
+        'commune': commune,
+        'territory': territory,
+        'nationality': nationality,
+    }
+
+
+@pytest.fixture
+def agency(geo):
+    """Fixture pour une agence"""
+    from agencies.models import Agency
+
+    return Agency.objects.create(
+        name='Agence Gombe',
+        province=geo['province'],
+        territory=geo['territory'],
+        address='123 Rue Test',
+        phone='+243123456789',
+        email='agence@example.com',
+    )
+
+
+@pytest.fixture
+def client_obj(geo, agency):
+    """Fixture pour un client CRM"""
+    from crm.models import Client
+
+    return Client.objects.create(
+        first_name='Jean',
+        last_name='Dupont',
+        email='client@example.com',
+        phone='+243987654321',
+        country=geo['country'],
+        province=geo['province'],
+        commune=geo['commune'],
+        territory=geo['territory'],
+        address='456 Rue Client',
+        agency=agency,
+        status='actif',
+    )
+
+
+@pytest.fixture
+def site(geo, client_obj):
+    """Fixture pour un site client"""
+    from crm.models import Site
+
+    return Site.objects.create(
+        client=client_obj,
+        name='Siège',
+        reference='SI-0001',
+        country=geo['country'],
+        province=geo['province'],
+        commune=geo['commune'],
+        territory=geo['territory'],
+        address='Bâtiment A',
+    )
+
+
+@pytest.fixture
+def employee(geo, agency, authenticated_user):
+    """Fixture pour un employé de l'agence"""
+    from datetime import date
+    from hr.models import Employee
+
+    return Employee.objects.create(
+        user=authenticated_user,
+        agency=agency,
+        first_name='Marie',
+        last_name='Mbuyi',
+        nationality=geo['nationality'],
+        date_of_birth=date(1990, 5, 12),
+        place_of_birth='Kinshasa',
+        nif='NIF-0001',
+        employee_number='EMP-0001',
+        contract_type='cdi',
+        hire_date=date(2020, 1, 6),
+    )
+
+
+@pytest.fixture
+def badge(employee):
+    """Fixture pour le badge de l'employé"""
+    from hr.models import EmployeeBadge
+
+    return EmployeeBadge.objects.create(employee=employee)
+
+
+@pytest.fixture
+def service(db):
+    """Fixture pour un service de file d'attente"""
+    from appointments.models import ServiceType
+
+    return ServiceType.objects.create(name='Abonnement', code='ABO')
@@ -0,0 +1,83 @@
+from datetime import date, time
+
+import pytest
+
+from appointments.models import Appointment, QueueTicket, ServiceType, SlotOccupancy, TimeSlot
+
+
+@pytest.fixture
+def services(db):
+    return [
+        ServiceType.objects.create(name='Abonnement', code='ABO'),
+        ServiceType.objects.create(name='Branchement', code='BRA'),
+    ]
+
+
+def make_appointment(agency, service, at, status='confirmed'):
+    return Appointment.objects.create(
+        agency=agency, service=service, client_name=f'Client {at}', client_phone='+243000',
+        date=date.today(), time=at, status=status,
+    )
+
+
+@pytest.fixture
+def operations_client(authenticated_client, authenticated_user):
+    authenticated_user.role = 'operations'
+    authenticated_user.save()
+    return authenticated_client
+
+
+@pytest.mark.django_db
+def test_bulk_conversion_in_a_handful_of_queries(operations_client, agency, services,
+                                                 django_assert_max_num_queries, django_capture_on_commit_callbacks):
+    TimeSlot.objects.create(agency=agency, day_of_week=date.today().weekday(), start_time=time(8), end_time=time(12))
+    QueueTicket.objects.create(agency=agency, service=services[0])  # A001 déjà émis
+    for index, at in enumerate([time(8), time(8, 30), time(9), time(9, 30), time(10), time(11)]):
+        make_appointment(agency, services[index % 2], at)
+    make_appointment(agency, services[0], time(8, 15), status='pending')
+    assert SlotOccupancy.objects.get().booked == 7
+
+    with django_capture_on_commit_callbacks(execute=True):
+        # 11 requêtes (lecture, 2 compteurs, insertion, rattachement, créneaux), plus les savepoints
+        with django_assert_max_num_queries(20):
+            response = operations_client.post('/api/appointments/appointments/convert_bulk/', {
+                'agency': str(agency.pk), 'from': '08:00', 'to': '10:30',
+            }, format='json')
+
+    assert response.status_code == 200
+    assert [t['ticket_number'] for t in response.data['tickets']] == ['A002', 'B001', 'A003', 'B002', 'A004']
+    converted = Appointment.objects.filter(status='in_progress').select_related('queue_ticket')
+    assert converted.count() == 5
+    assert {a.queue_ticket.priority for a in converted} == {'priority'}
+    assert SlotOccupancy.objects.get().booked == 2
+
+    # Déjà convertis: une seconde exécution ne crée rien
+    response = operations_client.post('/api/appointments/appointments/convert_bulk/', {'agency': str(agency.pk)}, format='json')
+    assert [t['ticket_number'] for t in response.data['tickets']] == ['B003']
+
+
+@pytest.mark.django_db
+def test_bulk_conversion_is_refused_to_clients(authenticated_client, authenticated_user, agency, services):
+    authenticated_user.role = 'client'
+    authenticated_user.save()
+    make_appointment(agency, services[0], time(8))
+
+    response = authenticated_client.post('/api/appointments/appointments/convert_bulk/', {'agency': str(agency.pk)}, format='json')
+
+    assert response.status_code == 403
+    assert not QueueTicket.objects.exists()
+    assert Appointment.objects.get().status == 'confirmed'
+
+
+@pytest.mark.django_db
+def test_converted_tickets_reach_the_live_queue(api_client, agency, services, django_capture_on_commit_callbacks):
+    from appointments.conversion import convert_appointments
+
+    api_client.get('/api/appointments/queue/display/', {'agency': str(agency.pk)})
+    make_appointment(agency, services[0], time(9))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        convert_appointments(agency.pk)
+
+    display = api_client.get('/api/appointments/queue/display/', {'agency': str(agency.pk)}).data
+    assert [t['ticket_number'] for t in display['waiting_tickets']] == ['A001']
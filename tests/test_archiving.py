@@ -0,0 +1,70 @@
+from datetime import date, timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from appointments.models import DailyQueueStats, QueueTicket, QueueTicketArchive, ServiceType
+from core.archiving import _rollup_missing_days, archive
+from hr.models import BadgeScanArchive, BadgeScanLog
+
+
+def old_tickets(agency, service, days_ago, count):
+    day = date.today() - timedelta(days=days_ago)
+    return QueueTicket.objects.bulk_create([
+        QueueTicket(agency=agency, service=service, date=day, ticket_number=f'A{n:03d}', status='completed')
+        for n in range(count)
+    ])
+
+
+@pytest.mark.django_db
+def test_archive_moves_old_tickets_in_resumable_chunks(agency, service):
+    old_tickets(agency, service, 10, 5)
+    old_tickets(agency, service, 9, 2)
+    today = QueueTicket.objects.create(agency=agency, service=service)
+
+    # Exécution interrompue après deux lots, puis reprise
+    assert archive('queue', retention_days=7, chunk_size=3, max_chunks=2)['rows'] == 6
+    assert archive('queue', retention_days=7, chunk_size=3)['rows'] == 1
+
+    assert list(QueueTicket.objects.values_list('pk', flat=True)) == [today.pk]
+    assert QueueTicketArchive.objects.count() == 7
+    # Statistiques consolidées avant le départ des tickets
+    assert sorted(DailyQueueStats.objects.values_list('total_tickets', flat=True)) == [2, 5]
+
+
+@pytest.mark.django_db
+def test_missing_days_are_read_one_row_per_day(agency, service):
+    old_tickets(agency, service, 10, 5)
+
+    with CaptureQueriesContext(connection) as queries:
+        _rollup_missing_days(date.today())
+
+    # DISTINCT sur la date seule: l'ordre par défaut des tickets n'est pas sélectionné
+    distinct = next(query['sql'] for query in queries if 'DISTINCT' in query['sql'])
+    assert 'priority' not in distinct and 'created_at' not in distinct
+    assert DailyQueueStats.objects.get().total_tickets == 5
+
+
+@pytest.mark.django_db
+def test_archive_command_moves_old_badge_scans(agency, badge):
+    recent = BadgeScanLog.objects.create(badge=badge, agency=agency, scan_type='presence', result='success')
+    old = BadgeScanLog.objects.create(badge=badge, agency=agency, scan_type='door', result='denied')
+    BadgeScanLog.objects.filter(pk=old.pk).update(scanned_at=timezone.now() - timedelta(days=120))
+
+    call_command('archive_history', '--only', 'badges')
+
+    assert list(BadgeScanLog.objects.values_list('pk', flat=True)) == [recent.pk]
+    archived = BadgeScanArchive.objects.get()
+    assert (archived.pk, archived.scan_type, archived.result) == (old.pk, 'door', 'denied')
+
+
+@pytest.mark.django_db
+def test_history_benchmark_leaves_no_data(agency, capsys):
+    call_command('benchmark_queue_history', '--sizes', '50,100', '--waiting', '2', '--repeat', '2')
+
+    assert 'display (ms)' in capsys.readouterr().out
+    assert not QueueTicket.objects.exists()
+    assert not ServiceType.objects.filter(name='Benchmark').exists()
@@ -0,0 +1,126 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from hr.attendance import compute_day, summarize_month
+from hr.models import Attendance, AttendanceSummary, BadgeScanLog, Employee, Leave, LeaveType
+
+MONDAY = date(2026, 3, 2)
+TUESDAY = date(2026, 3, 3)
+SATURDAY = date(2026, 3, 7)
+
+
+def scanned(badge, day, hour, minute=0, **overrides):
+    return BadgeScanLog.objects.create(
+        badge=badge,
+        agency_id=badge.employee.agency_id,
+        scan_type=overrides.pop('scan_type', 'presence'),
+        result=overrides.pop('result', 'success'),
+        scanned_at=timezone.make_aware(datetime.combine(day, time(hour, minute))),
+    )
+
+
+@pytest.fixture
+def colleague(employee, geo):
+    from accounts.models import User
+
+    return Employee.objects.create(
+        user=User.objects.create_user(username='collegue', password='testpass123', role='employe'),
+        agency=employee.agency,
+        first_name='Paul',
+        last_name='Kabila',
+        nationality=geo['nationality'],
+        date_of_birth=date(1988, 2, 3),
+        place_of_birth='Kinshasa',
+        nif='NIF-0002',
+        employee_number='EMP-0002',
+        contract_type='cdi',
+        hire_date=date(2021, 4, 1),
+    )
+
+
+@pytest.mark.django_db
+def test_day_is_computed_from_scans_leaves_and_absences(settings, badge, colleague, django_assert_max_num_queries):
+    settings.ATTENDANCE_LATE_AFTER = '08:30'
+    scanned(badge, MONDAY, 8, 45)
+    scanned(badge, MONDAY, 12, scan_type='kiosk')
+    scanned(badge, MONDAY, 17, 15)
+    scanned(badge, MONDAY, 18, result='denied')
+
+    with django_assert_max_num_queries(10):
+        totals = compute_day(MONDAY)
+
+    assert totals == {'scanned': 1, 'leave': 0, 'absent': 1}
+    attendance = Attendance.objects.get(employee=badge.employee, date=MONDAY)
+    assert (attendance.check_in, attendance.check_out, attendance.status) == (time(8, 45), time(17, 15), 'retard')
+    assert Attendance.objects.get(employee=colleague, date=MONDAY).status == 'absent'
+
+    # Congé approuvé après coup, puis recalcul: pas de doublon
+    Leave.objects.create(
+        employee=colleague, leave_type=LeaveType.objects.create(name='Annuel'),
+        start_date=MONDAY, end_date=TUESDAY, status='approuve',
+    )
+    assert compute_day(MONDAY) == {'scanned': 0, 'leave': 0, 'absent': 0}
+    assert Attendance.objects.filter(date=MONDAY).count() == 2
+    assert Attendance.objects.get(employee=colleague, date=MONDAY).status == 'conge'
+
+
+@pytest.mark.django_db
+def test_scans_merge_with_recorded_attendance_and_weekends(badge, colleague):
+    Attendance.objects.create(employee=badge.employee, date=MONDAY, check_in=time(9, 30), status='retard')
+    scanned(badge, MONDAY, 7, 55)
+
+    compute_day(MONDAY)
+    attendance = Attendance.objects.get(employee=badge.employee, date=MONDAY)
+    assert (attendance.check_in, attendance.check_out, attendance.status) == (time(7, 55), time(9, 30), 'present')
+
+    # Jour non ouvré: ni absence ni jour de congé, même couvert par un congé
+    Leave.objects.create(
+        employee=colleague, leave_type=LeaveType.objects.create(name='Annuel'),
+        start_date=SATURDAY, end_date=SATURDAY, status='approuve',
+    )
+    assert compute_day(SATURDAY) == {'scanned': 0, 'leave': 0, 'absent': 0}
+    assert not Attendance.objects.filter(date=SATURDAY).exists()
+
+
+@pytest.mark.django_db
+def test_monthly_summary(badge, colleague):
+    employee = badge.employee
+    Attendance.objects.bulk_create([
+        Attendance(employee=employee, date=MONDAY, check_in=time(8), check_out=time(16, 30), status='present'),
+        Attendance(employee=employee, date=TUESDAY, check_in=time(9, 20), check_out=time(17), status='retard'),
+        Attendance(employee=employee, date=date(2026, 3, 4), status='absent'),
+        Attendance(employee=employee, date=date(2026, 3, 5), status='conge'),
+        Attendance(employee=employee, date=date(2026, 4, 1), check_in=time(8), status='present'),
+    ])
+
+    assert summarize_month(MONDAY) == 1
+    summary = AttendanceSummary.objects.get(employee=employee, month=date(2026, 3, 1))
+    assert (summary.days_present, summary.days_late, summary.days_absent, summary.days_leave) == (2, 1, 1, 1)
+    assert summary.late_minutes == 20
+    assert summary.hours_worked == Decimal('16.17')
+
+    # Recalcul: la ligne du mois est mise à jour
+    Attendance.objects.filter(employee=employee, date=date(2026, 3, 4)).update(status='conge')
+    summarize_month(MONDAY)
+    summary = AttendanceSummary.objects.get(employee=employee, month=date(2026, 3, 1))
+    assert (summary.days_absent, summary.days_leave) == (0, 2)
+
+
+@pytest.mark.django_db
+def test_command_and_api(authenticated_client, badge, colleague):
+    scanned(badge, MONDAY, 8)
+    call_command('compute_attendance', '--from', MONDAY.isoformat(), '--to', TUESDAY.isoformat())
+
+    assert Attendance.objects.filter(employee=colleague).count() == 2
+    response = authenticated_client.get('/api/hr/attendance-summaries/', {'month': '2026-03', 'employee': colleague.pk})
+    assert response.status_code == 200
+    rows = response.data['results'] if isinstance(response.data, dict) else response.data
+    assert [(row['days_absent'], row['employee_name']) for row in rows] == [(2, str(colleague))]
+
+    response = authenticated_client.get('/api/hr/attendance-summaries/', {'month': '2026-13'})
+    rows = response.data['results'] if isinstance(response.data, dict) else response.data
+    assert rows == []
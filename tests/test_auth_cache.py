@@ -0,0 +1,83 @@
+import pytest
+from django.core.cache import cache
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from accounts import authentication
+
+
+@pytest.fixture(autouse=True)
+def clear_local_users():
+    authentication._local.clear()
+    yield
+    authentication._local.clear()
+
+
+@pytest.fixture
+def token_client(api_client, authenticated_user):
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(authenticated_user)}')
+    return api_client
+
+
+@pytest.mark.django_db
+def test_me_costs_no_queries_once_cached(token_client, authenticated_user, employee, django_assert_num_queries):
+    authenticated_user.agency = employee.agency
+    authenticated_user.save()
+    assert token_client.get('/api/auth/me/').status_code == 200
+
+    with django_assert_num_queries(0):
+        response = token_client.get('/api/auth/me/')
+
+    assert response.status_code == 200
+    assert response.data['employee_number'] == 'EMP-0001'
+    assert response.data['agency_name'] == 'Agence Gombe'
+    assert response.data['accessible_dashboards'] == ['employee']
+    assert response.data['can_manage_queue'] is False
+
+
+@pytest.mark.django_db
+def test_user_and_employee_changes_invalidate_cache(token_client, authenticated_user, employee,
+                                                   django_capture_on_commit_callbacks):
+    token_client.get('/api/auth/me/')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        employee.position = 'agent_guichet'
+        employee.department = 'support'
+        employee.save()
+    response = token_client.get('/api/auth/me/')
+    assert response.data['position'] == 'agent_guichet'
+    assert response.data['can_manage_queue'] is True
+    assert 'support' in response.data['accessible_dashboards']
+
+    with django_capture_on_commit_callbacks(execute=True):
+        authenticated_user.is_active = False
+        authenticated_user.save()
+    assert token_client.get('/api/auth/me/').status_code == 401
+
+
+@pytest.mark.django_db
+def test_user_without_employee(token_client, authenticated_user, django_assert_num_queries):
+    token_client.get('/api/auth/me/')
+
+    with django_assert_num_queries(0):
+        response = token_client.get('/api/auth/me/')
+
+    assert response.data['employee_number'] is None
+    assert response.data['accessible_dashboards'] == ['employee']
+
+
+@pytest.mark.django_db
+def test_password_hash_is_not_cached(token_client, authenticated_user, monkeypatch):
+    monkeypatch.setattr(api_settings, 'CHECK_REVOKE_TOKEN', True)
+    token_client.get('/api/auth/me/')
+
+    key = authentication._user_key(authenticated_user.pk, authentication._version(authenticated_user.pk))
+    entry = cache.get(key)
+    assert 'password' not in entry['user']
+    assert authenticated_user.password not in repr(entry)
+    assert entry['password_digest'] == get_md5_hash_password(authenticated_user.password)
+
+    # Mot de passe différé: relu en base si une vue en a besoin
+    user = authentication.cached_user(authenticated_user.pk)
+    assert user.check_password('testpass123')
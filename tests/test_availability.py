@@ -0,0 +1,64 @@
+from datetime import date, time, timedelta
+
+import pytest
+
+from appointments.models import Appointment, TimeSlot
+
+MONDAY = date(2030, 3, 4)
+
+
+@pytest.mark.django_db
+class TestAvailability:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, agency, service, django_capture_on_commit_callbacks):
+        self.agency, self.service = agency, service
+        self.capture = django_capture_on_commit_callbacks
+        for day_of_week in range(5):
+            TimeSlot.objects.create(agency=agency, day_of_week=day_of_week, start_time=time(8), end_time=time(10), max_appointments=2)
+            TimeSlot.objects.create(agency=agency, day_of_week=day_of_week, start_time=time(10), end_time=time(12), max_appointments=3)
+
+    def book(self, day, at, status='pending'):
+        with self.capture(execute=True):
+            return Appointment.objects.create(
+                agency=self.agency, service=self.service, client_name='Client', client_phone='+243000',
+                date=day, time=at, status=status,
+            )
+
+    def get(self, api_client, **params):
+        return api_client.get('/api/appointments/time-slots/available/', {'agency': str(self.agency.pk), **params})
+
+    def test_day_is_computed_in_two_queries_then_cached(self, api_client, django_assert_num_queries):
+        self.book(MONDAY, time(8, 30))
+        self.book(MONDAY, time(9, 30))
+        self.book(MONDAY, time(10, 15))
+        self.book(MONDAY, time(11), status='cancelled')
+
+        with django_assert_num_queries(2):
+            response = self.get(api_client, date=MONDAY.isoformat())
+        # Créneau de 8h complet, 2 places sur 3 à 10h
+        assert [(slot['start_time'], slot['available_spots']) for slot in response.data] == [('10:00:00', 2)]
+
+        with django_assert_num_queries(0):
+            assert self.get(api_client, date=MONDAY.isoformat()).data == response.data
+
+    def test_week_in_one_request(self, api_client, django_assert_num_queries):
+        self.book(MONDAY + timedelta(days=2), time(10))
+
+        with django_assert_num_queries(2):
+            response = self.get(api_client, **{'from': MONDAY.isoformat(), 'to': (MONDAY + timedelta(days=6)).isoformat()})
+
+        assert list(response.data) == [(MONDAY + timedelta(days=offset)).isoformat() for offset in range(7)]
+        assert [slot['available_spots'] for slot in response.data[(MONDAY + timedelta(days=2)).isoformat()]] == [2, 2]
+        assert response.data[(MONDAY + timedelta(days=5)).isoformat()] == []
+
+    def test_booking_and_cancelling_invalidate_the_day(self, api_client):
+        assert [slot['available_spots'] for slot in self.get(api_client, date=MONDAY.isoformat()).data] == [2, 3]
+
+        appointment = self.book(MONDAY, time(8))
+        assert [slot['available_spots'] for slot in self.get(api_client, date=MONDAY.isoformat()).data] == [1, 3]
+
+        with self.capture(execute=True):
+            appointment.status = 'cancelled'
+            appointment.save()
+        assert [slot['available_spots'] for slot in self.get(api_client, date=MONDAY.isoformat()).data] == [2, 3]
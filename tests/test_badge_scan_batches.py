@@ -0,0 +1,103 @@
+from datetime import datetime, time, timedelta
+
+import pytest
+from django.utils import timezone
+
+from hr.models import Attendance, AttendanceSummary, BadgeScanLog
+from hr.scan_batches import device_key, sign_scan
+
+URL = '/api/hr/badge-scan/batch/'
+
+
+def at(hour, minute=0, days_ago=1):
+    day = timezone.localdate() - timedelta(days=days_ago)
+    return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+
+def scan(badge, scanned_at, scan_type='presence', device_id='borne-01', **overrides):
+    data = {
+        'badge_code': badge.badge_code,
+        'signature': badge.signature(),
+        'agency_id': str(badge.employee.agency_id),
+        'scan_type': scan_type,
+        'scanned_at': scanned_at,
+        **overrides,
+    }
+    # Signé par la borne, comme sur l'appareil
+    return {
+        'device_signature': sign_scan(device_key(device_id), device_id, data),
+        **data,
+        'scanned_at': scanned_at.isoformat(),
+    }
+
+
+@pytest.mark.django_db
+def test_batch_is_applied_in_order_and_deduplicated(api_client, badge, django_assert_max_num_queries):
+    scans = [
+        scan(badge, at(17, 30)),
+        scan(badge, at(8, 15)),
+        scan(badge, at(12), 'kiosk'),
+        scan(badge, at(12), 'kiosk', signature='0' * 16),
+        scan(badge, at(9), badge_code='MWO-UNKNOWN'),
+    ]
+    with django_assert_max_num_queries(15):
+        response = api_client.post(URL, {'device_id': 'borne-01', 'scans': scans}, format='json')
+
+    assert response.status_code == 200
+    assert [row['result'] for row in response.data['results']] == ['success', 'success', 'success', 'duplicate', 'invalid']
+    assert response.data['recorded'] == 3
+
+    attendance = Attendance.objects.get(employee=badge.employee)
+    assert (attendance.check_in, attendance.check_out, attendance.status) == (time(8, 15), time(17, 30), 'present')
+    badge.refresh_from_db()
+    assert badge.scan_count == 3 and badge.last_scan_at == at(17, 30)
+    assert set(BadgeScanLog.objects.values_list('device_id', flat=True)) == {'borne-01'}
+
+    # Lot renvoyé (réponse perdue): rien n'est compté deux fois
+    response = api_client.post(URL, {'device_id': 'borne-01', 'scans': scans}, format='json')
+    assert response.data['duplicates'] == 4 and response.data['recorded'] == 0
+    badge.refresh_from_db()
+    assert badge.scan_count == 3 and BadgeScanLog.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_offline_scans_merge_with_online_attendance(api_client, badge):
+    Attendance.objects.create(employee=badge.employee, date=at(0).date(), check_in=time(10), status='retard')
+
+    response = api_client.post(URL, {'device_id': 'borne-02', 'scans': [scan(badge, at(7, 50), device_id='borne-02')]}, format='json')
+
+    assert response.data['attendances'] == 1
+    attendance = Attendance.objects.get(employee=badge.employee)
+    assert (attendance.check_in, attendance.check_out, attendance.status) == (time(7, 50), time(10), 'present')
+
+
+@pytest.mark.django_db
+def test_batch_rejects_future_scans_and_bad_payloads(api_client, badge):
+    future = scan(badge, timezone.now() + timedelta(hours=1), device_id='borne-03')
+    response = api_client.post(URL, {'device_id': 'borne-03', 'scans': [future]}, format='json')
+    assert response.data['results'][0]['error'] == 'Horodatage dans le futur'
+    assert not BadgeScanLog.objects.exists()
+
+    assert api_client.post(URL, {'device_id': 'borne-03', 'scans': []}, format='json').status_code == 400
+
+
+@pytest.mark.django_db
+def test_batch_requires_the_device_signature_and_a_recent_timestamp(api_client, badge, settings):
+    settings.BADGE_SCAN_OFFLINE_HOURS = 48
+    forged = scan(badge, at(7), device_signature='0' * 64)
+    other_device = scan(badge, at(7, 5), device_id='borne-02')
+    stale = scan(badge, at(7, days_ago=3))
+    response = api_client.post(URL, {'device_id': 'borne-01', 'scans': [forged, other_device, stale]}, format='json')
+
+    assert [row['error'] for row in response.data['results']] == [
+        'Signature de la borne invalide', 'Signature de la borne invalide', 'Horodatage trop ancien',
+    ]
+    assert not BadgeScanLog.objects.exists() and not Attendance.objects.exists()
+
+
+@pytest.mark.django_db
+def test_back_dated_scans_update_the_monthly_summary(api_client, badge):
+    api_client.post(URL, {'device_id': 'borne-01', 'scans': [scan(badge, at(8, days_ago=2))]}, format='json')
+
+    summary = AttendanceSummary.objects.get(employee=badge.employee, month=at(8, days_ago=2).date().replace(day=1))
+    assert summary.days_present == 1
@@ -0,0 +1,113 @@
+import pytest
+from django.db import DatabaseError
+from django.core.management import call_command
+
+from hr import scanning
+from hr.models import Attendance, BadgeScanLog
+
+URL = '/api/hr/badge-scan/'
+
+
+@pytest.fixture
+def buffer(monkeypatch):
+    """Tampon d'écriture différée sans minuterie"""
+    buffer = scanning.ScanBuffer(100, 0)
+    monkeypatch.setattr(scanning, '_buffer', buffer)
+    return buffer
+
+
+def payload(badge, scan_type='kiosk', **overrides):
+    return {
+        'badge_code': badge.badge_code,
+        'signature': badge.signature(),
+        'agency_id': str(badge.employee.agency_id),
+        'scan_type': scan_type,
+        **overrides,
+    }
+
+
+@pytest.mark.django_db
+def test_warm_scans_are_buffered_then_flushed_in_bulk(api_client, badge, buffer, django_assert_num_queries):
+    assert api_client.post(URL, payload(badge), format='json').status_code == 200
+
+    with django_assert_num_queries(0):
+        response = api_client.post(URL, payload(badge, 'monitor'), format='json')
+
+    assert response.data['employee']['agency'] == 'Agence Gombe'
+    assert response.data['permissions']['dashboards'] == ['employee']
+    assert buffer.pending() == 2 and not BadgeScanLog.objects.exists()
+
+    assert buffer.flush() == 2
+    badge.refresh_from_db()
+    assert badge.scan_count == 2
+    assert badge.last_scan_agency_id == badge.employee.agency_id
+    assert badge.last_scan_at == BadgeScanLog.objects.latest('scanned_at').scanned_at
+    assert BadgeScanLog.objects.filter(badge=badge, result='success').count() == 2
+
+
+@pytest.mark.django_db
+def test_refusals_and_badge_changes(api_client, badge, buffer, django_capture_on_commit_callbacks):
+    response = api_client.post(URL, payload(badge, signature='0' * 16), format='json')
+    assert (response.status_code, response.data['result']) == (403, 'invalid')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        badge.status = 'suspendu'
+        badge.save()
+    response = api_client.post(URL, payload(badge), format='json')
+    assert (response.status_code, response.data['result']) == (403, 'expired')
+
+    assert api_client.post(URL, payload(badge, badge_code='MWO-UNKNOWN'), format='json').status_code == 404
+    assert api_client.post(URL, payload(badge, agency_id='00000000-0000-0000-0000-000000000000'), format='json').status_code == 404
+
+    buffer.flush()
+    badge.refresh_from_db()
+    assert sorted(BadgeScanLog.objects.values_list('result', flat=True)) == ['expired', 'invalid']
+    assert badge.scan_count == 0
+
+
+@pytest.mark.django_db
+def test_failed_flush_is_retried_then_dropped(api_client, badge, buffer, monkeypatch):
+    write = scanning.write
+
+    def unavailable(logs, counts, ignore_conflicts=False):
+        raise DatabaseError('base indisponible')
+
+    api_client.post(URL, payload(badge), format='json')
+    monkeypatch.setattr(scanning, 'write', unavailable)
+    assert buffer.flush() == 0
+    api_client.post(URL, payload(badge, 'monitor'), format='json')
+    assert buffer.pending() == 2
+
+    # La base revient: rien n'est perdu ni compté deux fois
+    monkeypatch.setattr(scanning, 'write', write)
+    assert buffer.flush() == 2
+    badge.refresh_from_db()
+    assert badge.scan_count == 2 and BadgeScanLog.objects.count() == 2
+
+    # Échecs répétés: les scans finissent par être abandonnés
+    api_client.post(URL, payload(badge), format='json')
+    monkeypatch.setattr(scanning, 'write', unavailable)
+    for _ in range(scanning.FLUSH_ATTEMPTS - 1):
+        buffer.flush()
+        assert buffer.pending() == 1
+    buffer.flush()
+    assert buffer.pending() == 0
+
+
+@pytest.mark.django_db
+def test_presence_is_recorded_immediately(api_client, badge, buffer):
+    api_client.post(URL, payload(badge, 'presence'), format='json')
+    attendance = Attendance.objects.get(employee=badge.employee)
+    assert attendance.check_in and not attendance.check_out
+
+    api_client.post(URL, payload(badge, 'presence'), format='json')
+    attendance.refresh_from_db()
+    assert attendance.check_out
+
+
+@pytest.mark.django_db
+def test_scan_benchmark_command(badge, capsys):
+    call_command('benchmark_badge_scans', '--scans', '40')
+
+    assert 'Journaux et compteurs complets' in capsys.readouterr().out
+    assert not BadgeScanLog.objects.exists()
@@ -0,0 +1,72 @@
+import pytest
+from datetime import date
+from smtplib import SMTPServerDisconnected
+from unittest import mock
+from django.core import mail
+from billing import outbox
+from billing.models import Invoice, OutboxMessage
+
+
+@pytest.mark.django_db
+class TestBillingOutbox:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, client_obj):
+        outbox.reset_worker_connection()
+        self.invoice = Invoice.objects.create(
+            invoice_number='MES-2026-000001',
+            client=client_obj,
+            period_start=date(2026, 1, 1),
+            period_end=date(2026, 1, 31),
+            subtotal=100,
+            total=100,
+            status='envoyee',
+        )
+        self.invoice.refresh_from_db()
+        self.context = {'invoice': self.invoice, 'client': client_obj}
+
+    def test_templated_messages_drained_in_batches_on_one_connection(self):
+        outbox.enqueue([
+            outbox.build_message('reminder', f'client{i}@example.com', self.context, invoice=self.invoice)
+            for i in range(5)
+        ])
+
+        with mock.patch('billing.outbox.get_connection', wraps=outbox.get_connection) as get_connection:
+            stats = outbox.drain_outbox(batch_size=2)
+
+        assert get_connection.call_count == 1
+        assert (stats['batches'], stats['sent'], stats['failed']) == (3, 5, 0)
+        assert len(mail.outbox) == 5
+        assert mail.outbox[0].subject == 'Relance facture MES-2026-000001'
+        assert 'Montant dû: 100.00 USD' in mail.outbox[0].body
+        assert not OutboxMessage.objects.exclude(status='sent').exists()
+
+    def test_failed_batch_is_retried_then_marked_failed(self, settings):
+        settings.BILLING_OUTBOX_MAX_ATTEMPTS = 2
+        outbox.enqueue_email('reminder', 'client@example.com', self.context)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('SMTP down')):
+            assert outbox.drain_outbox()['retried'] == 1
+            message = OutboxMessage.objects.get()
+            assert (message.status, message.attempts, message.last_error) == ('pending', 1, 'SMTP down')
+
+            assert outbox.drain_outbox()['failed'] == 1
+            assert OutboxMessage.objects.get().status == 'failed'
+
+        assert outbox.drain_outbox()['sent'] == 0
+
+    def test_dropped_connection_is_reopened_once(self):
+        outbox.enqueue_email('reminder', 'client@example.com', self.context)
+        send = mock.Mock(side_effect=[SMTPServerDisconnected('Connection unexpectedly closed'), 1])
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', send), \
+                mock.patch('billing.outbox.get_connection', wraps=outbox.get_connection) as get_connection:
+            stats = outbox.drain_outbox()
+
+        assert (stats['sent'], stats['retried']) == (1, 0)
+        assert get_connection.call_count == 2 and send.call_count == 2
+        assert OutboxMessage.objects.get().attempts == 1
+
+    def test_subjects_are_not_html_escaped(self):
+        subject, _ = outbox.render_email('payment_confirmation', {'payment': {'reference': "PAY-1 & <O'Neil>"}})
+        assert subject == "Confirmation de paiement - PAY-1 & <O'Neil>"
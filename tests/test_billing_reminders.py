@@ -0,0 +1,103 @@
+import pytest
+from datetime import date, timedelta
+from django.core import mail
+from django.core.cache import cache
+from billing.models import Invoice, Reminder
+from billing.reminders import sweep_unpaid_invoices
+from operations.models import Equipment, Meter
+
+TODAY = date(2026, 3, 31)
+
+
+def make_invoice(client_obj, site, number, days_overdue, status='envoyee'):
+    period_end = TODAY - timedelta(days=days_overdue)
+    return Invoice(
+        invoice_number=number,
+        client=client_obj,
+        site=site,
+        period_start=period_end - timedelta(days=30),
+        period_end=period_end,
+        subtotal=100,
+        total=100,
+        status=status,
+    )
+
+
+@pytest.mark.django_db
+class TestUnpaidInvoiceSweep:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, client_obj, site, django_capture_on_commit_callbacks):
+        cache.clear()
+        self.capture_on_commit = django_capture_on_commit_callbacks
+        self.client_obj = client_obj
+        self.site = site
+        equipment = Equipment.objects.create(
+            site=site,
+            equipment_type='compteur',
+            serial_number='EQ-001',
+            reference='REF-001',
+            installation_date=date(2025, 1, 1),
+        )
+        self.meter = Meter.objects.create(equipment=equipment, meter_number='M-001')
+
+    def sweep(self, **kwargs):
+        # Les tâches sont publiées après validation de la transaction
+        with self.capture_on_commit(execute=True):
+            return sweep_unpaid_invoices(**kwargs)
+
+    def test_buckets_and_anti_join(self):
+        # bulk_create: pas de signaux post_save
+        invoices = Invoice.objects.bulk_create([
+            make_invoice(self.client_obj, None, 'F-001', 1),
+            make_invoice(self.client_obj, None, 'F-002', 4),
+            make_invoice(self.client_obj, None, 'F-003', 8),
+            make_invoice(self.client_obj, None, 'F-004', 20),
+            make_invoice(self.client_obj, None, 'F-005', 20, status='payee'),
+        ])
+        Reminder.objects.create(invoice=invoices[2], reminder_type='j3')
+
+        stats = self.sweep(today=TODAY, chunk_size=2)
+
+        assert stats['reminders'] == {'j3': 2, 'j7': 1, 'j14': 0}
+        assert stats['deactivations'] == 0
+        assert set(stats['timings']) == {'select', 'insert', 'dispatch', 'total'}
+        assert set(Reminder.objects.values_list('invoice__invoice_number', 'reminder_type')) == {
+            ('F-002', 'j3'), ('F-003', 'j3'), ('F-003', 'j7'), ('F-004', 'j3'),
+        }
+        assert len(mail.outbox) == 3
+
+        # Un second passage ne renvoie rien pour les paliers déjà traités
+        stats = self.sweep(today=TODAY)
+        assert stats['reminders'] == {'j3': 0, 'j7': 1, 'j14': 0}
+
+    def test_deactivation_after_j3_and_j7(self):
+        invoice = Invoice.objects.bulk_create([make_invoice(self.client_obj, self.site, 'F-010', 15)])[0]
+        Reminder.objects.bulk_create([
+            Reminder(invoice=invoice, reminder_type='j3'),
+            Reminder(invoice=invoice, reminder_type='j7'),
+        ])
+
+        stats = self.sweep(today=TODAY)
+
+        assert stats['reminders']['j14'] == 1
+        assert stats['deactivations'] == 1
+        self.meter.refresh_from_db()
+        assert self.meter.service_active is False
+
+        # Compteur déjà coupé: plus de coupure à publier
+        stats = self.sweep(today=TODAY)
+        assert stats['deactivations'] == 0
+
+    def test_resume_from_cursor(self):
+        invoices = Invoice.objects.bulk_create([
+            make_invoice(self.client_obj, None, f'F-10{i}', 4) for i in range(4)
+        ])
+        ordered = sorted(invoice.pk for invoice in invoices)
+        cache.set(f'billing:unpaid-sweep:cursor:{TODAY.isoformat()}', ordered[1])
+
+        stats = self.sweep(today=TODAY)
+
+        assert stats['resumed_from'] == str(ordered[1])
+        assert stats['reminders']['j3'] == 2
+        assert cache.get(f'billing:unpaid-sweep:cursor:{TODAY.isoformat()}') is None
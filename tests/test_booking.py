@@ -0,0 +1,109 @@
+from datetime import date, time
+
+import pytest
+from django.core.management import call_command
+
+from appointments import booking
+from appointments.models import Appointment, SlotOccupancy, TimeSlot
+
+MONDAY = date(2030, 3, 4)
+
+
+@pytest.fixture
+def slot(agency):
+    return TimeSlot.objects.create(agency=agency, day_of_week=0, start_time=time(8), end_time=time(10), max_appointments=2)
+
+
+def book(api_client, agency, service, at=time(8, 30)):
+    return api_client.post('/api/appointments/appointments/', {
+        'client_name': 'Jean', 'client_phone': '+243000', 'agency': str(agency.pk),
+        'service': str(service.pk), 'date': MONDAY.isoformat(), 'time': at.isoformat(),
+    }, format='json')
+
+
+@pytest.mark.django_db
+def test_full_slot_is_refused_and_cancellation_frees_a_place(api_client, agency, service, slot):
+    assert book(api_client, agency, service).status_code == 201
+    assert book(api_client, agency, service, time(9)).status_code == 201
+
+    response = book(api_client, agency, service)
+    assert response.status_code == 400 and 'time' in response.data
+    assert SlotOccupancy.objects.get(slot=slot, date=MONDAY).booked == 2
+
+    appointment = Appointment.objects.first()
+    appointment.status = 'cancelled'
+    appointment.save()
+    assert SlotOccupancy.objects.get(slot=slot, date=MONDAY).booked == 1
+    assert book(api_client, agency, service).status_code == 201
+
+
+@pytest.mark.django_db
+def test_update_into_a_full_slot_is_refused(authenticated_client, authenticated_user, agency, service, slot):
+    authenticated_user.role = 'admin'
+    authenticated_user.save()
+    fields = dict(agency=agency, service=service, client_name='Jean', client_phone='+243000', date=MONDAY)
+    Appointment.objects.create(time=time(8), **fields)
+    Appointment.objects.create(time=time(9), **fields)
+    moved = Appointment.objects.create(time=time(11), **fields)
+    cancelled = Appointment.objects.create(time=time(11), status='cancelled', **fields)
+
+    url = f'/api/appointments/appointments/{moved.pk}/'
+    response = authenticated_client.patch(url, {'time': '08:30'}, format='json')
+    assert response.status_code == 400 and 'time' in response.data
+
+    url = f'/api/appointments/appointments/{cancelled.pk}/'
+    response = authenticated_client.patch(url, {'time': '08:30', 'status': 'pending'}, format='json')
+    assert response.status_code == 400 and 'time' in response.data
+
+    moved.refresh_from_db()
+    assert moved.time == time(11)
+    assert SlotOccupancy.objects.get(slot=slot, date=MONDAY).booked == 2
+
+
+@pytest.mark.django_db
+def test_deleting_an_appointment_frees_its_place(authenticated_client, authenticated_user, api_client, agency, service, slot):
+    authenticated_user.role = 'admin'
+    authenticated_user.save()
+    slot.max_appointments = 1
+    slot.save()
+    assert book(api_client, agency, service).status_code == 201
+    assert book(api_client, agency, service, time(9)).status_code == 400
+
+    appointment = Appointment.objects.get()
+    assert authenticated_client.delete(f'/api/appointments/appointments/{appointment.pk}/').status_code == 204
+    assert SlotOccupancy.objects.get(slot=slot, date=MONDAY).booked == 0
+    assert book(api_client, agency, service, time(9)).status_code == 201
+
+
+@pytest.mark.django_db
+def test_rescheduling_moves_the_reservation(agency, service, slot):
+    later = TimeSlot.objects.create(agency=agency, day_of_week=0, start_time=time(10), end_time=time(12), max_appointments=1)
+    appointment = Appointment.objects.create(
+        agency=agency, service=service, client_name='Jean', client_phone='+243000', date=MONDAY, time=time(8),
+    )
+    appointment = Appointment.objects.get(pk=appointment.pk)
+    appointment.time = time(11)
+    appointment.save()
+
+    assert SlotOccupancy.objects.get(slot=slot).booked == 0
+    assert SlotOccupancy.objects.get(slot=later).booked == 1
+
+
+@pytest.mark.django_db
+def test_confirmation_code_collision_is_retried(agency, service, monkeypatch):
+    codes = iter(['ABCD2345', 'ABCD2345', 'WXYZ6789'])
+    monkeypatch.setattr(booking, 'generate_confirmation_code', lambda: next(codes))
+    fields = dict(agency=agency, service=service, client_name='Jean', client_phone='+243000', date=MONDAY, time=time(15))
+
+    Appointment.objects.create(**fields)
+    second = Appointment.objects.create(**fields)
+
+    assert second.confirmation_code == 'WXYZ6789'
+
+
+def test_concurrent_booking_benchmark_never_overbooks(concurrent_db, agency, capsys):
+    call_command('benchmark_booking', '--threads', '6', '--attempts', '10', '--slots', '2', '--capacity', '12')
+
+    output = capsys.readouterr().out
+    assert '24 réservé(s), 36 refusé(s)' in output
+    assert 'Aucune surréservation' in output
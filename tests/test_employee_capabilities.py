@@ -0,0 +1,69 @@
+import pytest
+
+from hr import capabilities as access
+from hr.models import Employee
+
+
+def legacy_access(position, department):
+    """Règles d'accès d'avant le masque, recopiées pour comparaison"""
+    direction = position in ['directeur_general', 'directeur_adjoint', 'directeur_agence']
+    manager = position in ['manager', 'chef_departement', 'superviseur'] or direction
+    support = department == 'support' or position in ['responsable_support', 'agent_guichet', 'agent_support'] or direction
+    dashboards = {'employee'}
+    if direction:
+        dashboards |= {'admin', 'rh', 'comptabilite', 'commercial', 'operations', 'support', 'it'}
+    else:
+        for name, positions in [
+            ('rh', ['responsable_rh', 'assistant_rh']),
+            ('comptabilite', ['responsable_comptable', 'comptable', 'caissier']),
+            ('commercial', ['responsable_commercial', 'agent_commercial', 'conseiller_client']),
+            ('operations', ['responsable_operations', 'technicien', 'installateur']),
+            ('support', ['responsable_support', 'agent_guichet', 'agent_support']),
+            ('it', ['responsable_it', 'developpeur', 'administrateur_systeme']),
+        ]:
+            if department == name or position in positions:
+                dashboards.add(name)
+    queue = position in ['agent_guichet', 'agent_support', 'conseiller_client', 'caissier', 'responsable_support'] or manager
+    return dashboards, queue, support or manager, manager
+
+
+@pytest.mark.parametrize('position', [code for code, _ in Employee.POSITION_TYPES])
+def test_mask_matches_previous_rules(position):
+    for department, _ in Employee.DEPARTMENT_TYPES:
+        employee = Employee(position=position, department=department)
+        employee.capabilities = access.compute(position, department)
+
+        assert (
+            set(employee.get_accessible_dashboards()),
+            employee.can_manage_queue,
+            employee.can_view_monitor,
+            employee.is_manager,
+        ) == legacy_access(position, department)
+
+
+@pytest.mark.django_db
+def test_capabilities_follow_saves(employee):
+    assert employee.capability_names == ()
+
+    employee.position = 'agent_guichet'
+    employee.save(update_fields=['position'])
+    employee.refresh_from_db()
+
+    assert employee.capability_names == ('support', 'manage_queue', 'view_monitor')
+    assert employee.get_accessible_dashboards() == ['employee', 'support']
+
+
+@pytest.mark.django_db
+def test_queue_staff_of_agency_is_an_indexed_filter(employee, api_client):
+    queryset = access.with_capability(Employee.objects.filter(agency=employee.agency), 'manage_queue')
+    assert not queryset.exists()
+    assert 'employee_agency_capabilities' in queryset.explain()
+
+    employee.position = 'caissier'
+    employee.save()
+    assert list(queryset) == [employee]
+
+    response = api_client.get('/api/hr/employees/', {'agency': employee.agency_id, 'capability': 'manage_queue'})
+    results = response.data['results'] if 'results' in response.data else response.data
+    assert [row['id'] for row in results] == [str(employee.id)]
+    assert results[0]['capabilities'] == ['comptabilite', 'manage_queue']
@@ -0,0 +1,94 @@
+import pytest
+from datetime import date
+from decimal import Decimal
+from django.core.management import call_command
+from billing.invoicing import allocate_invoice_numbers, generate_invoices
+from billing.models import Invoice, InvoiceLine
+from crm.models import Contract
+from operations.models import Equipment, Meter, MeterReading
+
+
+@pytest.mark.django_db
+class TestInvoiceGeneration:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, client_obj, site):
+        self.client_obj = client_obj
+        self.site = site
+        equipment = Equipment.objects.create(
+            site=site,
+            equipment_type='compteur',
+            serial_number='EQ-001',
+            reference='REF-001',
+            installation_date=date(2025, 1, 1),
+        )
+        meter = Meter.objects.create(equipment=equipment, meter_number='M-001')
+        MeterReading.objects.bulk_create([
+            MeterReading(meter=meter, reading_date=date(2026, 1, 28), reading_value=1000),
+            MeterReading(meter=meter, reading_date=date(2026, 2, 10), reading_value=1100),
+            MeterReading(meter=meter, reading_date=date(2026, 2, 27), reading_value=1250),
+            MeterReading(meter=meter, reading_date=date(2026, 3, 5), reading_value=1400),
+        ])
+
+    def contract(self, contract_type, rate, **kwargs):
+        return Contract.objects.create(
+            client=self.client_obj,
+            site=self.site,
+            contract_type=contract_type,
+            start_date=date(2026, 1, 1),
+            rate=rate,
+            **kwargs,
+        )
+
+    def test_generates_one_invoice_per_contract_and_period(self):
+        consumption = self.contract('consommation', Decimal('0.20'))
+        monthly = self.contract('mensuel', 30)
+        self.contract('forfait', 50, status='suspendu')
+        self.contract('forfait', 50, end_date=date(2026, 1, 31))
+
+        stats = generate_invoices('2026-02', chunk_size=1)
+
+        assert stats['invoices'] == 2
+        assert stats['batches'] == 2
+        invoices = {invoice.contract_id: invoice for invoice in Invoice.objects.all()}
+        assert invoices[consumption.pk].total == Decimal('50.00')  # (1250 - 1000) x 0.20
+        assert invoices[consumption.pk].balance == Decimal('50.00')
+        assert invoices[monthly.pk].total == Decimal('30.00')
+        assert InvoiceLine.objects.get(invoice=invoices[consumption.pk]).quantity == 250
+        assert {invoice.status for invoice in invoices.values()} == {'brouillon'}
+
+        # Idempotent: un second passage ne crée rien
+        assert generate_invoices('2026-02')['invoices'] == 0
+        assert Invoice.objects.count() == 2
+
+    def test_site_shared_by_consumption_contracts_is_not_billed_twice(self):
+        first = self.contract('consommation', Decimal('0.20'))
+        second = self.contract('consommation', Decimal('0.25'))
+        monthly = self.contract('mensuel', 30)
+
+        stats = generate_invoices('2026-02', chunk_size=2)
+
+        assert sorted(stats['skipped']) == sorted([str(first.pk), str(second.pk)])
+        assert list(Invoice.objects.values_list('contract_id', flat=True)) == [monthly.pk]
+
+    def test_invoice_numbers_are_sequential(self):
+        self.contract('mensuel', 10)
+        self.contract('mensuel', 20)
+        self.contract('mensuel', 30)
+
+        call_command('generate_invoices', period='2026-02', chunk_size=2)
+
+        numbers = sorted(Invoice.objects.values_list('invoice_number', flat=True))
+        prefix = numbers[0].rsplit('-', 1)[0]
+        assert numbers == [f'{prefix}-{n:06d}' for n in range(1, 4)]
+        assert allocate_invoice_numbers(2) == [f'{prefix}-000004', f'{prefix}-000005']
+
+        # Numéro attribué automatiquement à la création manuelle
+        invoice = Invoice.objects.create(
+            client=self.client_obj,
+            period_start=date(2026, 3, 1),
+            period_end=date(2026, 3, 31),
+            subtotal=10,
+            total=10,
+        )
+        assert invoice.invoice_number == f'{prefix}-000006'
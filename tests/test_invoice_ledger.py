@@ -0,0 +1,106 @@
+import pytest
+from datetime import date
+from decimal import Decimal
+from django.core.management import call_command
+from billing.ledger import ledger_drift
+from billing.models import Invoice, Payment
+from billing.serializers import InvoiceSerializer
+
+
+@pytest.mark.django_db
+class TestInvoiceLedger:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, client_obj, settings, tmp_path):
+        # Les paiements confirmés déclenchent la génération du reçu
+        settings.MEDIA_ROOT = str(tmp_path)
+        self.invoice = Invoice.objects.create(
+            invoice_number='MES-2026-0001',
+            client=client_obj,
+            period_start=date(2026, 1, 1),
+            period_end=date(2026, 1, 31),
+            subtotal=1000,
+            total=1000,
+            status='envoyee',
+        )
+
+    def pay(self, reference, amount, status='confirmed'):
+        return Payment.objects.create(
+            invoice=self.invoice,
+            reference=reference,
+            amount=amount,
+            method='cash',
+            status=status,
+            payment_date=date(2026, 2, 1),
+        )
+
+    def test_payment_status_changes_update_ledger(self):
+        assert self.invoice.balance == 1000
+
+        pending = self.pay('PAY-1', 300, status='pending')
+        self.invoice.refresh_from_db()
+        assert self.invoice.amount_paid == 0
+
+        pending.status = 'confirmed'
+        pending.save()
+        self.invoice.refresh_from_db()
+        assert (self.invoice.amount_paid, self.invoice.balance) == (300, 700)
+        assert self.invoice.status == 'partiellement_payee'
+
+        # Nouvelle sauvegarde sans changement: pas de double comptage
+        pending.save()
+        self.pay('PAY-2', 700)
+        self.invoice.refresh_from_db()
+        assert (self.invoice.amount_paid, self.invoice.balance) == (1000, 0)
+        assert self.invoice.status == 'payee'
+
+        pending.delete()
+        self.invoice.refresh_from_db()
+        assert (self.invoice.amount_paid, self.invoice.balance) == (700, 300)
+        assert self.invoice.status == 'partiellement_payee'
+
+    def test_removed_payments_reopen_the_invoice(self):
+        payment = self.pay('PAY-1', 1000)
+        self.invoice.refresh_from_db()
+        assert self.invoice.status == 'payee'
+
+        # Paiement dé-confirmé puis supprimé: la facture est de nouveau à relancer
+        payment.status = 'failed'
+        payment.save()
+        self.invoice.refresh_from_db()
+        assert (self.invoice.amount_paid, self.invoice.balance, self.invoice.status) == (0, 1000, 'envoyee')
+
+        payment.status = 'confirmed'
+        payment.save()
+        payment.delete()
+        self.invoice.refresh_from_db()
+        assert (self.invoice.amount_paid, self.invoice.balance, self.invoice.status) == (0, 1000, 'envoyee')
+
+        # Une facture annulée après un paiement le reste quand il est retiré
+        refunded = self.pay('PAY-2', 200)
+        Invoice.objects.filter(pk=self.invoice.pk).update(status='annulee')
+        refunded.delete()
+        self.invoice.refresh_from_db()
+        assert self.invoice.status == 'annulee'
+
+    def test_invoice_save_keeps_ledger(self):
+        stale = Invoice.objects.get(pk=self.invoice.pk)
+        self.pay('PAY-1', 400)
+
+        stale.total = 1200
+        stale.save()
+
+        self.invoice.refresh_from_db()
+        assert (self.invoice.amount_paid, self.invoice.balance) == (400, 800)
+        assert InvoiceSerializer(self.invoice).data['balance'] == Decimal('800.00')
+
+    def test_reconcile_command(self):
+        self.pay('PAY-1', 250)
+        Invoice.objects.filter(pk=self.invoice.pk).update(amount_paid=0, balance=1000)
+        assert ledger_drift().count() == 1
+
+        call_command('reconcile_invoice_ledger')
+
+        self.invoice.refresh_from_db()
+        assert (self.invoice.amount_paid, self.invoice.balance) == (250, 750)
+        assert not ledger_drift().exists()
@@ -0,0 +1,49 @@
+import io
+import os
+import pytest
+from datetime import date
+from billing.models import Invoice, InvoiceLine
+from billing.pdf_batch import render_batch, split_batches
+from billing.pdf_generator import generate_invoice_pdf, get_styles
+
+
+@pytest.mark.django_db
+def test_render_batch_writes_files_and_paths(client_obj, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    invoices = Invoice.objects.bulk_create([
+        Invoice(
+            invoice_number=f'MES-2026-{i:06d}',
+            client=client_obj,
+            period_start=date(2026, 1, 1),
+            period_end=date(2026, 1, 31),
+            subtotal=100,
+            total=100,
+            status='validee',
+        )
+        for i in range(3)
+    ])
+    InvoiceLine.objects.create(invoice=invoices[0], description='Consommation', quantity=1, unit_price=100, total=100)
+
+    result = render_batch('invoice', [invoice.pk for invoice in invoices] + ['00000000-0000-0000-0000-000000000000'])
+
+    assert result == {'rendered': 3, 'errors': {}}
+    for invoice in Invoice.objects.all():
+        assert os.path.exists(invoice.pdf_file.path)
+    assert split_batches(range(5), 2) == [['0', '1'], ['2', '3'], ['4']]
+
+
+@pytest.mark.django_db
+def test_styles_are_built_once_and_output_can_be_a_buffer(client_obj):
+    invoice = Invoice.objects.create(
+        invoice_number='MES-2026-000001',
+        client=client_obj,
+        period_start=date(2026, 1, 1),
+        period_end=date(2026, 1, 31),
+        subtotal=100,
+        total=100,
+    )
+    buffer = io.BytesIO()
+
+    assert generate_invoice_pdf(invoice, buffer) is buffer
+    assert buffer.getvalue().startswith(b'%PDF')
+    assert get_styles() is get_styles()
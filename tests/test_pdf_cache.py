@@ -0,0 +1,57 @@
+import os
+import pytest
+from datetime import date
+from django.core.cache import cache
+from billing.models import Invoice, InvoiceLine
+from billing.pdf_batch import render_batch
+
+
+@pytest.mark.django_db
+class TestPdfCache:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, client_obj, authenticated_client, settings, tmp_path):
+        settings.MEDIA_ROOT = str(tmp_path)
+        cache.clear()
+        self.api = authenticated_client
+        self.invoice = Invoice.objects.create(
+            invoice_number='MES-2026-000001',
+            client=client_obj,
+            period_start=date(2026, 1, 1),
+            period_end=date(2026, 1, 31),
+            subtotal=100,
+            total=100,
+        )
+        InvoiceLine.objects.create(invoice=self.invoice, description='Consommation', quantity=1, unit_price=100, total=100)
+        self.url = f'/api/billing/invoices/{self.invoice.pk}/pdf/'
+
+    def test_render_in_background_then_serve_with_etag(self):
+        # Pas encore de PDF: 202 et rendu en arrière-plan (exécuté immédiatement en test)
+        response = self.api.get(self.url)
+        assert response.status_code == 202
+
+        response = self.api.get(self.url)
+        assert response.status_code == 200
+        etag = response['ETag']
+        first_path = Invoice.objects.get(pk=self.invoice.pk).pdf_file.path
+        response.close()
+
+        response = self.api.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+        # Ligne modifiée: PDF périmé, régénéré sous une nouvelle empreinte
+        InvoiceLine.objects.filter(invoice=self.invoice).update(description='Consommation corrigée')
+        assert self.api.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code == 202
+
+        response = self.api.get(self.url)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+        response.close()
+        assert not os.path.exists(first_path)
+
+    def test_batch_rendered_pdf_is_served_directly(self):
+        assert render_batch('invoice', [self.invoice.pk]) == {'rendered': 1, 'errors': {}}
+        response = self.api.get(self.url)
+        assert response.status_code == 200
+        assert response['ETag'] == f'"{Invoice.objects.get(pk=self.invoice.pk).pdf_hash}"'
+        response.close()
@@ -0,0 +1,44 @@
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIRequestFactory
+
+from accounts.models import Permission
+from accounts.permissions import HasModulePermission
+
+
+class BillingView:
+    module = 'billing'
+
+
+def check(user, method='get'):
+    request = getattr(APIRequestFactory(), method)('/')
+    request.user = user
+    return HasModulePermission().has_permission(request, BillingView())
+
+
+@pytest.mark.django_db
+def test_checks_cost_no_queries_and_follow_changes(authenticated_user, django_assert_num_queries,
+                                                   django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        granted = Permission.objects.create(role='employe', module='billing', action='read')
+    assert check(authenticated_user)
+
+    with django_assert_num_queries(0):
+        assert check(authenticated_user)
+        assert not check(authenticated_user, 'post')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Permission.objects.create(role='employe', module='billing', action='create')
+    assert check(authenticated_user, 'post')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        granted.delete()
+    assert not check(authenticated_user)
+
+
+@pytest.mark.django_db
+def test_permission_benchmark_paths_agree(capsys):
+    call_command('benchmark_permissions', '--checks', '300')
+
+    assert 'Résultats identiques' in capsys.readouterr().out
+    assert not Permission.objects.exists()
@@ -0,0 +1,109 @@
+"""
+Budgets de requêtes des listes billing / crm / operations.
+
+Chaque liste est appelée avec 1 puis 5 lignes par objet: le nombre de requêtes
+doit être exactement le budget dans les deux cas (pas de N+1).
+"""
+import pytest
+from datetime import date, timedelta
+from billing.models import Invoice, InvoiceLine, Payment
+from crm.models import Client, Contract, Site
+from operations.models import Equipment, Intervention, Meter, MeterReading
+
+# Requête de comptage de la pagination + requête de la page + préchargements
+BUDGETS = {
+    '/api/billing/invoices/': 4,
+    '/api/billing/payments/': 2,
+    '/api/crm/clients/': 2,
+    '/api/crm/sites/': 2,
+    '/api/crm/contracts/': 2,
+    '/api/operations/equipment/': 2,
+    '/api/operations/meters/': 2,
+    '/api/operations/readings/': 2,
+    '/api/operations/interventions/': 2,
+}
+
+# Lignes créées par client quand il y en a plusieurs
+PER_CLIENT = {
+    '/api/billing/payments/': 2,
+    '/api/operations/readings/': 2,
+}
+
+
+def build_rows(geo, agency, user, count):
+    for i in range(count):
+        client = Client.objects.create(
+            first_name=f'Client{i}',
+            last_name='Test',
+            email=f'client{i}@example.com',
+            phone=f'+24390000000{i}',
+            country=geo['country'],
+            province=geo['province'],
+            commune=geo['commune'],
+            territory=geo['territory'],
+            address='Rue Client',
+            agency=agency,
+        )
+        site = Site.objects.create(
+            client=client,
+            name=f'Site {i}',
+            reference=f'SI-{i}',
+            country=geo['country'],
+            province=geo['province'],
+            commune=geo['commune'],
+            territory=geo['territory'],
+            address='Bâtiment',
+        )
+        Contract.objects.create(
+            client=client, site=site, contract_type='mensuel', start_date=date(2026, 1, 1), rate=50,
+        )
+        equipment = Equipment.objects.create(
+            site=site,
+            equipment_type='compteur',
+            serial_number=f'EQ-{i}',
+            reference=f'REF-{i}',
+            installation_date=date(2025, 1, 1),
+        )
+        meter = Meter.objects.create(equipment=equipment, meter_number=f'M-{i}')
+        MeterReading.objects.bulk_create([
+            MeterReading(meter=meter, reading_date=date(2026, 1, 1) + timedelta(days=day), reading_value=day * 10)
+            for day in range(2)
+        ])
+        Intervention.objects.create(
+            site=site,
+            intervention_type='inspection',
+            description='Contrôle',
+            scheduled_date=date(2026, 2, 1),
+            assigned_to=user,
+        )
+        invoice = Invoice.objects.create(
+            invoice_number=f'MES-2026-{i:04d}',
+            client=client,
+            site=site,
+            period_start=date(2026, 1, 1),
+            period_end=date(2026, 1, 31),
+            subtotal=100,
+            total=100,
+        )
+        InvoiceLine.objects.bulk_create([
+            InvoiceLine(invoice=invoice, description=f'Ligne {n}', quantity=1, unit_price=50, total=50)
+            for n in range(2)
+        ])
+        Payment.objects.bulk_create([
+            Payment(invoice=invoice, reference=f'PAY-{i}-{n}', amount=10, method='cash', payment_date=date(2026, 2, 1))
+            for n in range(2)
+        ])
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('rows', [1, 5])
+@pytest.mark.parametrize('url', list(BUDGETS))
+def test_list_query_budget(url, rows, geo, agency, authenticated_client, authenticated_user,
+                           django_assert_num_queries):
+    build_rows(geo, agency, authenticated_user, rows)
+
+    with django_assert_num_queries(BUDGETS[url]):
+        response = authenticated_client.get(url)
+
+    assert response.status_code == 200
+    assert response.data['count'] == rows * PER_CLIENT.get(url, 1)
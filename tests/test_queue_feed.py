@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+import pytest
+from django.core.cache import cache
+from django.test import RequestFactory
+
+from appointments import feed, live_state
+from appointments.models import QueueTicket, ServiceType
+from appointments.views import queue_feed
+
+
+@pytest.fixture(autouse=True)
+def layer(settings):
+    settings.QUEUE_FEED_LAYER = 'appointments.feed.InMemoryFeedLayer'
+    feed.get_feed_layer.cache_clear()
+    cache.clear()
+    yield feed.get_feed_layer()
+    feed.get_feed_layer.cache_clear()
+    cache.clear()
+
+
+def parse(chunk):
+    fields = dict(line.split(': ', 1) for line in chunk.strip().splitlines())
+    return int(fields['id']), fields['event'], json.loads(fields['data'])
+
+
+def test_backlog_replays_missed_events_or_reports_a_gap():
+    layer = feed.InMemoryFeedLayer(backlog=3)
+    for n in range(5):
+        layer.publish('agence', {'type': 'ticket', 'n': n})
+
+    assert [m['n'] for m in layer.since('agence', 2)] == [2, 3, 4]
+    assert layer.since('agence', 5) == []
+    # Trop ancien (sorti de l'historique) ou venant d'un autre processus
+    assert layer.since('agence', 1) is None
+    assert layer.since('agence', 9) is None
+
+
+@pytest.mark.django_db
+class TestQueueFeed:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, agency, django_capture_on_commit_callbacks):
+        self.agency = agency
+        self.capture = django_capture_on_commit_callbacks
+        self.service = ServiceType.objects.create(name='Abonnement', code='ABO')
+        with self.capture(execute=True):
+            self.ticket = QueueTicket.objects.create(agency=agency, service=self.service)
+        # État en cache: le flux ne touche plus la base
+        live_state.get_state(agency.pk)
+
+    def test_ticket_changes_publish_compact_deltas(self, layer):
+        with self.capture(execute=True):
+            self.ticket.status = 'called'
+            self.ticket.save()
+            QueueTicket.objects.get(pk=self.ticket.pk).save()
+            ticket = QueueTicket.objects.get(pk=self.ticket.pk)
+            ticket.status = 'waiting'
+            ticket.save()
+
+        messages = layer.since(self.agency.pk, 0)
+        assert [m['action'] for m in messages] == ['created', 'called', 'recalled', 'transferred']
+        assert messages[-1]['ticket']['ticket_number'] == 'A001'
+        assert messages[-1]['stats']['waiting_count'] == 1
+
+    def test_stream_sends_snapshot_then_deltas_and_resumes(self, layer):
+        agency_id = str(self.agency.pk)
+
+        async def first_connection():
+            stream = feed.event_stream(agency_id, keepalive=1)
+            chunks = [await stream.__anext__(), await stream.__anext__()]
+            layer.publish(agency_id, {'type': 'ticket', 'action': 'called'})
+            chunks.append(await stream.__anext__())
+            await stream.aclose()
+            return chunks
+
+        retry, snapshot, delta = asyncio.run(first_connection())
+
+        assert retry.startswith('retry:')
+        snapshot_id, event, data = parse(snapshot)
+        assert (snapshot_id, event) == (1, 'snapshot')
+        assert [t['ticket_number'] for t in data['waiting_tickets']] == ['A001']
+        assert parse(delta)[:2] == (2, 'ticket')
+        assert not layer._subscribers[agency_id]
+
+        layer.publish(agency_id, {'type': 'ticket', 'action': 'completed'})
+
+        async def reconnect():
+            stream = feed.event_stream(agency_id, last_event_id='2', keepalive=1)
+            chunks = [await stream.__anext__(), await stream.__anext__()]
+            await stream.aclose()
+            return chunks
+
+        _, missed = asyncio.run(reconnect())
+        assert parse(missed) == (3, 'ticket', {'action': 'completed'})
+
+    def test_view_returns_event_stream(self):
+        request = RequestFactory().get('/api/appointments/queue/feed/', {'agency': str(self.agency.pk)})
+
+        response = asyncio.run(queue_feed(request))
+
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'text/event-stream'
+        assert asyncio.run(queue_feed(RequestFactory().get('/'))).status_code == 400
@@ -0,0 +1,135 @@
+import pytest
+from django.core.cache import cache
+
+from appointments import live_state
+from appointments.models import Counter, QueueTicket
+
+
+@pytest.mark.django_db
+class TestQueueLiveState:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, agency, service, django_capture_on_commit_callbacks):
+        self.agency = agency
+        self.capture = django_capture_on_commit_callbacks
+        Counter.objects.create(agency=agency, number=1, status='available')
+        with self.capture(execute=True):
+            self.tickets = [
+                QueueTicket.objects.create(agency=agency, service=service, priority=priority)
+                for priority in ['normal', 'normal', 'vip']
+            ]
+
+    def get(self, api_client, action, **params):
+        return api_client.get(f'/api/appointments/queue/{action}/', {'agency': str(self.agency.pk), **params})
+
+    def test_reads_are_served_from_cache(self, api_client, django_assert_num_queries):
+        # Première lecture: reconstruction depuis la base
+        assert self.get(api_client, 'display').status_code == 200
+
+        with django_assert_num_queries(0):
+            display = self.get(api_client, 'display').data
+            stats = self.get(api_client, 'stats').data
+            check = self.get(api_client, 'check', ticket='a002').data
+
+        assert display['total_waiting'] == 3
+        # VIP d'abord, puis ordre d'arrivée
+        assert [t['ticket_number'] for t in display['waiting_tickets']] == ['A003', 'A001', 'A002']
+        assert [c['number'] for c in display['counters']] == [1]
+        assert stats['waiting_count'] == 3 and stats['total_today'] == 3
+        assert check['current_position'] == 3
+
+    def test_incremental_updates_match_rebuild(self, api_client):
+        self.get(api_client, 'display')
+
+        with self.capture(execute=True):
+            response = api_client.post('/api/appointments/queue/call_next/', {
+                'agency': str(self.agency.pk), 'counter': 'counter-1',
+            }, format='json')
+            called = response.data['ticket_number']
+            api_client.post(f'/api/appointments/queue/{self.tickets[1].pk}/no_show/')
+            api_client.post(f'/api/appointments/queue/{self.tickets[2].pk}/complete/')
+            Counter.objects.filter(agency=self.agency).get().delete()
+
+        display = self.get(api_client, 'display').data
+        stats = self.get(api_client, 'stats').data
+
+        assert called == 'A003'
+        assert display['counters'] == []
+        assert [t['ticket_number'] for t in display['waiting_tickets']] == ['A001']
+        assert display['called_tickets'] == []
+        assert (stats['waiting_count'], stats['serving_count'], stats['completed_today'], stats['total_today']) == (1, 0, 1, 3)
+        assert self.get(api_client, 'check', ticket='A002').data['status'] == 'no_show'
+
+        cached = live_state.get_state(self.agency.pk)
+        rebuilt = live_state.build_state(self.agency.pk)
+        for part in ('waiting', 'called', 'counts', 'wait_count'):
+            assert cached[part] == rebuilt[part]
+
+    def test_position_follows_call_order(self, api_client, service):
+        with self.capture(execute=True):
+            extra = [
+                QueueTicket.objects.create(agency=self.agency, service=service, priority=priority)
+                for priority in ['priority', 'normal']
+            ]
+            api_client.post(f'/api/appointments/queue/{self.tickets[2].pk}/cancel/')
+            api_client.post('/api/appointments/queue/call_next/', {
+                'agency': str(self.agency.pk), 'counter': 'counter-1',
+            }, format='json')
+            api_client.post(f'/api/appointments/queue/{extra[0].pk}/transfer/', {'counter': 'counter-2'})
+
+        expected = list(QueueTicket.in_call_order(
+            QueueTicket.objects.filter(agency=self.agency, status='waiting')
+        ).values_list('ticket_number', flat=True))
+        assert expected == ['A004', 'A001', 'A002', 'A005']
+
+        state = live_state.get_state(self.agency.pk)
+        for position, number in enumerate(expected, start=1):
+            check = self.get(api_client, 'check', ticket=number).data
+            assert check['current_position'] == position
+            # Un guichet ouvert et libre: le premier est pris aussitôt
+            assert check['estimated_wait_time'] == (position - 1) * service.estimated_duration
+        # État décodé réutilisé tant que sa version n'a pas changé
+        assert live_state.get_state(self.agency.pk) is state
+
+    def test_index_holds_only_active_tickets(self, api_client):
+        self.get(api_client, 'display')
+        first, second = self.tickets[0], self.tickets[1]
+        with self.capture(execute=True):
+            api_client.post(f'/api/appointments/queue/{first.pk}/complete/')
+
+        state = live_state.get_state(self.agency.pk)
+        assert str(first.pk) not in state['active'] and 'tickets' not in state
+        assert self.get(api_client, 'check', ticket='A001').data['status'] == 'completed'
+
+        # Entrée évincée du cache: l'index est abandonné puis reconstruit
+        cache.delete(f"{state['key']}:t:{second.pk}")
+        second.priority = 'vip'
+        with self.capture(execute=True):
+            second.save()
+        assert [t['ticket_number'] for t in self.get(api_client, 'display').data['waiting_tickets']] == ['A002', 'A003']
+        assert self.get(api_client, 'stats').data['total_today'] == 3
+
+    def test_failed_state_update_does_not_fail_the_request(self, api_client, service, monkeypatch):
+        self.get(api_client, 'display')
+
+        def unavailable(*args, **kwargs):
+            raise ConnectionError('cache indisponible')
+
+        monkeypatch.setattr(live_state, 'record_ticket', unavailable)
+        with self.capture(execute=True):
+            response = api_client.post('/api/appointments/queue/', {
+                'agency': str(self.agency.pk), 'service': str(service.pk),
+            }, format='json')
+        monkeypatch.undo()
+
+        assert response.status_code == 201
+        # État abandonné: reconstruit depuis la base à la lecture suivante
+        assert self.get(api_client, 'stats').data['waiting_count'] == 4
+
+    def test_unknown_agency_or_ticket(self, api_client):
+        self.agency.is_active = False
+        with self.capture(execute=True):
+            self.agency.save()
+
+        assert self.get(api_client, 'display').status_code == 404
+        assert api_client.get('/api/appointments/queue/check/', {'ticket': 'Z999'}).status_code == 404
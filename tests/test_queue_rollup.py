@@ -0,0 +1,73 @@
+from datetime import date, datetime, time, timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from appointments.models import DailyQueueStats, QueueTicket
+from appointments.rollup import rollup_day
+
+DAY = date(2024, 3, 4)
+
+
+def at(hour, minute=0):
+    return timezone.make_aware(datetime.combine(DAY, time(hour, minute)))
+
+
+def make_ticket(agency, service, arrived, status='completed', wait=None, service_minutes=None):
+    ticket = QueueTicket.objects.create(agency=agency, service=service, date=DAY, status=status)
+    fields = {'created_at': arrived}
+    if wait is not None:
+        fields['called_at'] = arrived + timedelta(minutes=wait)
+    if service_minutes is not None:
+        fields['completed_at'] = fields['called_at'] + timedelta(minutes=service_minutes)
+    QueueTicket.objects.filter(pk=ticket.pk).update(**fields)
+    return ticket
+
+
+@pytest.mark.django_db
+def test_rollup_day_in_one_query(agency, service, django_assert_num_queries):
+    make_ticket(agency, service, at(9, 10), wait=10, service_minutes=6)
+    make_ticket(agency, service, at(10, 0), wait=20, service_minutes=10)
+    make_ticket(agency, service, at(10, 20), wait=30, service_minutes=8)
+    make_ticket(agency, service, at(10, 40), status='no_show', wait=40)
+    make_ticket(agency, service, at(11, 0), status='cancelled')
+
+    with django_assert_num_queries(2):  # agrégat + insertion groupée
+        assert rollup_day(DAY) == 1
+
+    stats = DailyQueueStats.objects.get(agency=agency, date=DAY)
+    assert (stats.total_tickets, stats.completed_tickets, stats.cancelled_tickets, stats.no_show_tickets) == (5, 3, 1, 1)
+    assert (stats.avg_wait_time, stats.avg_service_time) == (25, 8)
+    assert (stats.wait_count, stats.service_count) == (4, 3)
+    assert (stats.peak_hour, stats.peak_wait_time) == (time(10), 30)
+
+
+@pytest.mark.django_db
+def test_backfill_command_replaces_existing_rows(agency, service):
+    DailyQueueStats.objects.create(agency=agency, date=DAY, total_tickets=99)
+    make_ticket(agency, service, at(9), wait=5, service_minutes=5)
+
+    call_command('rollup_queue_stats', '--from', (DAY - timedelta(days=1)).isoformat(), '--to', DAY.isoformat())
+
+    assert DailyQueueStats.objects.get(agency=agency, date=DAY).total_tickets == 1
+    assert DailyQueueStats.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_trends_are_served_from_rollups(authenticated_client, agency, django_assert_num_queries):
+    for offset, (total, wait) in enumerate([(10, 10), (20, 20), (30, 30)]):
+        DailyQueueStats.objects.create(
+            agency=agency, date=DAY + timedelta(days=offset), total_tickets=total, avg_wait_time=wait, wait_count=total,
+        )
+
+    url = '/api/appointments/stats/trends/'
+    response = authenticated_client.get(url, {'agency': str(agency.pk), 'period': 'week'})
+    assert response.status_code == 200
+    assert response.data == [{
+        'period': DAY, 'total_tickets': 60, 'completed_tickets': 0, 'cancelled_tickets': 0,
+        'no_show_tickets': 0, 'avg_wait_time': 23, 'avg_service_time': None, 'peak_wait_time': None,
+    }]
+
+    response = authenticated_client.get(url, {'date_from': (DAY + timedelta(days=1)).isoformat()})
+    assert [row['total_tickets'] for row in response.data] == [20, 30]
@@ -0,0 +1,105 @@
+import pytest
+from datetime import date
+from django.core import mail
+from accounts.models import AuditLog
+from billing.models import Invoice
+from billing.tasks import deactivate_services_for_invoices
+from crm.models import Client, Site
+from operations.models import Equipment, Meter
+from operations.service_state import ACTIVATE, DEACTIVATE, LocalCommandSink, set_service_state
+
+
+def make_meters(site, prefix, count):
+    meters = []
+    for i in range(count):
+        equipment = Equipment.objects.create(
+            site=site,
+            equipment_type='compteur',
+            serial_number=f'EQ-{prefix}-{i}',
+            reference=f'REF-{prefix}-{i}',
+            installation_date=date(2025, 1, 1),
+        )
+        meters.append(Meter(equipment=equipment, meter_number=f'{prefix}-{i}'))
+    return Meter.objects.bulk_create(meters)
+
+
+@pytest.mark.django_db
+class TestServiceStateEngine:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, geo, client_obj, site, django_capture_on_commit_callbacks):
+        self.capture_on_commit = django_capture_on_commit_callbacks
+        other_client = Client.objects.create(
+            first_name='Marie',
+            last_name='Kabila',
+            email='marie@example.com',
+            phone='+243111111111',
+            country=geo['country'],
+            province=geo['province'],
+            commune=geo['commune'],
+            territory=geo['territory'],
+            address='789 Rue Client',
+            agency=client_obj.agency,
+            status='actif',
+        )
+        self.other_site = Site.objects.create(
+            client=other_client,
+            name='Dépôt',
+            reference='SI-0002',
+            country=geo['country'],
+            province=geo['province'],
+            commune=geo['commune'],
+            territory=geo['territory'],
+            address='Bâtiment B',
+        )
+        self.client_obj = client_obj
+        self.site = site
+        make_meters(site, 'A', 3)
+        make_meters(self.other_site, 'B', 2)
+
+    def test_chunked_update_audit_and_commands(self):
+        sink = LocalCommandSink()
+
+        with self.capture_on_commit(execute=True):
+            result = set_service_state(Meter.objects.all(), False, reason='test', sink=sink, chunk_size=2)
+
+        assert result['changed'] == 5
+        assert result['batches'] == 3
+        assert not Meter.objects.filter(service_active=True).exists()
+        assert set(Meter.objects.values_list('status', flat=True)) == {'inactif'}
+        assert AuditLog.objects.filter(module='operations').count() == 3
+        assert [command for command, _ in sink.commands] == [DEACTIVATE] * 3
+        assert sorted(n for _, numbers in sink.commands for n in numbers) == ['A-0', 'A-1', 'A-2', 'B-0', 'B-1']
+        assert sorted(result['by_client'][self.client_obj.pk]['meters']) == ['A-0', 'A-1', 'A-2']
+
+        # Déjà coupés: aucun lot supplémentaire
+        result = set_service_state(Meter.objects.all(), False, sink=sink)
+        assert result['changed'] == 0
+        assert result['batches'] == 0
+
+        with self.capture_on_commit(execute=True):
+            result = set_service_state(Meter.objects.filter(equipment__site=self.site), True, sink=sink)
+        assert result['changed'] == 3
+        assert sink.commands[-1][0] == ACTIVATE
+
+    def test_one_notification_per_client(self):
+        invoices = Invoice.objects.bulk_create([
+            Invoice(
+                invoice_number=f'F-00{i}',
+                client=site.client,
+                site=site,
+                period_start=date(2026, 1, 1),
+                period_end=date(2026, 1, 31),
+                subtotal=100,
+                total=100,
+                status='envoyee',
+            )
+            for i, site in enumerate([self.site, self.site, self.other_site])
+        ])
+
+        deactivate_services_for_invoices([str(invoice.pk) for invoice in invoices])
+
+        assert Meter.objects.filter(service_active=True).count() == 0
+        assert len(mail.outbox) == 2
+        client_mail = next(m for m in mail.outbox if m.to == ['client@example.com'])
+        assert 'F-000' in client_mail.body and 'F-001' in client_mail.body
@@ -0,0 +1,107 @@
+import threading
+from datetime import date
+
+import pytest
+from django.db import connection, connections
+
+from appointments.models import QueueTicket, TicketBlock, TicketSequence
+from appointments.ticketing import next_ticket_number, reserve_ticket_block
+
+
+@pytest.mark.django_db
+def test_sequence_continues_existing_numbering(agency, service):
+    # Tickets émis avant la séquence (ordre alphabétique trompeur: A999 > A1000)
+    QueueTicket.objects.create(agency=agency, service=service, ticket_number='A999')
+    QueueTicket.objects.create(agency=agency, service=service, ticket_number='A1000')
+
+    ticket = QueueTicket.objects.create(agency=agency, service=service)
+
+    assert ticket.ticket_number == 'A1001'
+    assert TicketSequence.objects.get(agency=agency, date=date.today(), prefix='A').last_number == 1001
+
+
+@pytest.mark.django_db
+def test_kiosk_blocks_do_not_overlap(agency, service, settings):
+    settings.QUEUE_TICKET_BLOCK_SIZE = 3
+
+    numbers = [
+        next_ticket_number(agency.pk, service, kiosk=kiosk)
+        for kiosk in ['borne-1', 'borne-2', 'borne-1', None, 'borne-1', 'borne-1']
+    ]
+
+    assert numbers == ['A001', 'A004', 'A002', 'A007', 'A003', 'A008']
+    block = TicketBlock.objects.get(kiosk='borne-1')
+    assert (block.next_number, block.last_number) == (9, 10)
+    assert reserve_ticket_block(agency.pk, date.today(), 'A', 'borne-2') == 11
+
+
+@pytest.mark.django_db
+def test_api_create_uses_kiosk_block(api_client, agency, service, settings):
+    settings.QUEUE_TICKET_BLOCK_SIZE = 5
+    next_ticket_number(agency.pk, service)
+
+    response = api_client.post('/api/appointments/queue/', {
+        'agency': str(agency.pk), 'service': str(service.pk), 'kiosk': 'borne-1',
+    }, format='json')
+
+    assert response.status_code == 201
+    assert response.data['ticket_number'] == 'A002'
+    assert TicketBlock.objects.get(kiosk='borne-1').last_number == 6
+
+
+def test_concurrent_ticket_creation_has_no_duplicates(concurrent_db, agency, service):
+    threads_count, per_thread = 8, 10
+    errors = []
+    barrier = threading.Barrier(threads_count)
+
+    def issue():
+        try:
+            barrier.wait()
+            for _ in range(per_thread):
+                QueueTicket.objects.create(agency=agency, service=service)
+        except Exception as e:  # pragma: no cover - remonté par l'assertion
+            errors.append(e)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=issue) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    numbers = list(QueueTicket.objects.values_list('ticket_number', flat=True))
+    assert len(numbers) == len(set(numbers)) == threads_count * per_thread
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_requests_from_one_kiosk_share_its_block(agency, service, settings):
+    # Vérifié à l'exécution: la collecte n'a pas accès à la base
+    if not connection.features.has_select_for_update:
+        pytest.skip("Base sans SELECT ... FOR UPDATE: la plage ne peut être verrouillée")
+    settings.QUEUE_TICKET_BLOCK_SIZE = 3
+    threads_count, per_thread = 6, 10
+    numbers, errors = [], []
+    barrier = threading.Barrier(threads_count)
+
+    def issue():
+        try:
+            barrier.wait()
+            for _ in range(per_thread):
+                numbers.append(next_ticket_number(agency.pk, service, kiosk='borne-1'))
+        except Exception as e:  # pragma: no cover - remonté par l'assertion
+            errors.append(e)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=issue) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(numbers) == len(set(numbers)) == threads_count * per_thread
+    block = TicketBlock.objects.get(kiosk='borne-1')
+    assert block.last_number - block.next_number < settings.QUEUE_TICKET_BLOCK_SIZE
@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from appointments import live_state
+from appointments.models import QueueTicket, ServiceType
+from appointments.wait_estimator import FlowEstimator, eta_minutes
+
+
+def test_flow_estimator_smooths_in_constant_memory():
+    estimator = FlowEstimator(alpha=0.5)
+    for timestamp in (0, 60, 180, 10 * 3600):
+        estimator.observe_arrival(timestamp)
+    for seconds in (600, 300):
+        estimator.observe_service(seconds)
+
+    # 60 puis 120 s; l'écart de la nuit n'est pas un intervalle
+    assert estimator.interarrival_seconds == 90
+    assert estimator.arrivals_per_hour() == 40
+    assert (estimator.service_seconds, estimator.samples) == (450, 2)
+    assert FlowEstimator.from_dict(estimator.to_dict()).to_dict() == estimator.to_dict()
+
+    # 2 guichets dont 1 libre, 6 minutes par service
+    assert [eta_minutes(p, 2, 360, idle_counters=1) for p in (1, 2, 5)] == [0, 3, 12]
+
+
+@pytest.mark.django_db
+def test_completed_services_drive_queue_estimates(agency, api_client, django_capture_on_commit_callbacks):
+    service = ServiceType.objects.create(name='Abonnement', code='ABO', estimated_duration=30)
+    now = timezone.now()
+    with django_capture_on_commit_callbacks(execute=True):
+        tickets = [QueueTicket.objects.create(agency=agency, service=service) for _ in range(4)]
+        for ticket, minutes in zip(tickets[:2], (4, 8)):
+            ticket.status = 'serving'
+            ticket.save()
+            ticket.status = 'completed'
+            ticket.served_at = now - timedelta(minutes=minutes)
+            ticket.completed_at = now
+            ticket.save()
+
+    state = live_state.get_state(agency.pk)
+    # EWMA (alpha 0.2) des services de 4 puis 8 minutes
+    assert state['estimates']['service_seconds'] == pytest.approx(4 * 60 + 0.2 * 4 * 60)
+    # Aucun guichet ouvert déclaré: on en suppose un, occupé
+    check = api_client.get('/api/appointments/queue/check/', {'agency': str(agency.pk), 'ticket': 'A004'}).data
+    assert (check['current_position'], check['estimated_wait_time']) == (2, 10)
+
+    response = api_client.post('/api/appointments/queue/', {
+        'agency': str(agency.pk), 'service': str(service.pk), 'priority': 'vip',
+    }, format='json')
+    created = QueueTicket.objects.get(pk=response.data['id'])
+    assert (created.queue_position, created.estimated_wait_time) == (1, 5)
+
+
+@pytest.mark.django_db
+def test_service_estimate_replaces_agency_estimate_once_sampled(agency, django_capture_on_commit_callbacks):
+    slow = ServiceType.objects.create(name='Réclamation', code='REC')
+    fast = ServiceType.objects.create(name='Paiement', code='PAY')
+    now = timezone.now()
+    with django_capture_on_commit_callbacks(execute=True):
+        for service, minutes in [(slow, 20)] + [(fast, 2)] * 5:
+            ticket = QueueTicket.objects.create(agency=agency, service=service, status='serving')
+            ticket.status = 'completed'
+            ticket.served_at = now - timedelta(minutes=minutes)
+            ticket.completed_at = now
+            ticket.save()
+        waiting = [QueueTicket.objects.create(agency=agency, service=service) for service in (slow, fast)]
+
+    agency_seconds = 120 + 1080 * 0.8 ** 5
+    for state in (live_state.get_state(agency.pk), live_state.build_state(agency.pk)):
+        assert state['estimates']['services'] == {str(fast.pk): pytest.approx(120)}
+        # Service rapide: sa propre durée; service peu mesuré: celle de l'agence
+        assert live_state.estimated_wait(state, waiting[1].pk) == 4
+        assert live_state.estimated_wait(state, waiting[0].pk) == round(agency_seconds / 60)
+
+
+def test_benchmark_command_reports_error_and_throughput(capsys):
+    call_command('benchmark_wait_estimator', days=2, arrivals=20)
+
+    output = capsys.readouterr().out
+    assert 'estimateur EWMA' in output
+    assert 'événements/s' in output